@@ -15,14 +15,35 @@ from flask_cors import CORS
 from werkzeug.utils import secure_filename
 import uuid
 import threading
+import time
 from datetime import datetime
 
 # Add parent directory to path for imports
 sys.path.append(str(Path(__file__).parent))
 
-from test_frame import test_single_frame, create_comparison
 from main_pipeline import process_video
-from blur_detection.blur_test import blur_level, blur_score
+from blur_detection.blur_test import (
+    blur_score, classify_score, DEBLUR_PASSES, FIXED_HIGH_THRESHOLD, FIXED_LOW_THRESHOLD
+)
+from deblur.variants import DEBLUR_VARIANTS
+from enhancement.tiers import ENHANCE_TIERS, ENHANCE_MODES
+from scene_detection.scene_index import load_scene_index, scene_index_path_for, select_sample_frames
+from chunked_upload import UploadManager, UploadError
+from inference_server import get_inference_client
+from job_scheduler import get_job_scheduler
+from thread_governor import current_thread_limit, get_thread_governor
+from stage_graph import StageGraph
+from weights import memory_usage_mb, weight_load_stats
+from frame_manifest import manifest_path_for, read_manifest
+from checkpoint import checkpoint_path_for
+from frame_store import StoredFrame, frame_store_path_for, frame_store_reader
+from text_index import load_text_index, text_index_path_for
+from comparisons import (
+    COMPARISON_LAYOUTS, DEFAULT_COMPARISON_SIZE, MAX_COMPARISON_SIZE, comparison_cache_stats, get_comparison
+)
+from previews import (
+    PREVIEW_SIZES, DEFAULT_PREVIEW_SIZE, default_preview_format, get_preview, preview_mimetype
+)
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend
@@ -32,6 +53,7 @@ UPLOAD_FOLDER = 'uploads'
 OUTPUT_FOLDER = 'api_outputs'
 ALLOWED_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'bmp', 'gif'}
 ALLOWED_VIDEO_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'flv', 'wmv'}
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # Recommended chunk size for chunked uploads
 
 # Create necessary directories
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -41,9 +63,71 @@ os.makedirs('static/results', exist_ok=True)
 # Store processing jobs
 processing_jobs = {}
 
+# Loaded text indexes: job_id -> (index file mtime, TextIndex)
+_text_indexes = {}
+
+def job_output_path(job_id):
+    """Output video path of a video job."""
+    job = processing_jobs.get(job_id) or {}
+    return job.get("output_video") or os.path.join(OUTPUT_FOLDER, job_id, "output.mp4")
+
+def get_text_index(job_id):
+    """Text index of a job, loaded once and reloaded only if the file changes."""
+    path = text_index_path_for(job_output_path(job_id))
+    if not path.exists():
+        return None
+    mtime = path.stat().st_mtime
+    cached = _text_indexes.get(job_id)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, load_text_index(path))
+        _text_indexes[job_id] = cached
+    return cached[1]
+
+def request_client_id():
+    """Client identity for fair-share scheduling: X-Client-Id header, else the remote address."""
+    return request.headers.get("X-Client-Id") or request.remote_addr or "anonymous"
+
 def allowed_file(filename, allowed_extensions):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
 
+def _flag(value):
+    return str(value or '').lower() in ('1', 'true', 'yes')
+
+def parse_processing_options(source, video=False):
+    """
+    Read per-job processing options from form fields or a JSON body.
+    
+    Returns:
+        tuple: (options dict for the processing helpers, error message or None)
+    """
+    deblur_variant = source.get('deblur_variant') or None
+    if deblur_variant and deblur_variant != "auto" and deblur_variant not in DEBLUR_VARIANTS:
+        return None, f"Invalid deblur_variant. Allowed: auto, {', '.join(DEBLUR_VARIANTS)}"
+    enhance_tier = source.get('enhance_tier') or None
+    if enhance_tier and enhance_tier not in ENHANCE_TIERS:
+        return None, f"Invalid enhance_tier. Allowed: {', '.join(ENHANCE_TIERS)}"
+    enhance_mode = source.get('enhance_mode') or "full"
+    if enhance_mode not in ENHANCE_MODES:
+        return None, f"Invalid enhance_mode. Allowed: {', '.join(ENHANCE_MODES)}"
+    
+    options = {
+        "deblur_variant": deblur_variant,
+        "enhance_tier": enhance_tier,
+        "enhance_mode": enhance_mode,
+        "spatial_deblur": _flag(source.get('spatial_deblur')),
+    }
+    if video:
+        options["calibrate_blur"] = _flag(source.get('calibrate_blur'))
+        sample_fps = source.get('sample_fps')
+        if sample_fps not in (None, ''):
+            try:
+                options["sample_fps"] = float(sample_fps)
+            except (TypeError, ValueError):
+                return None, "Invalid sample_fps. Expected a positive number"
+            if options["sample_fps"] <= 0:
+                return None, "Invalid sample_fps. Expected a positive number"
+    return options, None
+
 def encode_image_to_base64(image_path):
     """Encode image file to base64 string."""
     if not os.path.exists(image_path):
@@ -51,90 +135,190 @@ def encode_image_to_base64(image_path):
     with open(image_path, 'rb') as img_file:
         return base64.b64encode(img_file.read()).decode('utf-8')
 
-def process_single_frame_helper(input_path, output_dir, job_id):
-    """Helper function to process single frame and return results."""
+def encode_preview_to_base64(image_path, img=None):
+    """Encode the default-size preview of a result image to base64 (generated if missing)."""
+    preview_path = get_preview(image_path, DEFAULT_PREVIEW_SIZE, img=img)
+    return encode_image_to_base64(str(preview_path)) if preview_path else None
+
+def preview_urls(relative_path):
+    """Preview URL per size for an image under static/results; "full" is the PNG download."""
+    urls = {size: f"/api/preview/{relative_path}?size={size}" for size in PREVIEW_SIZES}
+    urls["full"] = f"/api/preview/{relative_path}?size=full"
+    return urls
+
+def comparison_url(job_id, frame=None, stages=("original", "enhanced")):
+    """URL of the on-demand comparison for a job (and video frame)."""
+    url = f"/api/jobs/{job_id}/comparison?stages={','.join(stages)}"
+    return url + (f"&frame={frame}" if frame is not None else "")
+
+def comparison_sources(job_id, frame=None):
+    """
+    Stage -> image source for a job's comparison.
+    
+    Single-frame jobs use their saved results; video frames come straight from
+    the job's frame store (any processed frame, not only the samples).
+    """
+    static_dir = Path('static') / 'results' / job_id
+    if frame is None:
+        sources = {
+            "original": static_dir / "0_original.png",
+            "deblurred": static_dir / "1_deblurred.png",
+            "enhanced": static_dir / "2_enhanced.png"
+        }
+        if not sources["deblurred"].exists():
+            sources["deblurred"] = sources["original"]
+        return {stage: path for stage, path in sources.items() if path.exists()}
+    
+    store_path = frame_store_path_for(job_output_path(job_id))
+    with frame_store_reader(store_path) as store:
+        if store is None:
+            return {}
+        sources = {stage: StoredFrame(str(store_path), frame, stage) for stage in store.stages(frame)}
+    if "original" in sources:
+        sources.setdefault("deblurred", sources["original"])
+    return sources
+
+def process_single_frame_helper(input_path, output_dir, job_id, deblur_variant=None, enhance_tier=None,
+                                enhance_mode="full", spatial_deblur=False, model_slot=None):
+    """
+    Helper function to process single frame and return results.
+    
+    The stages run as a dependency graph: OCR on the original overlaps
+    restoration, each result PNG is written as soon as its image exists, and
+    the copies into the job's output directory finish after the response.
+    
+    ``model_slot`` (a JobScheduler SlotHold, optional) is released as soon as
+    enhancement finishes, so video frames are not held up by this request's OCR.
+    """
     try:
         # Import OCR functions
         try:
-            from ocr.ocr_engine import get_ocr_engine, avg_confidence, filter_main_text
+            from ocr.ocr_engine import get_ocr_engine, avg_confidence
             OCR_AVAILABLE = True
         except ImportError:
             OCR_AVAILABLE = False
+        from deblur.nafnet_infer import deblur_image, deblur_regions
+        from enhancement.realesrgan_infer import enhance_image
         
-        # Load image
-        img = cv2.imread(input_path)
-        if img is None:
-            raise ValueError(f"Could not load image from {input_path}")
+        inference_client = get_inference_client()
+        static_dir = os.path.join('static', 'results', job_id)
+        os.makedirs(static_dir, exist_ok=True)
+        static_paths = {
+            "original": os.path.join(static_dir, "0_original.png"),
+            "deblurred": os.path.join(static_dir, "1_deblurred.png"),
+            "enhanced": os.path.join(static_dir, "2_enhanced.png")
+        }
+        ocr_lock = threading.Lock()  # The two OCR stages share one EasyOCR reader
         
-        # Get blur detection results
-        lap_var, edge_density = blur_score(img)
-        level = blur_level(img)
+        def load(results):
+            img = cv2.imread(input_path)
+            if img is None:
+                raise ValueError(f"Could not load image from {input_path}")
+            return img
         
-        # Save original
-        original_path = os.path.join(output_dir, "0_original.png")
-        cv2.imwrite(original_path, img)
+        def detect_blur(results):
+            lap_var, edge_density = blur_score(results["load"])
+            # blur_level's fixed thresholds, applied to the variance just computed
+            return lap_var, edge_density, classify_score(lap_var, FIXED_LOW_THRESHOLD, FIXED_HIGH_THRESHOLD)
         
-        # Process deblurring
-        from deblur.nafnet_infer import deblur_image
-        deblurred_img = None
-        deblurred_path = None
+        def deblur(results):
+            """(deblurred image or None if the original is used as is, deblurred pixel fraction)"""
+            img, level = results["load"], results["blur"][2]
+            if spatial_deblur:
+                if inference_client:
+                    deblurred_img, fraction, _ = inference_client.deblur_regions(img, variant=deblur_variant)
+                else:
+                    deblurred_img, fraction, _ = deblur_regions(img, variant=deblur_variant)
+                return (deblurred_img, fraction) if fraction > 0 else (None, 0.0)
+            if level in ["medium", "high"]:
+                # Single pass for medium blur, double pass for high blur
+                if inference_client:
+                    return inference_client.deblur(img, passes=DEBLUR_PASSES[level], variant=deblur_variant), 1.0
+                deblurred_img = img
+                for _ in range(DEBLUR_PASSES[level]):
+                    deblurred_img = deblur_image(deblurred_img, variant=deblur_variant)
+                return deblurred_img, 1.0
+            return None, 0.0
         
-        if level in ["medium", "high"]:
-            if level == "medium":
-                deblurred_img = deblur_image(img)
-            elif level == "high":
-                deblurred_img = deblur_image(img)
-                deblurred_img = deblur_image(deblurred_img)  # Second pass
-            
-            deblurred_path = os.path.join(output_dir, "1_deblurred.png")
-            cv2.imwrite(deblurred_path, deblurred_img)
-        else:
-            deblurred_img = img.copy()
-            deblurred_path = original_path
+        def enhance(results):
+            source = results["deblur"][0] if results["deblur"][0] is not None else results["load"]
+            try:
+                if inference_client:
+                    return inference_client.enhance(source, scale=2, tier=enhance_tier, mode=enhance_mode)
+                return enhance_image(source, scale=2, tier=enhance_tier, mode=enhance_mode)
+            finally:
+                # Last model stage: the remaining work (OCR, saving) does not need the slot
+                if model_slot is not None:
+                    model_slot.release()
         
-        # Process enhancement
-        from enhancement.realesrgan_infer import enhance_image
-        enhanced_img = enhance_image(
-            deblurred_img if deblurred_img is not None else img,
-            scale=2
-        )
-        enhanced_path = os.path.join(output_dir, "2_enhanced.png")
-        cv2.imwrite(enhanced_path, enhanced_img)
+        def save(stage, img):
+            """Write a result PNG for serving and return its inline preview."""
+            cv2.imwrite(static_paths[stage], img)
+            return encode_preview_to_base64(static_paths[stage], img=img)
         
-        # Create comparison image
-        comparison = create_comparison(img, deblurred_img, enhanced_img)
-        comparison_path = os.path.join(output_dir, "3_comparison.png")
-        cv2.imwrite(comparison_path, comparison)
+        def save_deblurred(results):
+            if results["deblur"][0] is None:
+                static_paths["deblurred"] = static_paths["original"]
+                return results["save_original"]
+            return save("deblurred", results["deblur"][0])
         
-        # OCR comparison
-        ocr_result = None
-        confidence_level = None
-        if OCR_AVAILABLE:
+        def run_ocr(img):
+            if not OCR_AVAILABLE:
+                return None
             try:
-                ocr_engine = get_ocr_engine(gpu=True)
-                blur_ocr = ocr_engine.run_ocr(img)
-                enhanced_ocr = ocr_engine.run_ocr(enhanced_img)
-                
-                blur_avg = avg_confidence(blur_ocr)
-                enhanced_avg = avg_confidence(enhanced_ocr)
-                
-                ocr_result = {
-                    "blur_confidence": round(blur_avg, 3),
-                    "enhanced_confidence": round(enhanced_avg, 3),
-                    "improvement": round(enhanced_avg - blur_avg, 3),
-                    "blur_text_count": len(blur_ocr),
-                    "enhanced_text_count": len(enhanced_ocr)
-                }
-                confidence_level = round(enhanced_avg, 3)
+                with ocr_lock:
+                    return get_ocr_engine(gpu=True).run_ocr(img)
             except Exception as e:
                 print(f"OCR processing failed: {e}")
-                ocr_result = None
+                return None
+        
+        def archive(results):
+            # Keep the job's output directory complete, off the response path
+            import shutil
+            for path in set(static_paths.values()):
+                shutil.copy(path, os.path.join(output_dir, os.path.basename(path)))
         
-        # Encode images to base64
-        original_b64 = encode_image_to_base64(original_path)
-        deblurred_b64 = encode_image_to_base64(deblurred_path) if deblurred_path else original_b64
-        enhanced_b64 = encode_image_to_base64(enhanced_path)
-        comparison_b64 = encode_image_to_base64(comparison_path)
+        graph = StageGraph()
+        graph.add("load", load)
+        graph.add("blur", detect_blur, deps=["load"])
+        graph.add("ocr_original", lambda results: run_ocr(results["load"]), deps=["load"])
+        graph.add("save_original", lambda results: save("original", results["load"]), deps=["load"])
+        graph.add("deblur", deblur, deps=["load", "blur"])
+        graph.add("save_deblurred", save_deblurred, deps=["deblur", "save_original"])
+        graph.add("enhance", enhance, deps=["load", "deblur"])
+        graph.add("save_enhanced", lambda results: save("enhanced", results["enhance"]), deps=["enhance"])
+        graph.add("ocr_enhanced", lambda results: run_ocr(results["enhance"]), deps=["enhance"])
+        graph.add("archive", archive, deps=["save_original", "save_deblurred", "save_enhanced"], background=True)
+        # Stages that can run at the same time split this request's CPU thread share
+        results, stage_timings = graph.run(thread_limit=current_thread_limit())
+        
+        lap_var, edge_density, level = results["blur"]
+        deblurred_fraction = results["deblur"][1]
+        
+        # OCR comparison
+        ocr_result = None
+        confidence_level = None
+        blur_ocr, enhanced_ocr = results["ocr_original"], results["ocr_enhanced"]
+        if blur_ocr is not None and enhanced_ocr is not None:
+            blur_avg = avg_confidence(blur_ocr)
+            enhanced_avg = avg_confidence(enhanced_ocr)
+            
+            ocr_result = {
+                "blur_confidence": round(blur_avg, 3),
+                "enhanced_confidence": round(enhanced_avg, 3),
+                "improvement": round(enhanced_avg - blur_avg, 3),
+                "blur_text_count": len(blur_ocr),
+                "enhanced_text_count": len(enhanced_ocr)
+            }
+            confidence_level = round(enhanced_avg, 3)
+        
+        # Inline downscaled previews instead of the full-resolution PNGs
+        images = {
+            "original": results["save_original"],
+            "deblurred": results["save_deblurred"],
+            "enhanced": results["save_enhanced"]
+        }
+        previews = {name: preview_urls(f"{job_id}/{Path(path).name}") for name, path in static_paths.items()}
         
         # Return results
         result = {
@@ -143,35 +327,23 @@ def process_single_frame_helper(input_path, output_dir, job_id):
             "blur_detection": {
                 "level": level,
                 "laplacian_variance": round(lap_var, 2),
-                "edge_density": round(edge_density, 4)
-            },
-            "images": {
-                "original": original_b64,
-                "deblurred": deblurred_b64,
-                "enhanced": enhanced_b64,
-                "comparison": comparison_b64
+                "edge_density": round(edge_density, 4),
+                "deblurred_pixel_fraction": round(deblurred_fraction, 4)
             },
+            "images": images,
+            "image_format": default_preview_format(),
+            "previews": previews,
             "image_paths": {
                 "original": f"/static/results/{job_id}/0_original.png",
                 "deblurred": f"/static/results/{job_id}/1_deblurred.png",
                 "enhanced": f"/static/results/{job_id}/2_enhanced.png",
-                "comparison": f"/static/results/{job_id}/3_comparison.png"
+                "comparison": comparison_url(job_id, stages=("original", "deblurred", "enhanced"))
             },
             "ocr_result": ocr_result,
-            "confidence_level": confidence_level
+            "confidence_level": confidence_level,
+            "stage_timings": stage_timings
         }
         
-        # Copy files to static directory for serving
-        static_dir = os.path.join('static', 'results', job_id)
-        os.makedirs(static_dir, exist_ok=True)
-        
-        import shutil
-        shutil.copy(original_path, os.path.join(static_dir, "0_original.png"))
-        if deblurred_path and deblurred_path != original_path:
-            shutil.copy(deblurred_path, os.path.join(static_dir, "1_deblurred.png"))
-        shutil.copy(enhanced_path, os.path.join(static_dir, "2_enhanced.png"))
-        shutil.copy(comparison_path, os.path.join(static_dir, "3_comparison.png"))
-        
         processing_jobs[job_id] = result
         return result
         
@@ -183,130 +355,129 @@ def process_single_frame_helper(input_path, output_dir, job_id):
         }
         raise
 
-def process_video_helper(input_path, output_path, job_id):
+def process_video_helper(input_path, output_path, job_id, deblur_variant=None, enhance_tier=None,
+                         enhance_mode="full", calibrate_blur=False, spatial_deblur=False, sample_fps=None,
+                         client_id=None):
     """Helper function to process video and return sample frames."""
     try:
-        # Process video (this will save frames to frames/ directory)
-        process_video(
+        # Process video (stage images go to the job's frame store)
+        video_stats = process_video(
             input_path=input_path,
             output_path=output_path,
             enhance_scale=2,
             skip_frames=1,
-            process_blurred_only=True
+            process_blurred_only=True,
+            deblur_variant=deblur_variant,
+            enhance_tier=enhance_tier,
+            enhance_mode=enhance_mode,
+            calibrate_blur=calibrate_blur,
+            spatial_deblur=spatial_deblur,
+            sample_fps=sample_fps,
+            inference_client=get_inference_client(),
+            resume=True,
+            # One scheduler slot per frame, so interactive frames preempt between frames
+            frame_slot=lambda: get_job_scheduler().slot("batch", client_id)
         )
+        if video_stats is None:
+            raise ValueError("Video processing failed")
         
-        # Get sample frames (10 frames evenly distributed)
-        frames_dir = Path("frames")
-        original_dir = frames_dir / "original"
-        enhanced_dir = frames_dir / "enhanced"
-        blurred_dir = frames_dir / "blurred"
-        deblurred_dir = frames_dir / "deblurred"
+        # Per-frame results come from the manifest written by process_video, so
+        # blur levels and OCR are not recomputed here
+        records = video_stats.get("frames")
+        if records is None:
+            records = read_manifest(video_stats.get("manifest_path") or manifest_path_for(output_path))
+        records = {record["frame_id"]: record for record in records}
         
-        # Get all frame files
-        frame_files = sorted([f for f in os.listdir(original_dir) if f.endswith('.png')])
-        
-        if not frame_files:
+        if not records:
             raise ValueError("No frames were processed")
         
-        # Select 10 evenly distributed frames
-        total_frames = len(frame_files)
-        if total_frames > 0:
-            step = max(1, total_frames // 10)
-            selected_frames = frame_files[::step][:10]
+        # Select 10 frames: one per shot when the scene index exists, else evenly distributed.
+        # Frames that already have OCR results are preferred as candidates.
+        total_frames = len(records)
+        frame_ids = sorted(records)
+        candidates = [i for i in frame_ids if records[i].get("ocr")] or frame_ids
+        scene_index = load_scene_index(scene_index_path_for(output_path))
+        if scene_index:
+            selected_ids = select_sample_frames(scene_index, candidates, 10)
         else:
-            selected_frames = []
+            step = max(1, len(candidates) // 10)
+            selected_ids = candidates[::step][:10]
         
         sample_frames = []
-        
-        for frame_file in selected_frames:
-            frame_id = frame_file.replace('.png', '')
-            
-            # Load images
-            original_path = original_dir / frame_file
-            enhanced_path = enhanced_dir / frame_file
-            blurred_path = blurred_dir / frame_file if (blurred_dir / frame_file).exists() else None
-            deblurred_path = deblurred_dir / frame_file if (deblurred_dir / frame_file).exists() else None
-            
-            # Use blurred if exists, otherwise original
-            blur_img_path = blurred_path if blurred_path else original_path
-            before_img = cv2.imread(str(blur_img_path))
-            enhanced_img = cv2.imread(str(enhanced_path))
+        static_dir = Path('static') / 'results' / job_id / 'frames'
+        static_dir.mkdir(parents=True, exist_ok=True)
+        store_path = video_stats.get("frame_store_path") or frame_store_path_for(output_path)
+        # Held while the samples are decoded, so a reopen of the store cannot close it mid-read
+        with frame_store_reader(store_path) as store:
+            if store is None:
+                raise ValueError("Frame store not found")
             
-            if before_img is None or enhanced_img is None:
-                continue
-            
-            # Create comparison
-            comparison = create_comparison(before_img, before_img, enhanced_img)
-            
-            # Save comparison to static
-            static_dir = Path('static') / 'results' / job_id / 'frames'
-            static_dir.mkdir(parents=True, exist_ok=True)
-            
-            comparison_path = static_dir / f"comparison_{frame_id}.png"
-            cv2.imwrite(str(comparison_path), comparison)
-            
-            # Also save individual images
-            before_save_path = static_dir / f"{frame_id}_before.png"
-            enhanced_save_path = static_dir / f"{frame_id}_enhanced.png"
-            cv2.imwrite(str(before_save_path), before_img)
-            cv2.imwrite(str(enhanced_save_path), enhanced_img)
-            
-            # Get blur level
-            level = blur_level(before_img)
-            
-            # OCR result if available
-            ocr_result = None
-            confidence_level = None
-            try:
-                from ocr.ocr_engine import get_ocr_engine, avg_confidence
-                ocr_engine = get_ocr_engine(gpu=True)
+            for frame_number in selected_ids:
+                record = records[frame_number]
+                frame_id = f"{frame_number:06d}"
                 
-                blur_ocr = ocr_engine.run_ocr(before_img)
-                enhanced_ocr = ocr_engine.run_ocr(enhanced_img)
+                # Before = the frame as decoded (blurred input), enhanced = final output
+                before_img = store.get(frame_number, "original")
+                enhanced_img = store.get(frame_number, "enhanced")
+                if before_img is None or enhanced_img is None:
+                    continue
                 
-                blur_avg = avg_confidence(blur_ocr)
-                enhanced_avg = avg_confidence(enhanced_ocr)
+                # Full-resolution PNGs for download; previews are made from the decoded images
+                before_save_path = static_dir / f"{frame_id}_before.png"
+                enhanced_save_path = static_dir / f"{frame_id}_enhanced.png"
+                cv2.imwrite(str(before_save_path), before_img)
+                cv2.imwrite(str(enhanced_save_path), enhanced_img)
                 
-                ocr_result = {
-                    "blur_confidence": round(blur_avg, 3),
-                    "enhanced_confidence": round(enhanced_avg, 3),
-                    "improvement": round(enhanced_avg - blur_avg, 3)
-                }
-                confidence_level = round(enhanced_avg, 3)
-            except Exception as e:
-                print(f"OCR processing failed for frame {frame_id}: {e}")
-            
-            # Encode images
-            before_b64 = encode_image_to_base64(str(blur_img_path))
-            enhanced_b64 = encode_image_to_base64(str(enhanced_path))
-            comparison_b64 = encode_image_to_base64(str(comparison_path))
-            
-            sample_frames.append({
-                "frame_id": frame_id,
-                "frame_number": int(frame_id),
-                "blur_level": level,
-                "images": {
-                    "before": before_b64,
-                    "enhanced": enhanced_b64,
-                    "comparison": comparison_b64
-                },
-                "image_paths": {
-                    "before": f"/static/results/{job_id}/frames/{frame_id}_before.png",
-                    "enhanced": f"/static/results/{job_id}/frames/{frame_id}_enhanced.png",
-                    "comparison": f"/static/results/{job_id}/frames/comparison_{frame_id}.png"
-                },
-                "ocr_result": ocr_result,
-                "confidence_level": confidence_level
-            })
+                # OCR result if the pipeline ran OCR on this frame
+                ocr_result = None
+                confidence_level = None
+                ocr = record.get("ocr")
+                if ocr:
+                    ocr_result = {
+                        "blur_confidence": ocr["blur_confidence"],
+                        "enhanced_confidence": ocr["enhanced_confidence"],
+                        "improvement": ocr["improvement"]
+                    }
+                    confidence_level = ocr["enhanced_confidence"]
+                
+                # Encode downscaled previews
+                before_b64 = encode_preview_to_base64(before_save_path, img=before_img)
+                enhanced_b64 = encode_preview_to_base64(enhanced_save_path, img=enhanced_img)
+                
+                sample_frames.append({
+                    "frame_id": frame_id,
+                    "frame_number": frame_number,
+                    "blur_level": record["blur_level"],
+                    "images": {
+                        "before": before_b64,
+                        "enhanced": enhanced_b64
+                    },
+                    "previews": {
+                        "before": preview_urls(f"{job_id}/frames/{frame_id}_before.png"),
+                        "enhanced": preview_urls(f"{job_id}/frames/{frame_id}_enhanced.png")
+                    },
+                    "image_paths": {
+                        "before": f"/static/results/{job_id}/frames/{frame_id}_before.png",
+                        "enhanced": f"/static/results/{job_id}/frames/{frame_id}_enhanced.png",
+                        "comparison": comparison_url(job_id, frame_number)
+                    },
+                    "ocr_result": ocr_result,
+                    "confidence_level": confidence_level
+                })
         
         result = {
             "job_id": job_id,
             "status": "completed",
             "total_frames": total_frames,
-            "processed_frames": len(selected_frames),
+            "processed_frames": len(selected_ids),
             "sample_frames": sample_frames,
+            "image_format": default_preview_format(),
+            "deblurred_pixel_fraction": video_stats["deblurred_pixel_fraction"],
+            "deblur_passes": video_stats["deblur_passes"],
             "output_video": output_path
         }
+        if "deblur_passes_avoided" in video_stats:
+            result["deblur_passes_avoided"] = video_stats["deblur_passes_avoided"]
         
         processing_jobs[job_id] = result
         return result
@@ -336,6 +507,10 @@ def process_frame():
     if not allowed_file(file.filename, ALLOWED_IMAGE_EXTENSIONS):
         return jsonify({"error": "Invalid file type. Allowed: PNG, JPG, JPEG"}), 400
     
+    options, error = parse_processing_options(request.form)
+    if error:
+        return jsonify({"error": error}), 400
+    
     # Generate unique job ID
     job_id = str(uuid.uuid4())
     upload_dir = os.path.join(UPLOAD_FOLDER, job_id)
@@ -351,10 +526,15 @@ def process_frame():
     # Update job status
     processing_jobs[job_id] = {"job_id": job_id, "status": "processing"}
     
-    # Process in background thread
+    # Process in background thread, ahead of any video frames waiting for the models
+    client_id = request_client_id()
     def process():
         try:
-            process_single_frame_helper(input_path, output_dir, job_id)
+            # The slot is given back after enhancement (or here, if restoration fails)
+            with get_job_scheduler().hold("interactive", client_id) as model_slot, \
+                    get_thread_governor().register(f"frame:{job_id}", priority="interactive") as lease:
+                lease.apply()
+                process_single_frame_helper(input_path, output_dir, job_id, model_slot=model_slot, **options)
         except Exception as e:
             processing_jobs[job_id] = {
                 "job_id": job_id,
@@ -385,26 +565,46 @@ def process_video_endpoint():
     if not allowed_file(file.filename, ALLOWED_VIDEO_EXTENSIONS):
         return jsonify({"error": "Invalid file type. Allowed: MP4, AVI, MOV, MKV"}), 400
     
+    options, error = parse_processing_options(request.form, video=True)
+    if error:
+        return jsonify({"error": error}), 400
+    
     # Generate unique job ID
     job_id = str(uuid.uuid4())
     upload_dir = os.path.join(UPLOAD_FOLDER, job_id)
-    output_dir = os.path.join(OUTPUT_FOLDER, job_id)
     os.makedirs(upload_dir, exist_ok=True)
-    os.makedirs(output_dir, exist_ok=True)
     
     # Save uploaded file
     filename = secure_filename(file.filename)
     input_path = os.path.join(upload_dir, filename)
-    output_path = os.path.join(output_dir, "output.mp4")
     file.save(input_path)
     
+    start_video_job(job_id, input_path, options, request_client_id())
+    
+    # Return immediately with job ID
+    return jsonify({
+        "job_id": job_id,
+        "status": "processing",
+        "message": "Video processing started"
+    }), 202
+
+def start_video_job(job_id, input_path, options, client_id=None):
+    """Start (or resume from its last checkpoint) processing an uploaded video in a background thread."""
+    output_dir = os.path.join(OUTPUT_FOLDER, job_id)
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, "output.mp4")
+    
+    # Remember how the job was started, so it can be restarted after a server restart
+    with open(os.path.join(output_dir, "job.json"), "w", encoding="utf-8") as f:
+        json.dump({"input_path": str(input_path), "options": options, "client_id": client_id}, f)
+    
     # Update job status
     processing_jobs[job_id] = {"job_id": job_id, "status": "processing"}
     
     # Process in background thread
     def process():
         try:
-            process_video_helper(input_path, output_path, job_id)
+            process_video_helper(input_path, output_path, job_id, client_id=client_id, **options)
         except Exception as e:
             processing_jobs[job_id] = {
                 "job_id": job_id,
@@ -414,14 +614,111 @@ def process_video_endpoint():
     
     thread = threading.Thread(target=process)
     thread.start()
+
+def _warm_models_for_upload(upload_id, prefix_info):
+    """Load the restoration models while the rest of a decodable upload arrives."""
+    print(f"[INFO] Upload {upload_id}: prefix decodable "
+          f"({prefix_info['width']}x{prefix_info['height']} @ {prefix_info['fps']:.1f} FPS), warming models")
+    try:
+        from deblur.nafnet_infer import get_deblur_model
+        from enhancement.realesrgan_infer import get_enhancer_model
+        # Under a queue of video frames this waits at most about PRIORITY_AGING_S before aging into "batch"
+        with get_job_scheduler().slot("background", upload_id):
+            get_deblur_model()
+            get_enhancer_model(scale=2)
+    except Exception as e:
+        print(f"[WARNING] Model warm-up failed: {e}")
+
+upload_manager = UploadManager(UPLOAD_FOLDER, on_prefix=_warm_models_for_upload)
+
+def _upload_error(error):
+    body = {"error": str(error)}
+    body.update(error.extra)
+    return jsonify(body), error.status
+
+@app.route('/api/upload/init', methods=['POST'])
+def upload_init():
+    """Start a chunked video upload."""
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename') or '')
+    if not filename or not allowed_file(filename, ALLOWED_VIDEO_EXTENSIONS):
+        return jsonify({"error": "Invalid file type. Allowed: MP4, AVI, MOV, MKV"}), 400
+    
+    job_id = str(uuid.uuid4())
+    try:
+        session = upload_manager.create(job_id, filename, data.get('total_size'), data.get('sha256'))
+    except UploadError as e:
+        return _upload_error(e)
+    
+    return jsonify(dict(session.status(), upload_id=job_id, chunk_size=UPLOAD_CHUNK_SIZE)), 201
+
+@app.route('/api/upload/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    """Committed offset of a chunked upload, used to resume."""
+    try:
+        session = upload_manager.get(upload_id)
+    except UploadError as e:
+        return _upload_error(e)
+    return jsonify(dict(session.status(), upload_id=upload_id)), 200
+
+@app.route('/api/upload/<upload_id>/append', methods=['PUT', 'POST'])
+def upload_append(upload_id):
+    """Append the request body at ?offset= (or the Upload-Offset header)."""
+    offset = request.args.get('offset', request.headers.get('Upload-Offset'))
+    try:
+        offset = int(offset)
+    except (TypeError, ValueError):
+        return jsonify({"error": "offset is required"}), 400
+    
+    try:
+        new_offset = upload_manager.append(upload_id, request.stream, offset)
+    except UploadError as e:
+        return _upload_error(e)
+    return jsonify({"upload_id": upload_id, "offset": new_offset}), 200
+
+@app.route('/api/upload/<upload_id>/complete', methods=['POST'])
+def upload_complete(upload_id):
+    """Verify a finished chunked upload and start processing it."""
+    options, error = parse_processing_options(request.get_json(silent=True) or {}, video=True)
+    if error:
+        return jsonify({"error": error}), 400
+    
+    try:
+        input_path = upload_manager.get(upload_id).complete()
+    except UploadError as e:
+        return _upload_error(e)
+    
+    if upload_id not in processing_jobs:
+        start_video_job(upload_id, str(input_path), options, request_client_id())
     
-    # Return immediately with job ID
     return jsonify({
-        "job_id": job_id,
+        "job_id": upload_id,
         "status": "processing",
         "message": "Video processing started"
     }), 202
 
+@app.route('/api/jobs/<job_id>/resume', methods=['POST'])
+def resume_job(job_id):
+    """Restart an interrupted video job; it continues from its last checkpoint."""
+    if processing_jobs.get(job_id, {}).get("status") == "processing":
+        return jsonify({"error": "Job is already running"}), 409
+    
+    job_file = os.path.join(OUTPUT_FOLDER, secure_filename(job_id), "job.json")
+    if not os.path.exists(job_file):
+        return jsonify({"error": "Job not found"}), 404
+    with open(job_file, "r", encoding="utf-8") as f:
+        job = json.load(f)
+    if not os.path.exists(job["input_path"]):
+        return jsonify({"error": "Input video for this job no longer exists"}), 410
+    
+    start_video_job(job_id, job["input_path"], job["options"], job.get("client_id"))
+    return jsonify({
+        "job_id": job_id,
+        "status": "processing",
+        "resumed": checkpoint_path_for(job_output_path(job_id)).exists(),
+        "message": "Video processing restarted"
+    }), 202
+
 @app.route('/api/status/<job_id>', methods=['GET'])
 def get_status(job_id):
     """Get processing status for a job."""
@@ -448,6 +745,106 @@ def get_result(job_id):
     
     return jsonify(result), 200
 
+@app.route('/api/jobs/<job_id>/search', methods=['GET'])
+def search_job_text(job_id):
+    """Search the OCR text of a processed video (?q=, optional ?limit=)."""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Missing query parameter q"}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', 50)), 500))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    
+    if job_id in processing_jobs and processing_jobs[job_id].get("status") == "processing":
+        return jsonify({"job_id": job_id, "status": "processing",
+                        "message": "Processing is still in progress"}), 202
+    
+    started = time.perf_counter()
+    index = get_text_index(job_id)
+    if index is None:
+        return jsonify({"error": "No text index for this job"}), 404
+    
+    tracks = index.search(query, limit=limit)
+    return jsonify({
+        "job_id": job_id,
+        "query": query,
+        "count": len(tracks),
+        "results": tracks,
+        "took_ms": round((time.perf_counter() - started) * 1000.0, 3)
+    }), 200
+
+@app.route('/api/preview/<path:filename>', methods=['GET'])
+def serve_preview(filename):
+    """
+    Serve a result image at a preview size (?size=thumb|medium|large, ?format=webp|jpeg).
+    
+    Previews are generated on first request and cached; ?size=full downloads the PNG.
+    """
+    static_path = (Path(__file__).parent / 'static' / 'results').resolve()
+    file_path = (static_path / filename).resolve()
+    if static_path not in file_path.parents or not file_path.is_file():
+        return jsonify({"error": "File not found"}), 404
+    
+    size = request.args.get('size', DEFAULT_PREVIEW_SIZE)
+    if size == 'full':
+        return send_from_directory(str(file_path.parent), file_path.name, as_attachment=True)
+    if size not in PREVIEW_SIZES:
+        return jsonify({"error": f"Invalid size. Allowed: {', '.join(PREVIEW_SIZES)}, full"}), 400
+    fmt = request.args.get('format') or default_preview_format()
+    if fmt not in ('webp', 'jpeg'):
+        return jsonify({"error": "Invalid format. Allowed: webp, jpeg"}), 400
+    
+    try:
+        preview_path = get_preview(file_path, size, fmt)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 415
+    if preview_path is None:
+        return jsonify({"error": "File not found"}), 404
+    response = send_from_directory(str(preview_path.parent), preview_path.name, mimetype=preview_mimetype(fmt))
+    response.headers['Cache-Control'] = 'public, max-age=86400'
+    return response
+
+@app.route('/api/jobs/<job_id>/comparison', methods=['GET'])
+def render_job_comparison(job_id):
+    """
+    Render a comparison on request and cache it.
+    
+    Query: stages (comma list of original, deblurred, enhanced), frame (video
+    frame id), layout (horizontal, vertical, grid), size (long side px),
+    format (webp, jpeg, png).
+    """
+    stages = [s.strip() for s in request.args.get('stages', 'original,deblurred,enhanced').split(',') if s.strip()]
+    layout = request.args.get('layout', 'horizontal')
+    fmt = request.args.get('format') or None
+    if layout not in COMPARISON_LAYOUTS:
+        return jsonify({"error": f"Invalid layout. Allowed: {', '.join(COMPARISON_LAYOUTS)}"}), 400
+    if fmt and fmt not in ('webp', 'jpeg', 'png'):
+        return jsonify({"error": "Invalid format. Allowed: webp, jpeg, png"}), 400
+    try:
+        size = int(request.args.get('size', DEFAULT_COMPARISON_SIZE))
+        frame = request.args.get('frame')
+        frame = int(frame) if frame not in (None, '') else None
+    except ValueError:
+        return jsonify({"error": "size and frame must be integers"}), 400
+    if not 64 <= size <= MAX_COMPARISON_SIZE:
+        return jsonify({"error": f"size must be between 64 and {MAX_COMPARISON_SIZE}"}), 400
+    
+    sources = comparison_sources(job_id, frame)
+    missing = [stage for stage in stages if stage not in sources]
+    if not stages or missing:
+        return jsonify({"error": "Stage images not found", "missing": missing,
+                        "available": sorted(sources)}), 404
+    
+    try:
+        data, fmt, cache_hit = get_comparison([(stage, sources[stage]) for stage in stages], layout, size, fmt)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 500
+    response = app.response_class(data, mimetype=preview_mimetype(fmt) if fmt != 'png' else 'image/png')
+    response.headers['Cache-Control'] = 'public, max-age=3600'
+    response.headers['X-Cache'] = 'HIT' if cache_hit else 'MISS'
+    return response
+
 @app.route('/static/results/<path:filename>')
 def serve_result(filename):
     """Serve result images."""
@@ -461,12 +858,29 @@ def serve_result(filename):
     else:
         return jsonify({"error": "File not found"}), 404
 
+@app.route('/api/inference/metrics', methods=['GET'])
+def inference_metrics():
+    """Batch-size and latency/SLO metrics of the shared inference server."""
+    try:
+        client = get_inference_client()
+        if client is None:
+            return jsonify({"error": "Inference server not configured (set INFERENCE_SERVER_ADDRESS)"}), 404
+        return jsonify(client.metrics()), 200
+    except (OSError, RuntimeError, TimeoutError) as e:
+        return jsonify({"error": f"Inference server unavailable: {e}"}), 503
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
     return jsonify({
         "status": "healthy",
-        "timestamp": datetime.now().isoformat()
+        "timestamp": datetime.now().isoformat(),
+        "comparison_cache": comparison_cache_stats(),
+        "scheduler": get_job_scheduler().metrics(),
+        "threads": get_thread_governor().allocation(),
+        "memory": memory_usage_mb(),
+        "weights": weight_load_stats(),
+        "inference_server": os.environ.get("INFERENCE_SERVER_ADDRESS")
     }), 200
 
 if __name__ == '__main__':
@@ -0,0 +1,52 @@
+"""
+Feathered blending of processed crops back into a frame.
+
+Shared by the restoration stages that run a model on part of a frame only
+(blurred tiles for deblur, text regions for enhancement): the crop is taken
+with some context and blended in with a mask that ramps over that context,
+so no seam is visible where processed and untouched pixels meet.
+"""
+import numpy as np
+
+
+def feather_mask(height, width, feather, open_edges):
+    """
+    Build a blending mask that ramps from 0 at a crop's border to 1 inside.
+
+    Args:
+        height: Mask height
+        width: Mask width
+        feather: Ramp length in pixels
+        open_edges: (top, bottom, left, right) booleans; edges on the frame
+                    border are not feathered
+
+    Returns:
+        float32 mask of shape (height, width, 1)
+    """
+    top, bottom, left, right = open_edges
+    feather = max(1, feather)
+    ys = np.arange(height, dtype=np.float32)
+    xs = np.arange(width, dtype=np.float32)
+    ramp_y = np.ones(height, dtype=np.float32)
+    ramp_x = np.ones(width, dtype=np.float32)
+    if top:
+        ramp_y = np.minimum(ramp_y, (ys + 1) / feather)
+    if bottom:
+        ramp_y = np.minimum(ramp_y, (height - ys) / feather)
+    if left:
+        ramp_x = np.minimum(ramp_x, (xs + 1) / feather)
+    if right:
+        ramp_x = np.minimum(ramp_x, (width - xs) / feather)
+    mask = np.minimum(ramp_y[:, None], ramp_x[None, :])
+    return np.clip(mask, 0.0, 1.0)[..., None]
+
+
+def feather_blend(base, patch, mask):
+    """
+    Blend ``patch`` over ``base`` (same shape, uint8) with a feather mask.
+
+    Returns:
+        uint8 array: patch * mask + base * (1 - mask)
+    """
+    blended = patch.astype(np.float32) * mask + base.astype(np.float32) * (1.0 - mask)
+    return np.clip(blended, 0, 255).round().astype(np.uint8)
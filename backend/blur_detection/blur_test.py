@@ -2,6 +2,25 @@ import cv2
 import numpy as np
 
 
+# Fixed thresholds on raw Laplacian variance (tuned on our original footage)
+FIXED_LOW_THRESHOLD = 1080
+FIXED_HIGH_THRESHOLD = 40
+
+# Fixed thresholds carried over to the normalized score scale. Calibrated
+# thresholds are clamped to CALIBRATION_RANGE times these, so a video that is
+# blurred throughout cannot calibrate its own blur away.
+FIXED_NORMALIZED_LOW_THRESHOLD = float(FIXED_LOW_THRESHOLD)
+FIXED_NORMALIZED_HIGH_THRESHOLD = float(FIXED_HIGH_THRESHOLD)
+CALIBRATION_RANGE = (0.25, 2.0)
+
+# Normalized scores are measured with the long side resized to this many pixels
+REFERENCE_LONG_SIDE = 1024
+# Variance of the 4-neighbour Laplacian applied to i.i.d. noise of unit variance
+LAPLACIAN_NOISE_GAIN = 20.0
+
+DEBLUR_PASSES = {"low": 0, "medium": 1, "high": 2}
+
+
 def blur_score(image):
     """
     Calculate blur score using Laplacian variance and edge density.
@@ -24,23 +43,231 @@ def blur_score(image):
     return lap_var, edge_density
 
 
-def blur_level(image):
+def estimate_noise_sigma(gray):
+    """
+    Estimate Gaussian noise sigma of a grayscale image (Immerkaer's method).
+    
+    Args:
+        gray: Grayscale image
+    
+    Returns:
+        float: Estimated noise standard deviation
+    """
+    h, w = gray.shape[:2]
+    if h < 3 or w < 3:
+        return 0.0
+    kernel = np.array([[1, -2, 1],
+                       [-2, 4, -2],
+                       [1, -2, 1]], dtype=np.float64)
+    response = cv2.filter2D(gray.astype(np.float64), -1, kernel)[1:-1, 1:-1]
+    return float(np.sqrt(np.pi / 2.0) * np.abs(response).sum() / (6.0 * (w - 2) * (h - 2)))
+
+
+def normalized_blur_score(image):
+    """
+    Resolution- and noise-normalized sharpness score.
+    
+    The frame is resized to REFERENCE_LONG_SIDE so scores from different
+    resolutions are comparable, and the Laplacian variance explained by
+    sensor/compression noise is subtracted.
+    
+    Args:
+        image: Input image (BGR format)
+    
+    Returns:
+        float: Normalized Laplacian variance (higher = sharper)
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    h, w = gray.shape[:2]
+    ratio = REFERENCE_LONG_SIDE / float(max(h, w))
+    if ratio != 1.0:
+        interpolation = cv2.INTER_AREA if ratio < 1.0 else cv2.INTER_CUBIC
+        gray = cv2.resize(gray, (max(1, int(w * ratio)), max(1, int(h * ratio))), interpolation=interpolation)
+
+    lap_var = cv2.Laplacian(gray, cv2.CV_64F).var()
+    sigma = estimate_noise_sigma(gray)
+    return max(lap_var - LAPLACIAN_NOISE_GAIN * sigma ** 2, 0.0)
+
+
+def calibrate_thresholds(scores, sharp_quantile=90, low_ratio=0.5, high_ratio=0.1, clamp=CALIBRATION_RANGE):
+    """
+    Derive per-video thresholds from a distribution of normalized scores.
+    
+    The sharpest frames of a video (``sharp_quantile``) act as its reference:
+    frames keeping at least ``low_ratio`` of that sharpness are "low" blur,
+    frames below ``high_ratio`` of it are "high" blur. Both thresholds are then
+    clamped to ``clamp`` times the fixed normalized thresholds, since a video
+    whose sharpest frames are still blurred has no sharp reference.
+    
+    Args:
+        scores: Normalized blur scores of sampled frames
+        sharp_quantile: Percentile used as the sharp reference (default: 90)
+        low_ratio: Fraction of the reference above which blur is "low" (default: 0.5)
+        high_ratio: Fraction of the reference below which blur is "high" (default: 0.1)
+        clamp: (min, max) factors of the fixed normalized thresholds (default: CALIBRATION_RANGE)
+    
+    Returns:
+        dict: {"normalized": True, "low": float, "high": float, "reference": float, "clamped": bool}
+    """
+    def bounded(value, fixed):
+        return min(max(value, fixed * clamp[0]), fixed * clamp[1])
+
+    reference = float(np.percentile(scores, sharp_quantile)) if len(scores) else 0.0
+    relative = (reference * low_ratio, reference * high_ratio)
+    low = bounded(relative[0], FIXED_NORMALIZED_LOW_THRESHOLD)
+    high = bounded(relative[1], FIXED_NORMALIZED_HIGH_THRESHOLD)
+    return {
+        "normalized": True,
+        "low": low,
+        "high": high,
+        "reference": reference,
+        "clamped": (low, high) != relative,
+    }
+
+
+def blur_level(image, thresholds=None):
     """
     Determine blur level: low, medium, or high.
     
     Args:
         image: Input image (BGR format)
+        thresholds: Calibrated thresholds from calibrate_thresholds (optional,
+                    fixed raw-variance thresholds if None)
     
     Returns:
         str: 'low', 'medium', or 'high'
     """
-    lap, edge = blur_score(image)
+    return assess_blur(image, thresholds)[1]
 
+
+def assess_blur(image, thresholds=None):
+    """
+    Blur score and level in one pass (no edge-density computation).
+    
+    Args:
+        image: Input image (BGR format)
+        thresholds: Calibrated thresholds from calibrate_thresholds (optional)
+    
+    Returns:
+        tuple: (score, level) where the level is classified from the returned
+               score: the normalized score under calibrated thresholds, else
+               the raw Laplacian variance under the fixed thresholds
+    """
+    if thresholds and thresholds.get("normalized"):
+        score = normalized_blur_score(image)
+        return score, classify_score(score, thresholds["low"], thresholds["high"])
+
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    score = cv2.Laplacian(gray, cv2.CV_64F).var()
     # Tighter thresholds - only real blur gets deblurred
-    if lap > 1080:
+    return score, classify_score(score, FIXED_LOW_THRESHOLD, FIXED_HIGH_THRESHOLD)
+
+
+def fixed_normalized_level(score):
+    """
+    Level a normalized score gets under the fixed thresholds carried over to
+    that scale: the uncalibrated baseline of a calibrated run.
+    """
+    return classify_score(score, FIXED_NORMALIZED_LOW_THRESHOLD, FIXED_NORMALIZED_HIGH_THRESHOLD)
+
+
+def classify_score(score, low_threshold, high_threshold):
+    """Map a sharpness score to 'low', 'medium' or 'high' blur."""
+    if score > low_threshold:
         return "low"
-    elif lap > 40:
+    elif score > high_threshold:
         return "medium"
     else:
         return "high"
+
+
+def _tile_means(values, rows, cols):
+    """Per-tile means of a 2D array made of rows x cols equal tiles."""
+    h, w = values.shape[:2]
+    return values.reshape(rows, h // rows, cols, w // cols).mean(axis=(1, 3))
+
+
+def blur_map(image, tile=128, min_contrast=8.0, thresholds=None):
+    """
+    Tile-level blur map from local, normalized Laplacian variance.
+    
+    Tile scores are on the same scale as normalized_blur_score: the frame
+    (padded to whole tiles) is resized so its long side is about
+    REFERENCE_LONG_SIDE, and the frame's noise contribution is subtracted from
+    each tile's Laplacian variance. Levels use the calibrated thresholds when
+    given, else the fixed normalized ones.
+    
+    Flat tiles (gray std below ``min_contrast``) have low Laplacian variance
+    whether or not they are blurred, and deblurring cannot improve them, so
+    they are always classed "low".
     
+    Args:
+        image: Input image (BGR format)
+        tile: Tile edge in pixels (default: 128)
+        min_contrast: Minimum gray std for a tile to be considered (default: 8.0)
+        thresholds: Calibrated thresholds from calibrate_thresholds (optional)
+    
+    Returns:
+        dict: {"tile": int, "variance": 2D array of normalized scores, "levels": 2D array of str}
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    h, w = gray.shape[:2]
+    rows, cols = (h + tile - 1) // tile, (w + tile - 1) // tile
+
+    # Reflect-pad to whole tiles, then give every tile the same size at the reference scale
+    gray = cv2.copyMakeBorder(gray, 0, rows * tile - h, 0, cols * tile - w, cv2.BORDER_REFLECT_101)
+    ref_tile = max(8, int(round(tile * REFERENCE_LONG_SIDE / float(max(h, w)))))
+    if ref_tile != tile:
+        interpolation = cv2.INTER_AREA if ref_tile < tile else cv2.INTER_CUBIC
+        gray = cv2.resize(gray, (cols * ref_tile, rows * ref_tile), interpolation=interpolation)
+
+    lap = cv2.Laplacian(gray, cv2.CV_64F)
+    lap_mean = _tile_means(lap, rows, cols)
+    variance = np.maximum(_tile_means(lap * lap, rows, cols) - lap_mean ** 2, 0.0)
+    variance = np.maximum(variance - LAPLACIAN_NOISE_GAIN * estimate_noise_sigma(gray) ** 2, 0.0)
+
+    pixels = gray.astype(np.float64)
+    pixel_mean = _tile_means(pixels, rows, cols)
+    contrast = np.sqrt(np.maximum(_tile_means(pixels * pixels, rows, cols) - pixel_mean ** 2, 0.0))
+
+    if thresholds and thresholds.get("normalized"):
+        low, high = thresholds["low"], thresholds["high"]
+    else:
+        low, high = FIXED_NORMALIZED_LOW_THRESHOLD, FIXED_NORMALIZED_HIGH_THRESHOLD
+    levels = np.where(variance > low, "low", np.where(variance > high, "medium", "high")).astype(object)
+    levels[contrast < min_contrast] = "low"
+    return {"tile": tile, "variance": variance, "levels": levels}
+
+
+def calibrate_video(video_path, samples=30):
+    """
+    Calibrate blur thresholds for a video from an evenly sampled frame subset.
+    
+    The deblur passes this saves are counted during the run (see process_video).
+    
+    Args:
+        video_path: Path to input video
+        samples: Number of frames to sample (default: 30)
+    
+    Returns:
+        dict: {"thresholds", "sampled_frames"}
+    """
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video {video_path}")
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    frame_ids = sorted({int(x) for x in np.linspace(0, max(total_frames - 1, 0), samples)})
+    scores = []
+    for frame_id in frame_ids:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_id)
+        ret, frame = cap.read()
+        if not ret:
+            continue
+        scores.append(normalized_blur_score(frame))
+    cap.release()
+
+    return {
+        "thresholds": calibrate_thresholds(scores),
+        "sampled_frames": len(scores),
+    }
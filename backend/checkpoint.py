@@ -0,0 +1,118 @@
+"""
+Checkpoints for resumable video jobs.
+
+process_video periodically records how far it got next to the job's output
+video: the last committed frame id, the frame store size at that point,
+counters and OCR state (per-shot cadence counts and frames still in flight).
+Manifest records and OCR results grow with the video, so they are appended to
+a journal (JSONL) instead: each checkpoint writes only the entries since the
+previous one and records the journal size it covers. A restarted job with the same input
+and parameters continues after the last committed frame instead of starting
+over; the output video prefix is re-encoded from the lossless enhanced frames
+in the frame store, so no model pass is repeated.
+"""
+import json
+import os
+from pathlib import Path
+
+
+CHECKPOINT_VERSION = 2
+# Checkpoint after this many processed frames or seconds, whichever comes first
+CHECKPOINT_FRAMES = 100
+CHECKPOINT_SECONDS = 30.0
+
+
+def checkpoint_path_for(output_path):
+    """Checkpoint location for a job, next to its output video."""
+    output_path = Path(output_path)
+    return output_path.with_name(output_path.stem + ".checkpoint.json")
+
+
+def journal_path_for(checkpoint_path):
+    """Journal location for a checkpoint."""
+    checkpoint_path = Path(checkpoint_path)
+    return checkpoint_path.with_name(checkpoint_path.stem + ".journal.jsonl")
+
+
+def job_signature(input_path, params):
+    """
+    Identity of a run: a checkpoint is only resumed by a run with the same signature.
+
+    Args:
+        input_path: Input video path
+        params: JSON-serializable dict of the parameters that affect the output
+
+    Returns:
+        dict
+    """
+    stat = Path(input_path).stat()
+    return {
+        "version": CHECKPOINT_VERSION,
+        "input": str(input_path),
+        "input_size": stat.st_size,
+        "input_mtime": stat.st_mtime,
+        "params": params,
+    }
+
+
+def save_checkpoint(state, path):
+    """Atomically write a checkpoint (a crash mid-write keeps the previous one)."""
+    tmp = Path(str(path) + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path, signature):
+    """Checkpoint at ``path`` if it was written by a run with ``signature``, else None."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[WARNING] Ignoring unreadable checkpoint {path}: {e}")
+        return None
+    if state.get("signature") != signature:
+        print(f"[INFO] Checkpoint {path} is for a different input or parameters; starting over")
+        return None
+    return state
+
+
+def append_journal(path, entries):
+    """
+    Append JSON entries to a journal and make them durable.
+
+    Returns:
+        int: Journal size in bytes, to be recorded in the checkpoint written next
+    """
+    with open(path, "a", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+        return f.tell()
+
+
+def load_journal(path, size):
+    """
+    Entries of a journal up to ``size`` bytes (the size a checkpoint recorded).
+
+    Anything appended after that checkpoint is truncated, so the resumed run
+    appends right after the entries it replays.
+    """
+    path = Path(path)
+    if not path.exists():
+        return []
+    with open(path, "r+b") as f:
+        if path.stat().st_size > size:
+            f.truncate(size)
+        return [json.loads(line) for line in f.read().decode("utf-8").splitlines() if line.strip()]
+
+
+def remove_checkpoint(path):
+    Path(path).unlink(missing_ok=True)
+    journal_path_for(path).unlink(missing_ok=True)
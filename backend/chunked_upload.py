@@ -0,0 +1,261 @@
+"""
+Chunked, resumable uploads for large videos.
+
+Protocol (see app.py routes):
+    init     -> create a session with the expected size and optional sha256
+    append   -> write bytes at the session's current offset
+    status   -> query the committed offset to resume after a network error
+    complete -> verify size and checksum, then hand the file to processing
+
+Chunks are written straight into the job's upload file; session state is
+persisted next to it so uploads survive a server restart.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import cv2
+
+
+# Bytes copied per read from the request stream
+COPY_BUFFER = 1024 * 1024
+# Received bytes after which the prefix is probed for decodable frames
+PREFIX_PROBE_BYTES = 8 * 1024 * 1024
+# Frames decoded from the prefix while the upload is still running
+PREFIX_PROBE_FRAMES = 30
+
+STATE_FILE = "upload.json"
+
+
+class UploadError(Exception):
+    """Upload protocol error with an HTTP status code."""
+
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+
+class UploadSession:
+    """State of one chunked upload, persisted as upload.json in its directory."""
+
+    def __init__(self, upload_dir, filename, total_size, sha256=None, offset=0, completed=False):
+        self.upload_dir = Path(upload_dir)
+        self.filename = filename
+        self.total_size = int(total_size)
+        self.sha256 = sha256.lower() if sha256 else None
+        self.offset = int(offset)
+        self.completed = completed
+        self.prefix = None
+        self.lock = threading.Lock()
+        self._hasher = None
+        self._hashed_offset = 0
+
+    @property
+    def part_path(self):
+        return self.upload_dir / (self.filename + ".part")
+
+    @property
+    def final_path(self):
+        return self.upload_dir / self.filename
+
+    def to_dict(self):
+        return {
+            "filename": self.filename,
+            "total_size": self.total_size,
+            "sha256": self.sha256,
+            "offset": self.offset,
+            "completed": self.completed,
+        }
+
+    def status(self):
+        status = self.to_dict()
+        status.pop("sha256")
+        status["received_fraction"] = round(self.offset / self.total_size, 4) if self.total_size else 1.0
+        if self.prefix is not None:
+            status["prefix"] = self.prefix
+        return status
+
+    def save(self):
+        tmp = self.upload_dir / (STATE_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, self.upload_dir / STATE_FILE)
+
+    @classmethod
+    def load(cls, upload_dir):
+        state_path = Path(upload_dir) / STATE_FILE
+        if not state_path.exists():
+            return None
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        session = cls(upload_dir, **state)
+        # Trust the bytes on disk over the recorded offset after a crash mid-write
+        if session.part_path.exists():
+            session.offset = min(session.offset, session.part_path.stat().st_size)
+        return session
+
+    def _sync_hasher(self):
+        """Bring the running sha256 up to the committed offset (rebuilt after restarts)."""
+        if self._hasher is None or self._hashed_offset > self.offset:
+            self._hasher = hashlib.sha256()
+            self._hashed_offset = 0
+        if self._hashed_offset < self.offset:
+            with open(self.part_path, "rb") as f:
+                f.seek(self._hashed_offset)
+                remaining = self.offset - self._hashed_offset
+                while remaining > 0:
+                    block = f.read(min(COPY_BUFFER, remaining))
+                    if not block:
+                        break
+                    self._hasher.update(block)
+                    remaining -= len(block)
+            self._hashed_offset = self.offset
+
+    def append(self, stream, offset):
+        """
+        Write a chunk from a file-like stream at ``offset``.
+
+        Args:
+            stream: Readable binary stream (e.g. request.stream)
+            offset: Offset the client believes it is writing at
+
+        Returns:
+            int: New committed offset
+        """
+        with self.lock:
+            if self.completed:
+                raise UploadError("Upload already completed", 409, offset=self.offset)
+            if offset != self.offset:
+                raise UploadError("Offset mismatch", 409, offset=self.offset)
+
+            self._sync_hasher()
+            written = 0
+            mode = "r+b" if self.part_path.exists() else "wb"
+            with open(self.part_path, mode) as f:
+                f.seek(self.offset)
+                try:
+                    while True:
+                        block = stream.read(COPY_BUFFER)
+                        if not block:
+                            break
+                        if self.offset + written + len(block) > self.total_size:
+                            raise UploadError("Chunk exceeds declared total_size", 413, offset=self.offset)
+                        f.write(block)
+                        self._hasher.update(block)
+                        written += len(block)
+                except Exception:
+                    # Drop the partial chunk; the client resumes from the committed offset
+                    f.truncate(self.offset)
+                    self._hasher = None
+                    raise
+                f.truncate(self.offset + written)
+                f.flush()
+                os.fsync(f.fileno())
+
+            self.offset += written
+            self._hashed_offset = self.offset
+            self.save()
+            return self.offset
+
+    def complete(self):
+        """
+        Verify size and checksum and move the file to its final name.
+
+        Returns:
+            Path: Final upload path
+        """
+        with self.lock:
+            if self.completed:
+                return self.final_path
+            if self.offset != self.total_size:
+                raise UploadError("Upload incomplete", 409, offset=self.offset)
+            self._sync_hasher()
+            digest = self._hasher.hexdigest()
+            if self.sha256 and digest != self.sha256:
+                raise UploadError("Checksum mismatch", 422, offset=self.offset, sha256=digest)
+
+            os.replace(self.part_path, self.final_path)
+            self.completed = True
+            self.save()
+            return self.final_path
+
+
+def probe_prefix(session, max_frames=PREFIX_PROBE_FRAMES):
+    """
+    Decode the already-received prefix of an upload while it is still running.
+
+    Containers that keep their index up front (fast-start MP4, MKV, TS) are
+    decodable from a prefix; this records the stream metadata and how many
+    frames decoded so processing problems surface before the upload ends.
+    """
+    cap = cv2.VideoCapture(str(session.part_path))
+    info = {"decodable": False, "frames_decoded": 0, "probed_at_offset": session.offset}
+    if cap.isOpened():
+        decoded = 0
+        while decoded < max_frames and cap.grab():
+            decoded += 1
+        info.update({
+            "decodable": decoded > 0,
+            "frames_decoded": decoded,
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "fps": cap.get(cv2.CAP_PROP_FPS),
+        })
+    cap.release()
+    session.prefix = info
+    return info
+
+
+class UploadManager:
+    """Registry of upload sessions under the upload folder."""
+
+    def __init__(self, upload_root, on_prefix=None):
+        self.upload_root = Path(upload_root)
+        self.sessions = {}
+        self.on_prefix = on_prefix
+        self.lock = threading.Lock()
+
+    def create(self, upload_id, filename, total_size, sha256=None):
+        try:
+            total_size = int(total_size)
+        except (TypeError, ValueError):
+            total_size = 0
+        if total_size <= 0:
+            raise UploadError("total_size must be a positive integer")
+        upload_dir = self.upload_root / upload_id
+        upload_dir.mkdir(parents=True, exist_ok=True)
+        session = UploadSession(upload_dir, filename, total_size, sha256)
+        session.save()
+        with self.lock:
+            self.sessions[upload_id] = session
+        return session
+
+    def get(self, upload_id):
+        with self.lock:
+            session = self.sessions.get(upload_id)
+            if session is None:
+                session = UploadSession.load(self.upload_root / upload_id)
+                if session is not None:
+                    self.sessions[upload_id] = session
+        if session is None:
+            raise UploadError("Upload not found", 404)
+        return session
+
+    def append(self, upload_id, stream, offset):
+        session = self.get(upload_id)
+        before = session.offset
+        offset = session.append(stream, offset)
+        if before < PREFIX_PROBE_BYTES <= offset and session.prefix is None:
+            threading.Thread(target=self._probe, args=(upload_id, session), daemon=True).start()
+        return offset
+
+    def _probe(self, upload_id, session):
+        started = time.time()
+        info = probe_prefix(session)
+        info["probe_seconds"] = round(time.time() - started, 3)
+        if self.on_prefix and info["decodable"]:
+            self.on_prefix(upload_id, info)
@@ -0,0 +1,164 @@
+"""
+On-demand comparison rendering with an LRU cache.
+
+Comparisons used to be rendered eagerly (full resolution, written as PNG) for
+every job and sample frame, even though few are ever viewed. They are now
+rendered at the requested size and layout when asked for, and the encoded
+result is kept in a bounded in-memory LRU cache.
+"""
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from frame_store import read_image, source_mtime
+from previews import default_preview_format, PREVIEW_QUALITY
+
+
+COMPARISON_LAYOUTS = ("horizontal", "vertical", "grid")
+DEFAULT_COMPARISON_SIZE = 1280
+MAX_COMPARISON_SIZE = 4096
+# LRU bounds for encoded comparisons
+COMPARISON_CACHE_ENTRIES = 256
+COMPARISON_CACHE_BYTES = 128 * 1024 * 1024
+
+STAGE_LABELS = {
+    "original": "Original",
+    "deblurred": "Deblurred",
+    "enhanced": "Enhanced",
+}
+
+_ENCODERS = {
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY),
+    "jpeg": (".jpg", cv2.IMWRITE_JPEG_QUALITY),
+    "png": (".png", None),
+}
+
+
+def _add_label(img, text):
+    cv2.putText(img, text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+    return img
+
+
+def render_comparison(images, labels, layout="horizontal", size=DEFAULT_COMPARISON_SIZE):
+    """
+    Render labelled images side by side, fitted to ``size`` on the long side.
+
+    Each image is resized straight to its final cell size, so nothing is
+    upscaled to the largest input first and downscaled again.
+
+    Args:
+        images: List of images (BGR format)
+        labels: Label per image
+        layout: "horizontal", "vertical" or "grid" (default: "horizontal")
+        size: Longest side of the rendered comparison in pixels
+
+    Returns:
+        Comparison image
+    """
+    count = len(images)
+    cols = {"horizontal": count, "vertical": 1}.get(layout, int(np.ceil(np.sqrt(count))))
+    rows = int(np.ceil(count / cols))
+
+    # Cell aspect follows the first (reference) image
+    ref_h, ref_w = images[0].shape[:2]
+    scale = size / max(ref_w * cols, ref_h * rows)
+    cell_w, cell_h = max(1, int(ref_w * scale)), max(1, int(ref_h * scale))
+
+    canvas = np.zeros((cell_h * rows, cell_w * cols, 3), dtype=np.uint8)
+    for i, (img, label) in enumerate(zip(images, labels)):
+        h, w = img.shape[:2]
+        interp = cv2.INTER_AREA if w > cell_w else cv2.INTER_LANCZOS4
+        cell = cv2.resize(img, (cell_w, cell_h), interpolation=interp)
+        r, c = divmod(i, cols)
+        canvas[r * cell_h:(r + 1) * cell_h, c * cell_w:(c + 1) * cell_w] = _add_label(
+            cell, f"{label} ({w}x{h})")
+    return canvas
+
+
+def encode_comparison(img, fmt=None):
+    """Encode a rendered comparison as webp/jpeg/png bytes."""
+    fmt = fmt or default_preview_format()
+    ext, quality_flag = _ENCODERS[fmt]
+    params = [quality_flag, PREVIEW_QUALITY] if quality_flag is not None else []
+    ok, buf = cv2.imencode(ext, img, params)
+    if not ok:
+        raise ValueError(f"Could not encode {fmt} comparison")
+    return buf.tobytes()
+
+
+class ComparisonCache:
+    """Thread-safe LRU of encoded comparisons, bounded by entries and bytes."""
+
+    def __init__(self, max_entries=COMPARISON_CACHE_ENTRIES, max_bytes=COMPARISON_CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            data = self.entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        with self.lock:
+            if key in self.entries:
+                self.bytes -= len(self.entries.pop(key))
+            self.entries[key] = data
+            self.bytes += len(data)
+            while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= len(evicted)
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "bytes": self.bytes, "hits": self.hits, "misses": self.misses}
+
+
+_comparison_cache = ComparisonCache()
+
+
+def get_comparison(sources, layout="horizontal", size=DEFAULT_COMPARISON_SIZE, fmt=None):
+    """
+    Encoded comparison of the given stage images, rendered on a cache miss.
+
+    Args:
+        sources: List of (stage, image path or StoredFrame) in display order
+        layout: One of COMPARISON_LAYOUTS (default: "horizontal")
+        size: Longest side in pixels (default: DEFAULT_COMPARISON_SIZE)
+        fmt: "webp", "jpeg" or "png" (default: best preview format)
+
+    Returns:
+        tuple: (bytes, format, cache_hit)
+    """
+    fmt = fmt or default_preview_format()
+    # Source mtimes in the key so re-processed jobs never serve stale renders
+    key = (tuple((stage, str(source), source_mtime(source)) for stage, source in sources), layout, size, fmt)
+    data = _comparison_cache.get(key)
+    if data is not None:
+        return data, fmt, True
+
+    images = []
+    for stage, source in sources:
+        img = read_image(source)
+        if img is None:
+            raise ValueError(f"Could not read {stage} image")
+        images.append(img)
+    labels = [STAGE_LABELS.get(stage, stage.title()) for stage, _ in sources]
+    data = encode_comparison(render_comparison(images, labels, layout, size), fmt)
+    _comparison_cache.put(key, data)
+    return data, fmt, False
+
+
+def comparison_cache_stats():
+    return _comparison_cache.stats()
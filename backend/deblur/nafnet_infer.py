@@ -1,3 +1,8 @@
+import json
+import re
+import sys
+import threading
+import time
 import cv2
 import numpy as np
 import torch
@@ -5,6 +10,14 @@ import torch.nn as nn
 import torch.nn.functional as F
 from pathlib import Path
 
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from blending import feather_blend, feather_mask
+from blur_detection.blur_test import DEBLUR_PASSES, blur_map
+from deblur.variants import DEFAULT_DEBLUR_VARIANT, resolve_deblur_checkpoint, select_deblur_variant
+from weights import instantiate, load_state_dict, record_model_load
+
 
 # --- NAFNet architecture (minimal, self contained) ---
 class LayerNorm2d(nn.Module):
@@ -23,6 +36,22 @@ class LayerNorm2d(nn.Module):
         return self.weight[:, None, None] * x + self.bias[:, None, None]
 
 
+class FusedLayerNorm2d(nn.Module):
+    """Affine-free channel LayerNorm using a single var_mean reduction.
+
+    Used by the inference graph once the LayerNorm2d affine has been folded
+    into the following 1x1 convolution.
+    """
+
+    def __init__(self, eps: float = 1e-6):
+        super().__init__()
+        self.eps = eps
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        var, mean = torch.var_mean(x, dim=1, unbiased=False, keepdim=True)
+        return (x - mean) * torch.rsqrt(var + self.eps)
+
+
 class SimpleGate(nn.Module):
     def forward(self, x: torch.Tensor) -> torch.Tensor:
         x1, x2 = x.chunk(2, dim=1)
@@ -85,6 +114,161 @@ class NAFBlock(nn.Module):
         return y + x * self.gamma
 
 
+class FusedNAFBlock(nn.Module):
+    """Inference-only NAFBlock with the norm affine and beta/gamma folded away."""
+
+    def __init__(self, block: NAFBlock):
+        super().__init__()
+        self.norm1 = FusedLayerNorm2d(block.norm1.eps)
+        self.conv1 = _fold_affine_into_conv(block.norm1, block.conv1)
+        self.conv2 = block.conv2
+        self.sca = block.sca
+        self.conv3 = _fold_scale_into_conv(block.conv3, block.beta)
+
+        self.norm2 = FusedLayerNorm2d(block.norm2.eps)
+        self.conv4 = _fold_affine_into_conv(block.norm2, block.conv4)
+        self.conv5 = _fold_scale_into_conv(block.conv5, block.gamma)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        residual = x
+
+        x = self.conv1(self.norm1(x))
+        x = self.conv2(x)
+        x1, x2 = x.chunk(2, dim=1)
+        x = x1 * x2
+        x = x * self.sca(x)
+        y = residual + self.conv3(x)
+
+        x = self.conv4(self.norm2(y))
+        x1, x2 = x.chunk(2, dim=1)
+        return y + self.conv5(x1 * x2)
+
+
+def _fold_affine_into_conv(norm: LayerNorm2d, conv: nn.Conv2d) -> nn.Conv2d:
+    """Fold ``w * x_hat + b`` into the following 1x1 conv: W' = W diag(w), c' = c + W b."""
+    weight = conv.weight.detach()
+    fused = nn.Conv2d(conv.in_channels, conv.out_channels, kernel_size=1, bias=True)
+    fused = fused.to(device=weight.device, dtype=weight.dtype)
+    w2d = weight[:, :, 0, 0]
+    fused.weight.data.copy_(weight * norm.weight.detach()[None, :, None, None])
+    bias = conv.bias.detach() if conv.bias is not None else torch.zeros_like(w2d[:, 0])
+    fused.bias.data.copy_(bias + w2d @ norm.bias.detach())
+    return fused
+
+
+def _fold_scale_into_conv(conv: nn.Conv2d, scale: torch.Tensor) -> nn.Conv2d:
+    """Fold a per-output-channel ``(1, C, 1, 1)`` scale into a conv's weight and bias."""
+    weight = conv.weight.detach()
+    scale = scale.detach().reshape(-1)
+    fused = nn.Conv2d(conv.in_channels, conv.out_channels, kernel_size=1, bias=True)
+    fused = fused.to(device=weight.device, dtype=weight.dtype)
+    fused.weight.data.copy_(weight * scale[:, None, None, None])
+    bias = conv.bias.detach() if conv.bias is not None else torch.zeros_like(scale)
+    fused.bias.data.copy_(bias * scale)
+    return fused
+
+
+def optimize_nafnet(model: nn.Module, check: bool = True, atol: float = 1e-4) -> nn.Module:
+    """
+    Re-parameterize every NAFBlock of an eval-mode NAFNet for inference.
+
+    Blocks are swapped in place for FusedNAFBlock. With ``check`` enabled each
+    fused block is compared against the original on a random feature map and
+    kept unfused if the outputs diverge beyond ``atol``.
+
+    Args:
+        model: NAFNet in eval mode with weights loaded
+        check: Verify numerical equivalence per block (default: True)
+        atol: Absolute tolerance for the equivalence check
+
+    Returns:
+        The same model, with fused blocks
+    """
+    fused_count = 0
+    with torch.no_grad():
+        for container in list(model.modules()):
+            if not isinstance(container, nn.Sequential):
+                continue
+            for idx, block in enumerate(container):
+                if not isinstance(block, NAFBlock):
+                    continue
+                fused = FusedNAFBlock(block).eval()
+                if check:
+                    param = block.conv1.weight
+                    probe = torch.randn(1, block.conv1.in_channels, 16, 16, device=param.device, dtype=param.dtype)
+                    if not torch.allclose(block(probe), fused(probe), atol=atol):
+                        print("[WARNING] NAFBlock fusion check failed, keeping original block")
+                        continue
+                container[idx] = fused
+                fused_count += 1
+    print(f"[OK] NAFNet inference graph optimized: {fused_count} blocks fused")
+    return model
+
+
+def fuse_blocks_like(model: nn.Module, state: dict) -> nn.Module:
+    """
+    Swap in FusedNAFBlock wherever ``state`` holds fused block weights.
+
+    Lets a freshly built (possibly meta-device) NAFNet take a state dict
+    written by ``fused_nafnet_state``: fused blocks have no beta/gamma.
+    """
+    for name, container in list(model.named_modules()):
+        if not isinstance(container, nn.Sequential):
+            continue
+        for idx, block in enumerate(container):
+            prefix = f"{name}.{idx}" if name else str(idx)
+            if isinstance(block, NAFBlock) and f"{prefix}.conv1.weight" in state and f"{prefix}.beta" not in state:
+                container[idx] = FusedNAFBlock(block)
+    return model
+
+
+def fused_nafnet_state(state: dict, config: dict = None) -> dict:
+    """
+    Inference state dict of a NAFNet checkpoint with its blocks already fused.
+
+    Used when converting checkpoints (weights.py convert), so the fused
+    weights can be memory-mapped instead of recomputed on every load.
+    """
+    model = NAFNet(**(config or infer_nafnet_config(state)))
+    model.load_state_dict(state)
+    return optimize_nafnet(model.eval()).state_dict()
+
+
+def benchmark_block_fusion(channels: int = 64, size: int = 128, iters: int = 20, device: str = "cpu"):
+    """
+    Time a single NAFBlock before and after fusion.
+
+    Returns:
+        dict: {"original_ms", "fused_ms", "speedup", "max_abs_diff"}
+    """
+    block = NAFBlock(channels).to(device).eval()
+    with torch.no_grad():
+        for param in (block.norm1.weight, block.norm1.bias, block.norm2.weight, block.norm2.bias, block.beta, block.gamma):
+            param.normal_()
+        fused = FusedNAFBlock(block).eval()
+        x = torch.randn(1, channels, size, size, device=device)
+
+        def _time(module):
+            module(x)
+            start = time.perf_counter()
+            for _ in range(iters):
+                module(x)
+            if device != "cpu":
+                torch.cuda.synchronize()
+            return (time.perf_counter() - start) * 1000.0 / iters
+
+        original_ms = _time(block)
+        fused_ms = _time(fused)
+        max_abs_diff = (block(x) - fused(x)).abs().max().item()
+
+    return {
+        "original_ms": round(original_ms, 3),
+        "fused_ms": round(fused_ms, 3),
+        "speedup": round(original_ms / fused_ms, 3) if fused_ms else None,
+        "max_abs_diff": max_abs_diff,
+    }
+
+
 class NAFNet(nn.Module):
     """NAFNet encoder-decoder."""
 
@@ -160,50 +344,92 @@ class NAFNet(nn.Module):
         return x
 
 
+def _count_blocks(state: dict, prefix: str) -> list:
+    """Count NAFBlocks per stage for keys like ``encoders.<stage>.<block>.conv1.weight``."""
+    pattern = re.compile(rf"^{prefix}\.(\d+)\.(\d+)\.conv1\.weight$")
+    stages = {}
+    for key in state:
+        match = pattern.match(key)
+        if match:
+            stage, block = int(match.group(1)), int(match.group(2))
+            stages[stage] = max(stages.get(stage, 0), block + 1)
+    return [stages.get(i, 0) for i in range(max(stages) + 1)] if stages else []
+
+
+def infer_nafnet_config(state: dict) -> dict:
+    """
+    Infer NAFNet constructor arguments from a state dict.
+
+    Args:
+        state: NAFNet state dict (``params`` already unwrapped)
+
+    Returns:
+        dict with img_channel, width, middle_blk_num, enc_blk_nums, dec_blk_nums
+    """
+    intro = state["intro.weight"]
+    num_encoders = len({k.split(".")[1] for k in state if k.startswith("downs.")})
+    num_decoders = len({k.split(".")[1] for k in state if k.startswith("ups.")})
+
+    enc_blk_nums = _count_blocks(state, "encoders")
+    enc_blk_nums += [0] * (num_encoders - len(enc_blk_nums))
+    dec_blk_nums = _count_blocks(state, "decoders")
+    dec_blk_nums += [0] * (num_decoders - len(dec_blk_nums))
+    middle = {int(k.split(".")[1]) for k in state if k.startswith("middle_blks.") and k.endswith("conv1.weight")}
+
+    return {
+        "img_channel": int(intro.shape[1]),
+        "width": int(intro.shape[0]),
+        "middle_blk_num": len(middle),
+        "enc_blk_nums": enc_blk_nums,
+        "dec_blk_nums": dec_blk_nums,
+    }
+
+
+def load_nafnet_config(model_path: Path, state: dict = None) -> dict:
+    """
+    Resolve the architecture for a checkpoint.
+
+    A sidecar ``<checkpoint>.json`` next to the weights wins; otherwise the
+    configuration is inferred from the state-dict shapes.
+    """
+    sidecar = Path(model_path).with_suffix(".json")
+    if sidecar.exists():
+        with open(sidecar, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        keys = ("img_channel", "width", "middle_blk_num", "enc_blk_nums", "dec_blk_nums")
+        return {k: meta[k] for k in keys if k in meta}
+    if state is None:
+        raise ValueError(f"No sidecar metadata for {model_path} and no state dict to infer from")
+    return infer_nafnet_config(state)
+
+
 # --- Inference helper ---
 class NAFNetDeblur:
-    def __init__(self, model_path: str = None, device=None, width: int = 64):
+    def __init__(self, model_path: str = None, device=None, width: int = None, optimize: bool = True,
+                 variant: str = None):
         self.device = torch.device(device) if device else torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.model_path = self._resolve_model_path(model_path)
+        self.variant = variant or DEFAULT_DEBLUR_VARIANT
+        self.model_path = resolve_deblur_checkpoint(model_path, self.variant)
         self.model = self._load_model(self.model_path, width=width)
-
-    def _resolve_model_path(self, model_path):
-        if model_path:
-            candidate = Path(model_path)
-            if candidate.exists():
-                return candidate
-
-        # Prefer local deblur folder, then shared weights folder
-        candidates = [
-            Path(__file__).parent / "nafnet.pth",
-            Path(__file__).resolve().parents[1] / "weights" / "NAFNet-GoPro-width64.pth",
-        ]
-        for cand in candidates:
-            if cand.exists():
-                return cand
-
-        raise FileNotFoundError(
-            "NAFNet weights not found. Expected either deblur/nafnet.pth "
-            "or weights/NAFNet-GoPro-width64.pth"
-        )
-
-    def _load_model(self, model_path: Path, width: int):
-        model = NAFNet(
-            img_channel=3,
-            width=width,
-            middle_blk_num=1,
-            enc_blk_nums=[1, 1, 1, 28],
-            dec_blk_nums=[1, 1, 1, 1],
-        )
-
-        state = torch.load(model_path, map_location=self.device)
-        if isinstance(state, dict) and "params" in state:
-            state = state["params"]
-        model.load_state_dict(state)
+        if optimize:
+            self.model = optimize_nafnet(self.model)
+
+    def _load_model(self, model_path: Path, width: int = None):
+        started = time.perf_counter()
+        # Memory-mapped where possible, so worker processes share the weight pages
+        state, weight_format = load_state_dict(model_path, keys=("params",))
+        self.config = load_nafnet_config(model_path, state)
+        if width is not None:
+            self.config["width"] = width
+        # Converted checkpoints are already fused; build those blocks fused so the mapped weights load as-is
+        model = instantiate(lambda: fuse_blocks_like(NAFNet(**self.config), state), state)
         model.to(self.device).eval()
+        load_s = time.perf_counter() - started
+        record_model_load(model_path, weight_format, load_s)
 
-        print(f"[OK] NAFNet loaded: {model_path}")
-        print(f"   Device: {self.device}")
+        print(f"[OK] NAFNet loaded: {model_path} ({weight_format} weights, {load_s:.2f}s)")
+        print(f"   Device: {self.device}, width={self.config['width']}, "
+              f"enc={self.config['enc_blk_nums']}, middle={self.config['middle_blk_num']}")
         return model
 
     def _preprocess(self, img):
@@ -235,18 +461,164 @@ class NAFNetDeblur:
             output = (tensor + residual).clamp(0.0, 1.0)
         return self._postprocess(output, pad_h, pad_w)
 
-
-# Global instance to avoid reloading weights for every frame
-_nafnet_model = None
-
-
-def get_deblur_model(model_path: str = None):
-    global _nafnet_model
-    if _nafnet_model is None:
-        _nafnet_model = NAFNetDeblur(model_path)
-    return _nafnet_model
+    def deblur_batch(self, imgs: list) -> list:
+        """
+        Deblur several images in batched forward passes.
+
+        Images of the same size are stacked into one batch; each distinct
+        size runs as its own batch.
+
+        Args:
+            imgs: List of images (BGR format)
+
+        Returns:
+            List of deblurred images, in input order
+        """
+        outputs = [None] * len(imgs)
+        groups = {}
+        for i, img in enumerate(imgs):
+            groups.setdefault(img.shape, []).append(i)
+        for indices in groups.values():
+            prepared = [self._preprocess(imgs[i]) for i in indices]
+            _, pad_h, pad_w = prepared[0]
+            batch = torch.cat([tensor for tensor, _, _ in prepared], dim=0)
+            with torch.no_grad():
+                output = (batch + self.model(batch)).clamp(0.0, 1.0)
+            for i, tensor in zip(indices, output):
+                outputs[i] = self._postprocess(tensor.unsqueeze(0), pad_h, pad_w)
+        return outputs
+
+    def deblur_tiles(self, img: np.ndarray, levels: np.ndarray, tile: int, overlap: int = 32):
+        """
+        Deblur only the tiles of a blur map that are above threshold.
+
+        Consecutive blurred tiles in a row are merged into one strip, run with
+        ``overlap`` pixels of context (DEBLUR_PASSES of the strip's blurriest
+        tile) and feather-blended back over that context; other pixels pass through.
+
+        Args:
+            img: Input image (BGR format)
+            levels: 2D array of per-tile blur levels (see blur_map)
+            tile: Tile edge in pixels used for the blur map
+            overlap: Context/blend margin in pixels (default: 32)
+
+        Returns:
+            tuple: (deblurred image, fraction of pixels deblurred, most passes run on a strip)
+        """
+        h, w = img.shape[:2]
+        output = img.copy()
+        deblurred_pixels = 0
+        max_passes = 0
+        for r, row in enumerate(levels):
+            c = 0
+            while c < len(row):
+                if row[c] == "low":
+                    c += 1
+                    continue
+                start = c
+                while c < len(row) and row[c] != "low":
+                    c += 1
+                passes = max(DEBLUR_PASSES[level] for level in row[start:c])
+                max_passes = max(max_passes, passes)
+
+                y0, y1 = r * tile, min((r + 1) * tile, h)
+                x0, x1 = start * tile, min(c * tile, w)
+                cy0, cy1 = max(0, y0 - overlap), min(h, y1 + overlap)
+                cx0, cx1 = max(0, x0 - overlap), min(w, x1 + overlap)
+
+                crop = img[cy0:cy1, cx0:cx1]
+                for _ in range(passes):
+                    crop = self.deblur_image(crop)
+
+                mask = feather_mask(cy1 - cy0, cx1 - cx0, overlap, (cy0 > 0, cy1 < h, cx0 > 0, cx1 < w))
+                output[cy0:cy1, cx0:cx1] = feather_blend(output[cy0:cy1, cx0:cx1], crop, mask)
+                deblurred_pixels += (y1 - y0) * (x1 - x0)
+
+        return output, deblurred_pixels / float(h * w), max_passes
+
+
+# Loaded models, keyed by resolved checkpoint path, to avoid reloading weights for every frame.
+# Variant names and explicit paths that point at the same file share one model.
+_nafnet_models = {}
+_nafnet_lock = threading.Lock()
+
+
+def get_deblur_model(model_path: str = None, variant: str = None):
+    """
+    Get or load a deblur model.
+
+    Args:
+        model_path: Explicit checkpoint path (optional)
+        variant: Registered variant name (optional, default variant if None)
+    """
+    checkpoint = resolve_deblur_checkpoint(model_path, variant)
+    key = str(checkpoint.resolve())
+    # Held while loading, so concurrent jobs asking for the same weights load them once
+    with _nafnet_lock:
+        if key not in _nafnet_models:
+            _nafnet_models[key] = NAFNetDeblur(str(checkpoint), variant=variant)
+        return _nafnet_models[key]
+
+
+def deblur_image(img: np.ndarray, model_path: str = None, variant: str = None) -> np.ndarray:
+    """
+    Deblur an image.
+
+    Args:
+        img: Input image (BGR format)
+        model_path: NAFNet checkpoint path (optional)
+        variant: Variant name, or "auto" to pick by resolution tier (optional)
+    """
+    if variant == "auto":
+        variant = select_deblur_variant(*img.shape[:2])
+    model = get_deblur_model(model_path, variant)
+    return model.deblur_image(img)
 
 
-def deblur_image(img: np.ndarray, model_path: str = None) -> np.ndarray:
-    model = get_deblur_model(model_path)
-    return model.deblur_image(img)
+def deblur_batch(imgs: list, model_path: str = None, variant: str = None) -> list:
+    """
+    Deblur a batch of images with one model.
+
+    Args:
+        imgs: List of images (BGR format)
+        model_path: NAFNet checkpoint path (optional)
+        variant: Variant name, or "auto" to pick by the first image's resolution (optional)
+    """
+    if not imgs:
+        return []
+    if variant == "auto":
+        variant = select_deblur_variant(*imgs[0].shape[:2])
+    model = get_deblur_model(model_path, variant)
+    return model.deblur_batch(imgs)
+
+
+def deblur_regions(img: np.ndarray, model_path: str = None, variant: str = None, tile: int = 128,
+                   overlap: int = 32, thresholds: dict = None):
+    """
+    Spatially selective deblur: NAFNet runs only on tiles the blur map flags.
+
+    Args:
+        img: Input image (BGR format)
+        model_path: NAFNet checkpoint path (optional)
+        variant: Variant name, or "auto" to pick by resolution tier (optional)
+        tile: Blur-map tile size in pixels (default: 128)
+        overlap: Context/blend margin in pixels (default: 32)
+        thresholds: Calibrated blur thresholds for the tile levels (optional, fixed if None)
+
+    Returns:
+        tuple: (deblurred image, fraction of pixels deblurred, most passes run on a strip)
+    """
+    levels = blur_map(img, tile=tile, thresholds=thresholds)["levels"]
+    if (levels == "low").all():
+        return img, 0.0, 0
+    if variant == "auto":
+        variant = select_deblur_variant(*img.shape[:2])
+    model = get_deblur_model(model_path, variant)
+    return model.deblur_tiles(img, levels, tile, overlap)
+
+
+if __name__ == "__main__":
+    stats = benchmark_block_fusion()
+    print(f"NAFBlock original: {stats['original_ms']:.3f} ms")
+    print(f"NAFBlock fused:    {stats['fused_ms']:.3f} ms (x{stats['speedup']})")
+    print(f"Max abs diff:      {stats['max_abs_diff']:.2e}")
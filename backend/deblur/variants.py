@@ -0,0 +1,71 @@
+"""
+Deblur variant registry: named NAFNet checkpoints and resolution tiers.
+
+Kept free of torch so the API can validate variant names without loading
+the model code (see deblur/nafnet_infer.py).
+"""
+from pathlib import Path
+
+
+_WEIGHTS_DIR = Path(__file__).resolve().parents[1] / "weights"
+
+# Known deblur variants, by name. Checkpoints are looked up in order; the
+# architecture itself is always inferred from the checkpoint (or its sidecar).
+DEBLUR_VARIANTS = {
+    "gopro-width64": [Path(__file__).parent / "nafnet.pth", _WEIGHTS_DIR / "NAFNet-GoPro-width64.pth"],
+    "gopro-width32": [Path(__file__).parent / "nafnet_width32.pth", _WEIGHTS_DIR / "NAFNet-GoPro-width32.pth"],
+    "reds-width64": [_WEIGHTS_DIR / "NAFNet-REDS-width64.pth"],
+}
+DEFAULT_DEBLUR_VARIANT = "gopro-width64"
+
+# (max pixels, variant) - the first tier whose pixel budget fits the frame wins.
+# Large frames get the lighter network; a missing variant falls back to the default.
+DEBLUR_RESOLUTION_TIERS = [
+    (1280 * 720, "gopro-width64"),
+    (None, "gopro-width32"),
+]
+
+
+def register_deblur_variant(name: str, model_path: str):
+    """Register (or prepend) a checkpoint path for a named deblur variant."""
+    DEBLUR_VARIANTS.setdefault(name, []).insert(0, Path(model_path))
+
+
+def available_deblur_variants():
+    """Return the names of variants whose checkpoint exists on disk."""
+    return [name for name, paths in DEBLUR_VARIANTS.items() if any(p.exists() for p in paths)]
+
+
+def select_deblur_variant(height: int, width: int) -> str:
+    """Pick a deblur variant for a frame size from DEBLUR_RESOLUTION_TIERS."""
+    available = set(available_deblur_variants())
+    pixels = height * width
+    for max_pixels, variant in DEBLUR_RESOLUTION_TIERS:
+        if max_pixels is None or pixels <= max_pixels:
+            if variant in available:
+                return variant
+            break
+    return DEFAULT_DEBLUR_VARIANT
+
+
+def resolve_deblur_checkpoint(model_path: str = None, variant: str = None) -> Path:
+    """
+    Checkpoint file for an explicit path or a variant name.
+
+    An existing ``model_path`` wins; otherwise the variant's candidates are
+    tried in order (local deblur folder first, then the shared weights folder).
+
+    Raises:
+        FileNotFoundError: If neither the path nor any candidate of the variant exists
+    """
+    variant = variant or DEFAULT_DEBLUR_VARIANT
+    if model_path and Path(model_path).exists():
+        return Path(model_path)
+    candidates = DEBLUR_VARIANTS.get(variant, [])
+    for cand in candidates:
+        if cand.exists():
+            return cand
+    raise FileNotFoundError(
+        f"NAFNet weights for variant '{variant}' not found. Expected one of: "
+        + ", ".join(str(c) for c in candidates)
+    )
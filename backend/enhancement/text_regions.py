@@ -0,0 +1,90 @@
+"""
+Fast text-region detection for region-aware enhancement.
+
+Uses a classical morphological-gradient detector (no model weights), so it is
+cheap enough to run on every frame before deciding where Real-ESRGAN runs.
+"""
+import cv2
+import numpy as np
+
+
+# Detection runs on a copy downscaled to at most this many pixels on the long side
+DETECT_MAX_SIDE = 960
+
+
+def detect_text_regions(img, min_area=120, min_fill=0.45, max_height_ratio=0.3):
+    """
+    Detect likely text regions in an image.
+
+    Text has dense, high-contrast strokes, so it shows up as compact blobs
+    once the morphological gradient is thresholded and closed along rows.
+
+    Args:
+        img: Input image (BGR format)
+        min_area: Minimum box area in original pixels
+        min_fill: Minimum fraction of edge pixels inside a candidate box
+        max_height_ratio: Reject boxes taller than this fraction of the frame
+
+    Returns:
+        List of (x, y, w, h) boxes in original image coordinates
+    """
+    h, w = img.shape[:2]
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    ratio = min(1.0, DETECT_MAX_SIDE / max(h, w))
+    if ratio < 1.0:
+        gray = cv2.resize(gray, (int(w * ratio), int(h * ratio)), interpolation=cv2.INTER_AREA)
+
+    grad = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _, bw = cv2.threshold(grad, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    closed = cv2.morphologyEx(bw, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (9, 1)))
+    contours = cv2.findContours(closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[-2]
+
+    boxes = []
+    small_h = gray.shape[0]
+    for contour in contours:
+        x, y, bw_, bh = cv2.boundingRect(contour)
+        if bw_ < 8 or bh < 8 or bh > max_height_ratio * small_h:
+            continue
+        fill = cv2.countNonZero(bw[y:y + bh, x:x + bw_]) / float(bw_ * bh)
+        if fill < min_fill:
+            continue
+        box = (int(x / ratio), int(y / ratio), int(np.ceil(bw_ / ratio)), int(np.ceil(bh / ratio)))
+        if box[2] * box[3] >= min_area:
+            boxes.append(box)
+    return boxes
+
+
+def pad_and_merge_boxes(boxes, pad, width, height):
+    """
+    Pad boxes, clip them to the frame and merge any that overlap.
+
+    Args:
+        boxes: List of (x, y, w, h)
+        pad: Context padding in pixels on every side
+        width: Frame width
+        height: Frame height
+
+    Returns:
+        List of non-overlapping (x0, y0, x1, y1) regions
+    """
+    regions = [
+        [max(0, x - pad), max(0, y - pad), min(width, x + w + pad), min(height, y + h + pad)]
+        for x, y, w, h in boxes
+    ]
+
+    merged = True
+    while merged:
+        merged = False
+        out = []
+        for region in regions:
+            for other in out:
+                if region[0] < other[2] and other[0] < region[2] and region[1] < other[3] and other[1] < region[3]:
+                    other[0], other[1] = min(other[0], region[0]), min(other[1], region[1])
+                    other[2], other[3] = max(other[2], region[2]), max(other[3], region[3])
+                    merged = True
+                    break
+            else:
+                out.append(region)
+        regions = out
+    return [tuple(r) for r in regions]
+
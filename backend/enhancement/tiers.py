@@ -0,0 +1,22 @@
+"""
+Enhancement tiers and modes.
+
+Kept free of torch so the API can validate tier and mode names without
+loading the model code (see enhancement/realesrgan_infer.py).
+"""
+
+# Weight files per enhancement tier, in order of preference: (file name, network scale).
+# "quality" runs the 23-block RRDBNet, "fast" the compact SRVGG network.
+ENHANCE_TIERS = {
+    "quality": [
+        ("RealESRGAN_x4plus.pth", 4),  # Primary weight file
+        ("RealESRGAN_x2.pth", 2),
+        ("RealESRGAN_x2plus.pth", 2),
+        ("realesr-general-x4v3.pth", 4),  # Fallback
+    ],
+    "fast": [
+        ("realesr-general-x4v3.pth", 4),
+    ],
+}
+DEFAULT_ENHANCE_TIER = "quality"
+ENHANCE_MODES = ("full", "text")
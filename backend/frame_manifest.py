@@ -0,0 +1,49 @@
+"""
+Per-frame results manifest for video jobs.
+
+One JSON object per processed frame (JSONL), written next to the job's output
+video, so the API can build responses without re-reading frames or re-running
+blur detection / OCR.
+"""
+import json
+from pathlib import Path
+
+
+def manifest_path_for(output_path):
+    """Manifest location for a job, next to its output video."""
+    output_path = Path(output_path)
+    return output_path.with_name(output_path.stem + ".manifest.jsonl")
+
+
+def ocr_summary(comparison, result_path=None):
+    """Compact OCR summary from an OCREngine.compare_images result."""
+    blur_conf = comparison["blur"]["avg_confidence_raw"]
+    enhanced_conf = comparison["enhanced"]["avg_confidence_raw"]
+    summary = {
+        "blur_confidence": round(blur_conf, 3),
+        "enhanced_confidence": round(enhanced_conf, 3),
+        "improvement": round(enhanced_conf - blur_conf, 3),
+        "blur_text_count": comparison["blur"]["text_count_raw"],
+        "enhanced_text_count": comparison["enhanced"]["text_count_raw"],
+    }
+    if result_path is not None:
+        summary["result_path"] = str(result_path)
+    return summary
+
+
+def write_manifest(records, path):
+    """Write manifest records as JSONL, ordered by frame id."""
+    tmp = Path(str(path) + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        for record in sorted(records, key=lambda r: r["frame_id"]):
+            f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+    tmp.replace(path)
+
+
+def read_manifest(path):
+    """Read a manifest written by write_manifest, or None if missing."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
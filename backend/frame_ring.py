@@ -0,0 +1,242 @@
+"""
+Shared-memory ring buffer for passing frames between pipeline processes.
+
+Frames live in preallocated slots of one multiprocessing.shared_memory block.
+Processes exchange small FrameHandle tuples (slot, generation, shape, dtype)
+over ordinary queues instead of pickling pixel arrays. Each slot carries a
+reference count: a producer puts a frame with as many references as it has
+consumers, each consumer releases its reference when done, and the slot is
+reused once the count drops to zero. When all slots are in use, put/alloc
+block, which back-pressures the producer.
+
+    ring = FrameRing.create(slots=8, slot_bytes=1920 * 1080 * 3)
+    handle = ring.put(frame)            # producer
+    frame = ring.view(handle)           # consumer, zero-copy view
+    ring.release(handle)
+
+Measured with ``python frame_ring.py`` (200 frames, 8 slots, single-core
+container, two runs each): 1920x1080 went from 30-31 frames/s over a pickled
+queue to 147-327 frames/s over the ring (4.9x-10.6x); 960x540 from 103-142
+to 490-551 frames/s (3.9x-4.8x). Review measured 1.93x at 960x540 on another
+machine, so expect the gain to vary with the host.
+"""
+import multiprocessing as mp
+import time
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+# Header per slot: refcount, generation
+_HEADER_FIELDS = 2
+_ALIGN = 64
+
+FrameHandle = namedtuple("FrameHandle", ["slot", "generation", "shape", "dtype"])
+
+
+class RingTimeout(TimeoutError):
+    """No free slot became available within the timeout."""
+
+
+class FrameRing:
+    """
+    Fixed-size pool of frame slots in shared memory with reference counting.
+
+    The object is picklable: passing it to a child process (as a Process
+    argument) re-attaches to the same shared memory block and locks.
+    """
+
+    def __init__(self, name, slots, slot_bytes, lock, free_slots, owner=False):
+        self.name = name
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.lock = lock
+        self.free_slots = free_slots
+        self.owner = owner
+        self._attach()
+
+    @classmethod
+    def create(cls, slots=8, slot_bytes=1920 * 1080 * 3, ctx=None):
+        """
+        Allocate a new ring.
+
+        Args:
+            slots: Number of frame slots (frames in flight)
+            slot_bytes: Capacity of one slot in bytes (largest frame)
+            ctx: multiprocessing context the consumers are started with (optional)
+        """
+        ctx = ctx or mp.get_context()
+        slot_bytes = (slot_bytes + _ALIGN - 1) // _ALIGN * _ALIGN
+        header_bytes = (slots * _HEADER_FIELDS * 8 + _ALIGN - 1) // _ALIGN * _ALIGN
+        shm = shared_memory.SharedMemory(create=True, size=header_bytes + slots * slot_bytes)
+        np.ndarray((slots, _HEADER_FIELDS), dtype=np.int64, buffer=shm.buf)[:] = 0
+        name = shm.name
+        shm.close()
+        return cls(name, slots, slot_bytes, ctx.Lock(), ctx.BoundedSemaphore(slots), owner=True)
+
+    def _attach(self):
+        self.shm = shared_memory.SharedMemory(name=self.name)
+        self.header = np.ndarray((self.slots, _HEADER_FIELDS), dtype=np.int64, buffer=self.shm.buf)
+        self.data_offset = (self.slots * _HEADER_FIELDS * 8 + _ALIGN - 1) // _ALIGN * _ALIGN
+
+    def __getstate__(self):
+        return {"name": self.name, "slots": self.slots, "slot_bytes": self.slot_bytes,
+                "lock": self.lock, "free_slots": self.free_slots}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.owner = False
+        self._attach()
+
+    def _slot_array(self, slot, shape, dtype):
+        offset = self.data_offset + slot * self.slot_bytes
+        return np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+
+    def alloc(self, shape, dtype=np.uint8, refs=1, timeout=None):
+        """
+        Reserve a slot and return a writable view, so producers can write frames in place.
+
+        Args:
+            shape: Frame shape
+            dtype: Frame dtype (default: uint8)
+            refs: Initial reference count (number of consumers)
+            timeout: Seconds to wait for a free slot (default: block)
+
+        Returns:
+            tuple: (FrameHandle, writable ndarray view)
+        """
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        if nbytes > self.slot_bytes:
+            raise ValueError(f"Frame of {nbytes} bytes exceeds slot size {self.slot_bytes}")
+        if not self.free_slots.acquire(timeout=timeout):
+            raise RingTimeout(f"No free frame slot within {timeout}s")
+        with self.lock:
+            free = np.flatnonzero(self.header[:, 0] == 0)
+            slot = int(free[0])
+            self.header[slot, 0] = refs
+            self.header[slot, 1] += 1
+            generation = int(self.header[slot, 1])
+        handle = FrameHandle(slot, generation, tuple(shape), dtype.str)
+        return handle, self._slot_array(slot, shape, dtype)
+
+    def put(self, frame, refs=1, timeout=None):
+        """Copy a frame into a free slot (one memcpy, no pickling) and return its handle."""
+        handle, view = self.alloc(frame.shape, frame.dtype, refs, timeout)
+        view[...] = frame
+        return handle
+
+    def view(self, handle):
+        """Zero-copy ndarray view of a handle's frame (valid until its last release)."""
+        if int(self.header[handle.slot, 1]) != handle.generation:
+            raise ValueError(f"Stale frame handle for slot {handle.slot}")
+        return self._slot_array(handle.slot, handle.shape, np.dtype(handle.dtype))
+
+    def retain(self, handle, count=1):
+        """Add references, e.g. before forwarding a handle to more consumers."""
+        with self.lock:
+            if self.header[handle.slot, 0] <= 0:
+                raise ValueError(f"Frame slot {handle.slot} already released")
+            self.header[handle.slot, 0] += count
+
+    def release(self, handle):
+        """Drop one reference; the slot is reused once none remain."""
+        with self.lock:
+            refs = int(self.header[handle.slot, 0]) - 1
+            if refs < 0:
+                raise ValueError(f"Frame slot {handle.slot} released too many times")
+            self.header[handle.slot, 0] = refs
+        if refs == 0:
+            self.free_slots.release()
+
+    def in_use(self):
+        with self.lock:
+            return int((self.header[:, 0] > 0).sum())
+
+    def close(self):
+        """Detach this process; the owner also frees the shared memory."""
+        self.header = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+# ---------------------------------------------------------------------------
+# Benchmark: ring handles vs pickled frames through multiprocessing queues
+# ---------------------------------------------------------------------------
+
+def _consume_frames(frames, done, ring):
+    checksum = 0
+    while True:
+        item = frames.get()
+        if item is None:
+            break
+        frame = ring.view(item) if ring is not None else item
+        # Touch every row so the consumer really reads the pixels
+        checksum += int(frame[:, ::64].sum())
+        if ring is not None:
+            del frame
+            ring.release(item)
+    done.put(checksum)
+    if ring is not None:
+        ring.close()
+
+
+def _run_transport(ctx, frame, count, ring, queue_size):
+    frames = ctx.Queue(maxsize=queue_size)
+    done = ctx.Queue()
+    consumer = ctx.Process(target=_consume_frames, args=(frames, done, ring), daemon=True)
+    consumer.start()
+    started = time.perf_counter()
+    for _ in range(count):
+        frames.put(ring.put(frame) if ring is not None else frame)
+    frames.put(None)
+    checksum = done.get()
+    elapsed = time.perf_counter() - started
+    consumer.join()
+    return elapsed, checksum
+
+
+def benchmark_transport(count=200, height=1080, width=1920, slots=8):
+    """
+    Producer -> consumer throughput at a given frame size: shared-memory ring vs pickled queue.
+
+    Returns:
+        dict with frames/s and MB/s for both transports and the speedup
+    """
+    ctx = mp.get_context("spawn")
+    frame = np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    megabytes = frame.nbytes * count / (1024 * 1024)
+
+    pickled_s, pickled_sum = _run_transport(ctx, frame, count, None, slots)
+
+    ring = FrameRing.create(slots=slots, slot_bytes=frame.nbytes, ctx=ctx)
+    try:
+        ring_s, ring_sum = _run_transport(ctx, frame, count, ring, slots)
+    finally:
+        ring.close()
+
+    if pickled_sum != ring_sum:
+        raise RuntimeError("Transports delivered different frame data")
+    return {
+        "frame": f"{width}x{height}x3",
+        "frames": count,
+        "pickled_queue": {"fps": round(count / pickled_s, 1), "mb_per_s": round(megabytes / pickled_s, 1)},
+        "shared_memory_ring": {"fps": round(count / ring_s, 1), "mb_per_s": round(megabytes / ring_s, 1)},
+        "speedup": round(pickled_s / ring_s, 2),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Benchmark shared-memory frame transport")
+    parser.add_argument("--frames", type=int, default=200, help="Frames to send (default: 200)")
+    parser.add_argument("--height", type=int, default=1080, help="Frame height (default: 1080)")
+    parser.add_argument("--width", type=int, default=1920, help="Frame width (default: 1920)")
+    parser.add_argument("--slots", type=int, default=8, help="Ring slots / queue depth (default: 8)")
+    args = parser.parse_args()
+
+    print(json.dumps(benchmark_transport(args.frames, args.height, args.width, args.slots), indent=2))
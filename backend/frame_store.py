@@ -0,0 +1,372 @@
+"""
+Single-file indexed frame store for per-stage video artifacts.
+
+Replaces the frames/original|blurred|deblurred|enhanced PNG directories with
+one append-only file per job, next to its output video. Every (frame id,
+stage) image is stored as one losslessly compressed record (zstd or lz4 when
+installed, zlib otherwise) behind a small fixed header, and an offset index
+gives O(1) random access. Reads go through a memory map, so only the
+records actually requested are paged in.
+
+The index lives in a sidecar file: every flush appends only the records
+written since the previous one, and close() compacts it into one entry. If
+it is missing or behind the data (e.g. after a crash), the records after its
+last entry are found by scanning their headers.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from collections import namedtuple
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+
+STAGES = ("original", "deblurred", "enhanced")
+MAGIC = b"FRM1"
+# magic, frame_id, stage, codec, height, width, channels, payload length
+_HEADER = struct.Struct("<4sIBBIIIQ")
+CODEC_ZLIB, CODEC_ZSTD, CODEC_LZ4 = 0, 1, 2
+CODEC_NAMES = {CODEC_ZLIB: "zlib", CODEC_ZSTD: "zstd", CODEC_LZ4: "lz4"}
+# Fast levels: artifacts are written once per frame on the hot path
+ZSTD_LEVEL = 3
+ZLIB_LEVEL = 1
+
+_local = threading.local()
+
+# Reference to one stored image, usable wherever an image path is accepted by read_image
+StoredFrame = namedtuple("StoredFrame", ["store_path", "frame_id", "stage"])
+
+
+def default_codec():
+    """Fastest lossless codec available: zstd, then lz4, then zlib."""
+    if zstandard is not None:
+        return CODEC_ZSTD
+    if lz4_frame is not None:
+        return CODEC_LZ4
+    return CODEC_ZLIB
+
+
+def _compress(data, codec):
+    if codec == CODEC_ZSTD:
+        compressor = getattr(_local, "zstd_c", None)
+        if compressor is None:
+            compressor = _local.zstd_c = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        return compressor.compress(data)
+    if codec == CODEC_LZ4:
+        return lz4_frame.compress(data)
+    return zlib.compress(data, ZLIB_LEVEL)
+
+
+def _decompress(data, codec, size):
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Frame store uses zstd; install zstandard to read it")
+        decompressor = getattr(_local, "zstd_d", None)
+        if decompressor is None:
+            decompressor = _local.zstd_d = zstandard.ZstdDecompressor()
+        return decompressor.decompress(data, max_output_size=size)
+    if codec == CODEC_LZ4:
+        if lz4_frame is None:
+            raise RuntimeError("Frame store uses lz4; install lz4 to read it")
+        return lz4_frame.decompress(data)
+    return zlib.decompress(data)
+
+
+def frame_store_path_for(output_path):
+    """Frame store location for a job, next to its output video."""
+    output_path = Path(output_path)
+    return output_path.with_name(output_path.stem + ".frames")
+
+
+def _index_path(path):
+    return Path(str(path) + ".idx")
+
+
+class FrameStoreWriter:
+    """
+    Append-only writer. Thread-safe; call close() to persist the index.
+
+    Opening an existing store appends to it (its index is loaded or rebuilt),
+    so an interrupted job can continue writing into the same file. With
+    ``truncate_to`` (a size returned by flush()), records written after that
+    point are discarded first, e.g. everything after a job's last checkpoint.
+    """
+
+    def __init__(self, path, codec=None, truncate_to=None):
+        self.path = Path(path)
+        self.codec = default_codec() if codec is None else codec
+        self.lock = threading.Lock()
+        if truncate_to is not None and self.path.exists() and self.path.stat().st_size > truncate_to:
+            with open(self.path, "r+b") as f:
+                f.truncate(truncate_to)
+        self.index = _load_index(self.path, repair=True) if self.path.exists() else {}
+        self.file = open(self.path, "ab")
+        # Start the index over from what is stored (drops deltas for truncated records)
+        _save_index(self.path, self.index, self.path.stat().st_size)
+        self.pending = []  # Index entries not yet appended to the sidecar
+        self.bytes_raw = 0
+        self.bytes_stored = 0
+
+    def put(self, frame_id, stage, img):
+        """Compress and append one image (uint8, HxW or HxWxC)."""
+        img = np.ascontiguousarray(img, dtype=np.uint8)
+        h, w = img.shape[:2]
+        c = img.shape[2] if img.ndim == 3 else 1
+        payload = _compress(img.data, self.codec)
+        header = _HEADER.pack(MAGIC, frame_id, STAGES.index(stage), self.codec, h, w, c, len(payload))
+        with self.lock:
+            offset = self.file.tell()
+            self.file.write(header)
+            self.file.write(payload)
+            entry = (offset + _HEADER.size, len(payload), h, w, c, self.codec)
+            self.index[(frame_id, stage)] = entry
+            self.pending.append([frame_id, stage, *entry])
+            self.bytes_raw += img.nbytes
+            self.bytes_stored += len(payload)
+
+    def flush(self):
+        """
+        Flush data and append the new index entries, so readers see everything
+        put so far; returns the data size. Costs only the records since the last flush.
+        """
+        with self.lock:
+            self.file.flush()
+            size = self.file.tell()
+            if self.pending:
+                _append_index(self.path, self.pending, size)
+                self.pending = []
+            return size
+
+    def close(self):
+        if self.file.closed:
+            return
+        with self.lock:
+            self.file.close()
+            self.pending = []
+            _save_index(self.path, self.index, self.path.stat().st_size)
+
+    def stats(self):
+        return {
+            "records": len(self.index),
+            "bytes_raw": self.bytes_raw,
+            "bytes_stored": self.bytes_stored,
+            "ratio": round(self.bytes_raw / self.bytes_stored, 2) if self.bytes_stored else 0.0,
+            "codec": CODEC_NAMES[self.codec],
+        }
+
+
+def _save_index(path, index, data_size):
+    """Replace the sidecar with one compact entry holding the whole index."""
+    entries = [[frame_id, stage, *entry] for (frame_id, stage), entry in index.items()]
+    tmp = _index_path(path).with_suffix(".idx.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"data_size": data_size, "entries": entries}, f, separators=(",", ":"))
+        f.write("\n")
+    os.replace(tmp, _index_path(path))
+
+
+def _append_index(path, entries, data_size):
+    """Append one delta line: the entries written since the previous line, valid up to ``data_size``."""
+    with open(_index_path(path), "a", encoding="utf-8") as f:
+        f.write(json.dumps({"data_size": data_size, "entries": entries}, separators=(",", ":")) + "\n")
+
+
+def _scan_index(path, repair=False, index=None, start=0):
+    """
+    Rebuild the index from record headers, from offset ``start`` on (adding to
+    ``index``); with ``repair`` a truncated tail record is cut off.
+    """
+    index = {} if index is None else index
+    valid_end = start
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        while valid_end + _HEADER.size <= size:
+            f.seek(valid_end)
+            magic, frame_id, stage, codec, h, w, c, length = _HEADER.unpack(f.read(_HEADER.size))
+            end = valid_end + _HEADER.size + length
+            if magic != MAGIC or end > size:
+                break
+            index[(frame_id, STAGES[stage])] = (valid_end + _HEADER.size, length, h, w, c, codec)
+            valid_end = end
+    if repair and valid_end < size:
+        with open(path, "r+b") as f:
+            f.truncate(valid_end)
+    return index
+
+
+def _load_index(path, repair=False):
+    """Replay the sidecar's entries that fit the data file, then scan any records after them."""
+    size = Path(path).stat().st_size
+    index, indexed_size = {}, 0
+    idx_path = _index_path(path)
+    if idx_path.exists():
+        with open(idx_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    delta = json.loads(line)
+                except ValueError:
+                    break  # Torn last line of a crashed append
+                # Entries for data beyond the file's end were truncated away
+                if delta["data_size"] > size:
+                    break
+                index.update(((e[0], e[1]), tuple(e[2:])) for e in delta["entries"])
+                indexed_size = delta["data_size"]
+    if indexed_size == size:
+        return index
+    return _scan_index(path, repair, index, indexed_size)
+
+
+class FrameStore:
+    """Memory-mapped random-access reader."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.index = _load_index(self.path)
+        self.file = open(self.path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        # Guards the mapping against a close() while a get() is copying out of it
+        self.lock = threading.Lock()
+        self.closed = False
+        # Shared-reader bookkeeping (frame_store_reader): holders, and whether a newer reader replaced it
+        self.users = 0
+        self.retired = False
+
+    def has(self, frame_id, stage):
+        return (frame_id, stage) in self.index
+
+    def stages(self, frame_id):
+        return [stage for stage in STAGES if (frame_id, stage) in self.index]
+
+    def frame_ids(self, stage=None):
+        return sorted({fid for fid, st in self.index if stage is None or st == stage})
+
+    def get(self, frame_id, stage):
+        """Decoded image for (frame_id, stage), or None if not stored or the store was closed."""
+        entry = self.index.get((frame_id, stage))
+        if entry is None:
+            return None
+        offset, length, h, w, c, codec = entry
+        with self.lock:
+            if self.closed:
+                return None
+            raw = self.map[offset:offset + length]
+        data = _decompress(raw, codec, h * w * c)
+        img = np.frombuffer(data, dtype=np.uint8)
+        return img.reshape((h, w, c) if c > 1 else (h, w))
+
+    def export_png(self, frame_id, stage, path):
+        """Write one stored image as PNG (e.g. for downloads); returns False if missing."""
+        import cv2
+
+        img = self.get(frame_id, stage)
+        if img is None:
+            return False
+        return cv2.imwrite(str(path), img)
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            if self.map is not None:
+                self.map.close()
+            self.file.close()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+@contextmanager
+def frame_store_reader(path):
+    """
+    Shared reader for a store (None if missing), held for the ``with`` block.
+
+    The cached reader is reopened when the file changes. A replaced reader is
+    closed once the last block holding it ends, so a reopen never closes the
+    mapping under another request's get().
+    """
+    store = _acquire_store(Path(path))
+    try:
+        yield store
+    finally:
+        if store is not None:
+            _release_store(store)
+
+
+def _acquire_store(path):
+    if not path.exists():
+        return None
+    key = str(path.resolve())
+    stamp = path.stat().st_mtime, path.stat().st_size
+    with _stores_lock:
+        cached = _stores.get(key)
+        if cached is None or cached[0] != stamp:
+            if cached is not None:
+                cached[1].retired = True
+                if cached[1].users == 0:
+                    cached[1].close()  # Release the stale mapping and its file descriptor
+            cached = (stamp, FrameStore(path))
+            _stores[key] = cached
+        cached[1].users += 1
+        return cached[1]
+
+
+def _release_store(store):
+    with _stores_lock:
+        store.users -= 1
+        if store.retired and store.users == 0:
+            store.close()
+
+
+def source_mtime(source):
+    """Modification time of an image path or of the store holding a StoredFrame."""
+    return Path(source.store_path if isinstance(source, StoredFrame) else source).stat().st_mtime
+
+
+def read_image(source):
+    """Decode an image from a file path or a StoredFrame (None if missing)."""
+    if isinstance(source, StoredFrame):
+        with frame_store_reader(source.store_path) as store:
+            return store.get(source.frame_id, source.stage) if store else None
+    import cv2
+
+    return cv2.imread(str(source))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or export a job's frame store")
+    parser.add_argument("store", help="Path to a .frames file")
+    parser.add_argument("--stage", choices=STAGES, default="enhanced", help="Stage to export (default: enhanced)")
+    parser.add_argument("--export", default=None, help="Export the stage's frames as PNGs into this directory")
+    parser.add_argument("--frames", default=None, help="Comma-separated frame ids to export (default: all)")
+    args = parser.parse_args()
+
+    store = FrameStore(args.store)
+    if args.export:
+        os.makedirs(args.export, exist_ok=True)
+        ids = [int(x) for x in args.frames.split(",")] if args.frames else store.frame_ids(args.stage)
+        exported = sum(store.export_png(fid, args.stage, Path(args.export) / f"{fid:06d}.png") for fid in ids)
+        print(f"[OK] Exported {exported} {args.stage} frames to {args.export}")
+    else:
+        for stage in STAGES:
+            print(f"{stage}: {len(store.frame_ids(stage))} frames")
+    store.close()
@@ -0,0 +1,609 @@
+"""
+Local inference server with cross-job dynamic batching.
+
+One process owns the NAFNet and Real-ESRGAN models. Jobs connect over a local
+socket (multiprocessing.connection, authkey-protected) and submit frames;
+requests for the same operation, parameters and frame size are grouped into
+batches. A batch runs when it is full, when its oldest request has waited
+``max_wait_ms``, or when the tightest latency SLO in it cannot afford to wait
+any longer. Everything runs on localhost:
+
+    INFERENCE_SERVER_AUTHKEY=<secret> python inference_server.py --port 7861   # serve
+    python inference_server.py --selftest             # local batching self-test
+
+Messages are pickled, so the shared secret in INFERENCE_SERVER_AUTHKEY is what
+keeps other local users from running code in the server: a standalone server
+requires it, start_inference_server generates one for its own process tree
+when none is set, and binding beyond loopback needs an explicitly set key.
+
+Processing code uses the server when INFERENCE_SERVER_ADDRESS (host:port) is
+set; see get_inference_client.
+"""
+import ipaddress
+import itertools
+import os
+import secrets
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent))
+
+
+DEFAULT_ADDRESS = ("127.0.0.1", 7861)
+# Environment variable holding the connection secret shared by server and clients
+AUTHKEY_ENV = "INFERENCE_SERVER_AUTHKEY"
+# Largest batch formed per operation
+MAX_BATCH = 8
+# Longest a request waits for batch-mates
+MAX_WAIT_MS = 10.0
+# Default per-request latency objective (submit -> result)
+DEFAULT_SLO_MS = 2000.0
+# Weight of the newest batch in the per-key run-time estimate
+COST_EMA_ALPHA = 0.3
+# Latency samples kept per operation for percentiles
+LATENCY_WINDOW = 1000
+
+
+_generated_authkey = None
+
+
+def parse_address(value):
+    """'host:port' or 'port' -> (host, port)."""
+    host, _, port = str(value).rpartition(":")
+    return (host or DEFAULT_ADDRESS[0], int(port))
+
+
+def is_loopback(host):
+    """True if ``host`` resolves to a loopback address."""
+    try:
+        return ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    except (OSError, ValueError):
+        return False
+
+
+def configured_authkey():
+    """The INFERENCE_SERVER_AUTHKEY secret as bytes, or None if it is not set."""
+    key = os.environ.get(AUTHKEY_ENV)
+    return key.encode() if key else None
+
+
+def explicit_authkey():
+    """The configured secret unless this process generated it (see ensure_authkey)."""
+    key = configured_authkey()
+    return None if key is None or key == _generated_authkey else key
+
+
+def ensure_authkey():
+    """
+    The configured secret, or a new random one.
+
+    A generated key is exported to INFERENCE_SERVER_AUTHKEY, so clients in this
+    process and the processes it spawns connect with it.
+    """
+    global _generated_authkey
+    key = configured_authkey()
+    if key is None:
+        os.environ[AUTHKEY_ENV] = secrets.token_hex(32)
+        key = _generated_authkey = configured_authkey()
+    return key
+
+
+# ---------------------------------------------------------------------------
+# Operations: each maps a list of same-size frames (+ params) to a list of results
+# ---------------------------------------------------------------------------
+
+def _run_deblur(imgs, params):
+    from deblur.nafnet_infer import deblur_batch
+    for _ in range(int(params.get("passes", 1))):
+        imgs = deblur_batch(imgs, params.get("model_path"), params.get("variant"))
+    return imgs
+
+
+def _run_deblur_regions(imgs, params):
+    # Blur maps differ per frame, so each frame runs its own tile schedule
+    from deblur.nafnet_infer import deblur_regions
+    return [deblur_regions(img, params.get("model_path"), params.get("variant"), thresholds=params.get("thresholds"))
+            for img in imgs]
+
+
+def _run_enhance(imgs, params):
+    from enhancement.realesrgan_infer import enhance_batch, enhance_image
+    scale = int(params.get("scale", 2))
+    if params.get("mode", "full") == "text":
+        return [enhance_image(img, params.get("model_path"), scale, params.get("tier"), mode="text")
+                for img in imgs]
+    return enhance_batch(imgs, params.get("model_path"), scale, params.get("tier"))
+
+
+def _run_echo(imgs, params):
+    # Model-free operation for exercising batching: a fixed cost per batch plus per frame
+    time.sleep((float(params.get("batch_ms", 0)) + float(params.get("frame_ms", 0)) * len(imgs)) / 1000.0)
+    return [img.copy() for img in imgs]
+
+
+OPERATIONS = {
+    "deblur": _run_deblur,
+    "deblur_regions": _run_deblur_regions,
+    "enhance": _run_enhance,
+    "echo": _run_echo,
+}
+
+
+# ---------------------------------------------------------------------------
+# Server
+# ---------------------------------------------------------------------------
+
+class ServerMetrics:
+    """Batch-size histogram, per-operation latencies and SLO violations."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.batch_sizes = {}
+        self.ops = {}
+
+    def _op(self, op):
+        if op not in self.ops:
+            self.ops[op] = {
+                "requests": 0, "errors": 0, "slo_violations": 0, "batches": 0,
+                "latency": deque(maxlen=LATENCY_WINDOW), "queue": deque(maxlen=LATENCY_WINDOW),
+            }
+        return self.ops[op]
+
+    def record_batch(self, op, size):
+        with self.lock:
+            self.batch_sizes[size] = self.batch_sizes.get(size, 0) + 1
+            self._op(op)["batches"] += 1
+
+    def record_request(self, op, latency, queued, slo, ok=True):
+        with self.lock:
+            stats = self._op(op)
+            stats["requests"] += 1
+            stats["errors"] += 0 if ok else 1
+            stats["slo_violations"] += 1 if latency > slo else 0
+            stats["latency"].append(latency)
+            stats["queue"].append(queued)
+
+    def summary(self):
+        def pct(values, q):
+            return round(float(np.percentile(values, q)) * 1000.0, 2) if values else 0.0
+
+        with self.lock:
+            batches = sum(self.batch_sizes.values())
+            frames = sum(size * count for size, count in self.batch_sizes.items())
+            ops = {}
+            for op, stats in self.ops.items():
+                latency, queued = list(stats["latency"]), list(stats["queue"])
+                ops[op] = {
+                    "requests": stats["requests"],
+                    "errors": stats["errors"],
+                    "batches": stats["batches"],
+                    "slo_violations": stats["slo_violations"],
+                    "slo_violation_rate": round(stats["slo_violations"] / stats["requests"], 4)
+                    if stats["requests"] else 0.0,
+                    "latency_ms": {"p50": pct(latency, 50), "p95": pct(latency, 95), "p99": pct(latency, 99)},
+                    "queue_ms": {"p50": pct(queued, 50), "p95": pct(queued, 95)},
+                }
+            return {
+                "uptime_s": round(time.monotonic() - self.started, 1),
+                "batches": batches,
+                "mean_batch_size": round(frames / batches, 2) if batches else 0.0,
+                "batch_sizes": {str(size): count for size, count in sorted(self.batch_sizes.items())},
+                "ops": ops,
+            }
+
+
+class _Request:
+    __slots__ = ("reply", "req_id", "op", "params", "img", "arrived", "deadline", "slo")
+
+    def __init__(self, reply, req_id, op, params, img, slo_ms):
+        self.reply = reply
+        self.req_id = req_id
+        self.op = op
+        self.params = params
+        self.img = img
+        self.arrived = time.monotonic()
+        self.slo = slo_ms / 1000.0
+        self.deadline = self.arrived + self.slo
+
+
+class BatchScheduler:
+    """
+    Groups requests by (op, params, frame shape) and runs one batch at a time.
+
+    A single execution thread keeps model use serialized on the device, which
+    is what the per-process singletons did implicitly, but across all jobs.
+    """
+
+    def __init__(self, metrics, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.metrics = metrics
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.pending = {}
+        self.costs = {}
+        self.cond = threading.Condition()
+        self.stopped = False
+
+    @staticmethod
+    def batch_key(request):
+        params = tuple(sorted((k, str(v)) for k, v in request.params.items()))
+        return request.op, params, getattr(request.img, "shape", None)
+
+    def submit(self, request):
+        if request.op not in OPERATIONS:
+            request.reply((request.req_id, False, f"Unknown operation '{request.op}'", {}))
+            return
+        with self.cond:
+            self.pending.setdefault(self.batch_key(request), deque()).append(request)
+            self.cond.notify()
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify()
+
+    def _due_at(self, key, queue):
+        """Time at which this key's batch must run."""
+        if len(queue) >= self.max_batch:
+            return 0.0
+        cost = self.costs.get(key, 0.0)
+        oldest_wait_end = queue[0].arrived + self.max_wait
+        tightest = min(request.deadline for request in queue) - cost
+        return min(oldest_wait_end, tightest)
+
+    def _next_batch(self):
+        """Block until some batch is due, then pop it (None when stopped)."""
+        with self.cond:
+            while not self.stopped:
+                now = time.monotonic()
+                due = [(self._due_at(key, queue), key) for key, queue in self.pending.items() if queue]
+                if due:
+                    when, key = min(due)
+                    if when <= now:
+                        queue = self.pending[key]
+                        batch = [queue.popleft() for _ in range(min(self.max_batch, len(queue)))]
+                        if not queue:
+                            del self.pending[key]
+                        return key, batch
+                    self.cond.wait(timeout=when - now)
+                else:
+                    self.cond.wait()
+            return None
+
+    def run(self):
+        while True:
+            item = self._next_batch()
+            if item is None:
+                return
+            key, batch = item
+            op, params = batch[0].op, batch[0].params
+            started = time.monotonic()
+            try:
+                outputs = OPERATIONS[op]([request.img for request in batch], params)
+                error = None
+            except Exception as e:
+                outputs, error = None, str(e)
+            finished = time.monotonic()
+
+            cost = finished - started
+            previous = self.costs.get(key)
+            self.costs[key] = cost if previous is None else COST_EMA_ALPHA * cost + (1 - COST_EMA_ALPHA) * previous
+            self.metrics.record_batch(op, len(batch))
+
+            for i, request in enumerate(batch):
+                latency = finished - request.arrived
+                info = {
+                    "batch_size": len(batch),
+                    "queue_ms": round((started - request.arrived) * 1000.0, 2),
+                    "run_ms": round(cost * 1000.0, 2),
+                    "latency_ms": round(latency * 1000.0, 2),
+                    "slo_met": latency <= request.slo,
+                }
+                self.metrics.record_request(op, latency, started - request.arrived, request.slo, ok=error is None)
+                payload = error if error is not None else outputs[i]
+                request.reply((request.req_id, error is None, payload, info))
+
+
+class InferenceServer:
+    """Accepts local client connections and feeds their frames to one BatchScheduler."""
+
+    def __init__(self, address, authkey, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS, allow_remote=False):
+        """
+        Args:
+            address: (host, port) to listen on
+            authkey: Connection secret (bytes); required, clients send pickled messages
+            max_batch: Largest batch formed per operation (default: MAX_BATCH)
+            max_wait_ms: Longest a request waits for batch-mates (default: MAX_WAIT_MS)
+            allow_remote: Permit a non-loopback bind; only with an explicitly configured key (default: False)
+
+        Raises:
+            ValueError: Without an authkey, or for a non-loopback host unless allow_remote
+        """
+        if not authkey:
+            raise ValueError(f"The inference server needs an authkey (set {AUTHKEY_ENV})")
+        if not allow_remote and not is_loopback(address[0]):
+            raise ValueError(f"Refusing to serve on non-loopback host {address[0]} "
+                             f"without an explicitly set {AUTHKEY_ENV}")
+        self.address = address
+        self.authkey = authkey
+        self.metrics = ServerMetrics()
+        self.scheduler = BatchScheduler(self.metrics, max_batch=max_batch, max_wait_ms=max_wait_ms)
+        self.listener = None
+
+    def _handle(self, conn):
+        send_lock = threading.Lock()
+
+        def reply(message):
+            with send_lock:
+                try:
+                    conn.send(message)
+                except (OSError, EOFError):
+                    pass  # Client went away; its result is dropped
+
+        try:
+            while True:
+                message = conn.recv()
+                kind = message[0]
+                if kind == "infer":
+                    _, req_id, op, params, img, slo_ms = message
+                    self.scheduler.submit(_Request(reply, req_id, op, params or {}, img, slo_ms))
+                elif kind == "metrics":
+                    reply((message[1], True, self.metrics.summary(), {}))
+                elif kind == "close":
+                    break
+                else:
+                    # Answer instead of dropping, so the caller does not wait out its timeout
+                    req_id = message[1] if len(message) > 1 else None
+                    reply((req_id, False, f"Unknown message kind: {kind}", {}))
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def serve_forever(self):
+        self.listener = Listener(self.address, authkey=self.authkey)
+        threading.Thread(target=self.scheduler.run, daemon=True).start()
+        print(f"[OK] Inference server listening on {self.address[0]}:{self.address[1]} "
+              f"(max_batch={self.scheduler.max_batch}, max_wait={self.scheduler.max_wait * 1000:.0f}ms)")
+        try:
+            while True:
+                try:
+                    conn = self.listener.accept()
+                except OSError:
+                    break
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        finally:
+            self.scheduler.stop()
+
+    def close(self):
+        self.scheduler.stop()
+        if self.listener is not None:
+            self.listener.close()
+
+
+def _serve(address, authkey, max_batch, max_wait_ms, allow_remote):
+    InferenceServer(address, authkey, max_batch, max_wait_ms, allow_remote).serve_forever()
+
+
+def start_inference_server(address=DEFAULT_ADDRESS, authkey=None, max_batch=MAX_BATCH,
+                           max_wait_ms=MAX_WAIT_MS, timeout=30.0):
+    """
+    Start the server in a separate (spawned) process and wait until it accepts connections.
+
+    Args:
+        authkey: Connection secret (optional; the configured one, else a generated
+                 one exported to INFERENCE_SERVER_AUTHKEY for this process's clients)
+
+    Returns:
+        multiprocessing.Process running the server
+    """
+    import multiprocessing as mp
+
+    allow_remote = authkey is not None or explicit_authkey() is not None
+    if not allow_remote and not is_loopback(address[0]):
+        raise ValueError(f"Set {AUTHKEY_ENV} explicitly to serve on non-loopback host {address[0]}")
+    authkey = authkey or ensure_authkey()
+    process = mp.get_context("spawn").Process(
+        target=_serve, args=(address, authkey, max_batch, max_wait_ms, allow_remote), daemon=True)
+    process.start()
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            Client(address, authkey=authkey).send(("close",))
+            return process
+        except (ConnectionRefusedError, OSError):
+            if time.monotonic() > deadline or not process.is_alive():
+                process.terminate()
+                raise RuntimeError(f"Inference server did not start on {address[0]}:{address[1]}")
+            time.sleep(0.1)
+
+
+# ---------------------------------------------------------------------------
+# Client
+# ---------------------------------------------------------------------------
+
+class InferenceClient:
+    """
+    Thread-safe client; any number of job threads can share one connection.
+
+    A reader thread routes responses to the waiting callers by request id.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, authkey=None, timeout=300.0):
+        authkey = authkey or configured_authkey()
+        if authkey is None:
+            raise RuntimeError(f"{AUTHKEY_ENV} is not set; it must match the inference server's key")
+        self.conn = Client(address, authkey=authkey)
+        self.timeout = timeout
+        self.send_lock = threading.Lock()
+        self.waiting = {}
+        self.waiting_lock = threading.Lock()
+        self.ids = itertools.count()
+        self.closed = False
+        threading.Thread(target=self._read_loop, daemon=True).start()
+
+    def _read_loop(self):
+        try:
+            while True:
+                req_id, ok, payload, info = self.conn.recv()
+                with self.waiting_lock:
+                    slot = self.waiting.pop(req_id, None)
+                if slot is not None:
+                    slot[1] = (ok, payload, info)
+                    slot[0].set()
+        except (EOFError, OSError):
+            self.closed = True
+            with self.waiting_lock:
+                for slot in self.waiting.values():
+                    slot[1] = (False, "Inference server connection lost", {})
+                    slot[0].set()
+                self.waiting.clear()
+
+    def _call(self, message_builder):
+        if self.closed:
+            raise RuntimeError("Inference server connection lost")
+        req_id = next(self.ids)
+        slot = [threading.Event(), None]
+        with self.waiting_lock:
+            self.waiting[req_id] = slot
+        with self.send_lock:
+            self.conn.send(message_builder(req_id))
+        if not slot[0].wait(self.timeout):
+            with self.waiting_lock:
+                self.waiting.pop(req_id, None)
+            raise TimeoutError(f"Inference request timed out after {self.timeout}s")
+        ok, payload, info = slot[1]
+        if not ok:
+            raise RuntimeError(payload)
+        return payload, info
+
+    def infer(self, op, img, params=None, slo_ms=DEFAULT_SLO_MS):
+        """
+        Run one frame through an operation on the server.
+
+        Returns:
+            tuple: (result, info) where info has batch_size, queue_ms, run_ms, latency_ms, slo_met
+        """
+        return self._call(lambda req_id: ("infer", req_id, op, params or {}, img, slo_ms))
+
+    def deblur(self, img, passes=1, variant=None, model_path=None, slo_ms=DEFAULT_SLO_MS):
+        params = {"passes": passes, "variant": variant, "model_path": model_path}
+        return self.infer("deblur", img, params, slo_ms)[0]
+
+    def deblur_regions(self, img, variant=None, model_path=None, thresholds=None, slo_ms=DEFAULT_SLO_MS):
+        params = {"variant": variant, "model_path": model_path, "thresholds": thresholds}
+        return self.infer("deblur_regions", img, params, slo_ms)[0]
+
+    def enhance(self, img, scale=2, tier=None, mode="full", model_path=None, slo_ms=DEFAULT_SLO_MS):
+        params = {"scale": scale, "tier": tier, "mode": mode, "model_path": model_path}
+        return self.infer("enhance", img, params, slo_ms)[0]
+
+    def metrics(self):
+        return self._call(lambda req_id: ("metrics", req_id))[0]
+
+    def close(self):
+        with self.send_lock:
+            try:
+                self.conn.send(("close",))
+            except (OSError, EOFError):
+                pass
+        self.conn.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_inference_client():
+    """Shared client for INFERENCE_SERVER_ADDRESS, or None when the server is not configured."""
+    global _client
+    address = os.environ.get("INFERENCE_SERVER_ADDRESS")
+    if not address:
+        return None
+    with _client_lock:
+        if _client is None or _client.closed:
+            _client = InferenceClient(parse_address(address))
+            print(f"[OK] Using inference server at {address}")
+        return _client
+
+
+def self_test(jobs=4, frames_per_job=32, height=1080, width=1920, batch_ms=20.0, frame_ms=2.0,
+              max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS, slo_ms=250.0, port=None):
+    """
+    Localhost batching test: concurrent "jobs" send frames through the model-free echo op.
+
+    Returns:
+        dict: Server metrics plus client-side wall time and frame checks
+    """
+    address = (DEFAULT_ADDRESS[0], port or DEFAULT_ADDRESS[1] + 1)
+    process = start_inference_server(address, max_batch=max_batch, max_wait_ms=max_wait_ms)
+    errors = []
+
+    def job(seed):
+        client = InferenceClient(address)
+        rng = np.random.default_rng(seed)
+        frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        for _ in range(frames_per_job):
+            output, _ = client.infer("echo", frame, {"batch_ms": batch_ms, "frame_ms": frame_ms}, slo_ms)
+            if not np.array_equal(output, frame):
+                errors.append("frame mismatch")
+        client.close()
+
+    try:
+        started = time.monotonic()
+        threads = [threading.Thread(target=job, args=(seed,)) for seed in range(jobs)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        client = InferenceClient(address)
+        summary = client.metrics()
+        client.close()
+    finally:
+        process.terminate()
+        process.join()
+
+    summary["wall_s"] = round(elapsed, 3)
+    summary["frames_per_s"] = round(jobs * frames_per_job / elapsed, 2)
+    summary["errors"] = errors
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Local batching inference server")
+    parser.add_argument("--host", default=DEFAULT_ADDRESS[0],
+                        help="Bind address (default: 127.0.0.1; other hosts need an explicit authkey)")
+    parser.add_argument("--port", type=int, default=DEFAULT_ADDRESS[1], help="Port (default: 7861)")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="Largest batch (default: 8)")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS,
+                        help="Max time a request waits for batch-mates (default: 10)")
+    parser.add_argument("--selftest", action="store_true",
+                        help="Run the localhost batching self-test and exit")
+    parser.add_argument("--jobs", type=int, default=4, help="Concurrent jobs for --selftest (default: 4)")
+
+    args = parser.parse_args()
+
+    if args.selftest:
+        print(json.dumps(self_test(jobs=args.jobs, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms),
+                         indent=2))
+    else:
+        # Clients of a standalone server live in other processes, so the key must be shared explicitly
+        authkey = explicit_authkey()
+        if authkey is None:
+            print(f"[ERROR] Set {AUTHKEY_ENV} to a shared secret (the same value for the server and its clients)")
+            sys.exit(1)
+        InferenceServer((args.host, args.port), authkey, max_batch=args.max_batch,
+                        max_wait_ms=args.max_wait_ms, allow_remote=True).serve_forever()
@@ -0,0 +1,203 @@
+"""
+Priority and fair-share scheduling of model work between jobs.
+
+Single-frame requests, video jobs and background work share the same model
+singletons and CPU cores. Instead of letting their threads compete freely,
+each unit of model work runs inside a slot granted by the JobScheduler:
+
+- Priority classes: waiting "interactive" work (single frames) is granted
+  before "batch" work (video frames), which goes before "background" work
+  (e.g. model warm-up). A waiting ticket is promoted one class for every
+  PRIORITY_AGING_S it has waited, so lower classes are delayed under load
+  but never starved.
+- Fair share: within a class, the slot goes to the client that has used the
+  least compute recently (exponentially decayed seconds of slot time).
+- Preemption at frame granularity: a video job holds a slot for one frame
+  only, so a waiting interactive frame is served as soon as the frame in
+  progress finishes.
+
+    with get_job_scheduler().slot("interactive", client_id):
+        ... model work ...
+
+Work whose tail needs no model (e.g. OCR after restoration) can hold the slot
+and give it back early:
+
+    with get_job_scheduler().hold("interactive", client_id) as model_slot:
+        ... model work ...
+        model_slot.release()
+        ... everything else ...
+"""
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+PRIORITY_CLASSES = ("interactive", "batch", "background")
+# Concurrent slots (model work running at once)
+SCHEDULER_SLOTS = int(os.environ.get("SCHEDULER_SLOTS", "1"))
+# Queueing target for interactive work; waits above it are counted as misses
+INTERACTIVE_TARGET_MS = float(os.environ.get("INTERACTIVE_TARGET_MS", "2000"))
+# Seconds of waiting that promote a ticket by one priority class
+PRIORITY_AGING_S = float(os.environ.get("PRIORITY_AGING_S", "30"))
+# Half-life of a client's recorded usage for fair share
+USAGE_HALF_LIFE_S = 60.0
+# Wait samples kept per class for percentiles
+WAIT_WINDOW = 512
+
+
+class _Ticket:
+    __slots__ = ("priority", "rank", "client_id", "seq", "enqueued", "granted")
+
+    def __init__(self, priority, client_id, seq):
+        self.priority = priority
+        self.rank = PRIORITY_CLASSES.index(priority)
+        self.client_id = client_id
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.granted = False
+
+
+class SlotHold:
+    """A granted slot that can be released before the block holding it ends; release() is idempotent."""
+
+    def __init__(self, scheduler, ticket):
+        self.scheduler = scheduler
+        self.ticket = ticket
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.released = False
+
+    def release(self):
+        with self.lock:
+            if self.released:
+                return
+            self.released = True
+        self.scheduler.release(self.ticket, time.monotonic() - self.started)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class JobScheduler:
+    """Grants compute slots by (aged) priority class, then by least recent client usage."""
+
+    def __init__(self, slots=SCHEDULER_SLOTS, interactive_target_ms=INTERACTIVE_TARGET_MS,
+                 aging_s=PRIORITY_AGING_S):
+        self.slots = max(1, slots)
+        self.interactive_target_ms = interactive_target_ms
+        self.aging_s = aging_s
+        self.cond = threading.Condition()
+        self.running = 0
+        self.waiting = []
+        self.usage = {}  # client_id -> (decayed seconds, as of monotonic time)
+        self.seq = itertools.count()
+        self.stats = {
+            priority: {"granted": 0, "target_misses": 0, "waits": deque(maxlen=WAIT_WINDOW)}
+            for priority in PRIORITY_CLASSES
+        }
+
+    def _usage(self, client_id, now):
+        used, since = self.usage.get(client_id, (0.0, now))
+        return used * 0.5 ** ((now - since) / USAGE_HALF_LIFE_S)
+
+    def _rank(self, ticket, now):
+        """Priority rank after aging: one class up per aging_s waited."""
+        if not self.aging_s:
+            return ticket.rank
+        return max(0, ticket.rank - int((now - ticket.enqueued) / self.aging_s))
+
+    def _grant(self):
+        """Hand free slots to the most deserving waiters (call with the lock held)."""
+        now = time.monotonic()
+        while self.running < self.slots and self.waiting:
+            ticket = min(self.waiting, key=lambda t: (self._rank(t, now), self._usage(t.client_id, now), t.seq))
+            self.waiting.remove(ticket)
+            ticket.granted = True
+            self.running += 1
+
+            wait_ms = (now - ticket.enqueued) * 1000.0
+            stats = self.stats[ticket.priority]
+            stats["granted"] += 1
+            stats["waits"].append(wait_ms)
+            if ticket.priority == "interactive" and wait_ms > self.interactive_target_ms:
+                stats["target_misses"] += 1
+        self.cond.notify_all()
+
+    def acquire(self, priority="batch", client_id=None):
+        """Block until a slot is granted; returns the ticket to pass to release()."""
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority class: {priority}")
+        with self.cond:
+            ticket = _Ticket(priority, client_id, next(self.seq))
+            self.waiting.append(ticket)
+            self._grant()
+            while not ticket.granted:
+                self.cond.wait()
+        return ticket
+
+    def release(self, ticket, elapsed_s):
+        """Return a slot and charge its run time to the ticket's client."""
+        with self.cond:
+            now = time.monotonic()
+            self.usage[ticket.client_id] = (self._usage(ticket.client_id, now) + elapsed_s, now)
+            # Forget clients whose usage has decayed away
+            for client_id in [c for c in self.usage if self._usage(c, now) < 0.01]:
+                del self.usage[client_id]
+            self.running -= 1
+            self._grant()
+
+    @contextmanager
+    def slot(self, priority="batch", client_id=None):
+        """Context manager around one unit of model work (one frame for video jobs)."""
+        ticket = self.acquire(priority, client_id)
+        started = time.monotonic()
+        try:
+            yield ticket
+        finally:
+            self.release(ticket, time.monotonic() - started)
+
+    def hold(self, priority="batch", client_id=None):
+        """Acquire a slot as a SlotHold (a context manager whose release() may be called early)."""
+        return SlotHold(self, self.acquire(priority, client_id))
+
+    def metrics(self):
+        def pct(values, q):
+            return round(values[min(len(values) - 1, int(len(values) * q / 100))], 2) if values else 0.0
+
+        with self.cond:
+            now = time.monotonic()
+            classes = {}
+            for priority, stats in self.stats.items():
+                waits = sorted(stats["waits"])
+                classes[priority] = {
+                    "waiting": sum(1 for t in self.waiting if t.priority == priority),
+                    "granted": stats["granted"],
+                    "wait_ms": {"p50": pct(waits, 50), "p95": pct(waits, 95), "max": pct(waits, 100)},
+                }
+            classes["interactive"]["target_ms"] = self.interactive_target_ms
+            classes["interactive"]["target_misses"] = self.stats["interactive"]["target_misses"]
+            return {
+                "slots": self.slots,
+                "running": self.running,
+                "classes": classes,
+                "client_usage_s": {str(client): round(self._usage(client, now), 2) for client in self.usage},
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_job_scheduler():
+    """Process-wide scheduler shared by all jobs."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = JobScheduler()
+        return _scheduler
@@ -0,0 +1,366 @@
+"""
+Live stream restoration with a bounded end-to-end latency.
+
+Consumes any cv2.VideoCapture-compatible source (URL, device index) or a
+growing file / named pipe, restores frames as they arrive and emits them
+continuously. When restoration falls behind the latency budget, frames are
+processed in a cheaper mode or dropped.
+
+Following a growing file needs a streamable container (MPEG-TS, MJPEG,
+Matroska written in live mode): a plain MP4 has no readable index until the
+writer finalizes it, so new frames cannot be read from it while it grows.
+"""
+import os
+import sys
+import queue
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent))
+
+from blur_detection.blur_test import blur_level, DEBLUR_PASSES
+
+
+# Processing modes, from best quality to cheapest
+#   full:    per-frame blur detection, NAFNet (1-2 passes), quality enhancement
+#   fast:    at most one NAFNet pass, compact (fast tier) enhancement
+#   minimal: no deblur, Lanczos upscaling only
+LIVE_MODES = ("full", "fast", "minimal")
+# Weight of the newest sample in the per-mode cost moving average
+COST_EMA_ALPHA = 0.3
+# Per-frame decay of a skipped mode's cost estimate
+COST_DECAY = 0.98
+# Latency samples kept for percentile metrics
+LATENCY_WINDOW = 1000
+
+
+class LiveMetrics:
+    """Latency and drop counters for a live run."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.frames_in = 0
+        self.frames_out = 0
+        self.dropped_queue = 0
+        self.dropped_late = 0
+        self.modes = {mode: 0 for mode in LIVE_MODES}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.started = time.monotonic()
+
+    def record_output(self, mode, latency):
+        with self.lock:
+            self.frames_out += 1
+            self.modes[mode] += 1
+            self.latencies.append(latency)
+
+    def summary(self):
+        with self.lock:
+            latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+            dropped = self.dropped_queue + self.dropped_late
+            elapsed = time.monotonic() - self.started
+            return {
+                "frames_in": self.frames_in,
+                "frames_out": self.frames_out,
+                "dropped_queue": self.dropped_queue,
+                "dropped_late": self.dropped_late,
+                "dropped_rate": round(dropped / self.frames_in, 4) if self.frames_in else 0.0,
+                "modes": dict(self.modes),
+                "latency_ms": {
+                    "p50": round(float(np.percentile(latencies, 50)) * 1000.0, 1),
+                    "p95": round(float(np.percentile(latencies, 95)) * 1000.0, 1),
+                    "max": round(float(latencies.max()) * 1000.0, 1),
+                },
+                "output_fps": round(self.frames_out / elapsed, 2) if elapsed > 0 else 0.0,
+            }
+
+
+def _open_source(source):
+    """Open a device index (e.g. "0"), URL, file or named pipe."""
+    if isinstance(source, int) or (isinstance(source, str) and source.isdigit()):
+        return cv2.VideoCapture(int(source))
+    return cv2.VideoCapture(str(source))
+
+
+def _is_local_file(source):
+    return isinstance(source, (str, Path)) and not str(source).isdigit() and os.path.exists(str(source))
+
+
+class FrameReader(threading.Thread):
+    """
+    Capture thread feeding a bounded queue.
+
+    When the consumer falls behind, the oldest queued frame is dropped so the
+    queue always holds the freshest frames. For local files ``realtime``
+    paces reads at the source FPS, and ``follow`` keeps polling a growing
+    file or pipe for new frames until ``idle_timeout`` passes without any
+    (streamable containers only, see the module docstring).
+    """
+
+    def __init__(self, source, frames, metrics, stop_event, realtime=False, follow=False,
+                 idle_timeout=5.0, poll_interval=0.05):
+        super().__init__(daemon=True)
+        self.source = source
+        self.frames = frames
+        self.metrics = metrics
+        self.stop_event = stop_event
+        self.realtime = realtime
+        self.follow = follow and _is_local_file(source)
+        self.idle_timeout = idle_timeout
+        self.poll_interval = poll_interval
+        self.fps = None
+        self.error = None
+
+    def _put(self, item):
+        while True:
+            try:
+                self.frames.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.frames.get_nowait()
+                    with self.metrics.lock:
+                        self.metrics.dropped_queue += 1
+                except queue.Empty:
+                    pass
+
+    def _finish(self):
+        """Queue the end-of-stream marker, giving up once the consumer has stopped."""
+        while not self.stop_event.is_set():
+            try:
+                self.frames.put(None, timeout=self.poll_interval)
+                return
+            except queue.Full:
+                continue
+
+    def run(self):
+        cap = _open_source(self.source)
+        if not cap.isOpened():
+            self.error = f"Could not open live source {self.source}"
+            self._finish()
+            return
+
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        frame_interval = 1.0 / self.fps if self.realtime and self.fps > 0 else 0.0
+        frame_id = 0
+        next_due = time.monotonic()
+        last_frame_at = time.monotonic()
+
+        while not self.stop_event.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                if not self.follow or time.monotonic() - last_frame_at > self.idle_timeout:
+                    break
+                # Growing file: wait for more data, then reopen at the next frame
+                time.sleep(self.poll_interval)
+                cap.release()
+                cap = _open_source(self.source)
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_id)
+                continue
+
+            if frame_interval:
+                next_due += frame_interval
+                delay = next_due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+            last_frame_at = time.monotonic()
+            with self.metrics.lock:
+                self.metrics.frames_in += 1
+            self._put((frame_id, last_frame_at, frame))
+            frame_id += 1
+
+        cap.release()
+        self._finish()
+
+
+class LiveRestorer:
+    """Restores frames under a latency budget, degrading modes as needed."""
+
+    def __init__(self, latency_budget=0.5, enhance_scale=2, deblur_model_path=None, enhance_model_path=None):
+        self.latency_budget = latency_budget
+        self.enhance_scale = enhance_scale
+        self.deblur_model_path = deblur_model_path
+        self.enhance_model_path = enhance_model_path
+        self.costs = {mode: None for mode in LIVE_MODES}
+
+    def choose_mode(self, age):
+        """Best mode whose expected cost fits the remaining budget, or None to drop."""
+        remaining = self.latency_budget - age
+        for mode in LIVE_MODES:
+            cost = self.costs[mode]
+            if cost is None or cost <= remaining:
+                return mode
+            # Let skipped modes' estimates decay so they are retried once load eases
+            self.costs[mode] = cost * COST_DECAY
+        return None
+
+    def _run_mode(self, frame, mode):
+        """The restoration stages of one mode (models are only loaded by the modes that use them)."""
+        if mode == "minimal":
+            from enhancement.realesrgan_infer import simple_enhance
+            h, w = frame.shape[:2]
+            return simple_enhance(frame, (w * self.enhance_scale, h * self.enhance_scale))
+
+        from deblur.nafnet_infer import deblur_image
+        from enhancement.realesrgan_infer import enhance_image
+        passes = DEBLUR_PASSES[blur_level(frame)]
+        if mode == "fast":
+            passes = min(passes, 1)
+        for _ in range(passes):
+            frame = deblur_image(frame, model_path=self.deblur_model_path)
+        tier = "fast" if mode == "fast" else None
+        return enhance_image(frame, model_path=self.enhance_model_path, scale=self.enhance_scale, tier=tier)
+
+    def restore(self, frame, mode):
+        started = time.monotonic()
+        output = self._run_mode(frame, mode)
+
+        cost = time.monotonic() - started
+        previous = self.costs[mode]
+        self.costs[mode] = cost if previous is None else COST_EMA_ALPHA * cost + (1 - COST_EMA_ALPHA) * previous
+        return output
+
+
+def run_live(
+    source,
+    output_path=None,
+    latency_budget=0.5,
+    enhance_scale=2,
+    deblur_model_path=None,
+    enhance_model_path=None,
+    realtime=False,
+    follow=False,
+    max_frames=None,
+    duration=None,
+    on_frame=None,
+    queue_size=2,
+    stop_event=None
+):
+    """
+    Restore a live source continuously under a latency budget.
+
+    Args:
+        source: Device index, URL, file or named pipe
+        output_path: Write restored frames to this video (optional)
+        latency_budget: Max seconds from capture to output before a frame is dropped (default: 0.5)
+        enhance_scale: Upscaling factor for enhancement (default: 2)
+        deblur_model_path: NAFNet checkpoint (optional, default weights if None)
+        enhance_model_path: Real-ESRGAN checkpoint (optional, default weights if None)
+        realtime: Pace a local file at its native FPS, simulating a live feed (default: False)
+        follow: Keep reading a growing file / pipe until it goes idle; files must use a
+                streamable container such as MPEG-TS or MJPEG, not MP4 (default: False)
+        max_frames: Stop after this many captured frames (optional)
+        duration: Stop after this many seconds (optional)
+        on_frame: Callback(frame, info) for every restored frame (optional)
+        queue_size: Capture queue depth; older frames are dropped when full (default: 2)
+        stop_event: threading.Event to stop the run externally (optional)
+
+    Returns:
+        dict: Metrics summary (latency percentiles, dropped-frame rate, mode counts)
+    """
+    stop_event = stop_event or threading.Event()
+    metrics = LiveMetrics()
+    frames = queue.Queue(maxsize=queue_size)
+    reader = FrameReader(source, frames, metrics, stop_event, realtime=realtime, follow=follow)
+    restorer = LiveRestorer(latency_budget=latency_budget, enhance_scale=enhance_scale,
+                            deblur_model_path=deblur_model_path, enhance_model_path=enhance_model_path)
+    writer = None
+    writer_size = None
+    deadline = time.monotonic() + duration if duration else None
+
+    reader.start()
+    try:
+        while True:
+            if deadline and time.monotonic() > deadline:
+                break
+            try:
+                item = frames.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if item is None:
+                break
+            frame_id, captured_at, frame = item
+            if max_frames is not None and frame_id >= max_frames:
+                break
+
+            mode = restorer.choose_mode(time.monotonic() - captured_at)
+            if mode is None:
+                with metrics.lock:
+                    metrics.dropped_late += 1
+                continue
+
+            restored = restorer.restore(frame, mode)
+            if output_path:
+                if writer is None:
+                    size = (restored.shape[1], restored.shape[0])
+                    fps = reader.fps or 25.0
+                    writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+                    writer_size = size
+                if (restored.shape[1], restored.shape[0]) != writer_size:
+                    restored = cv2.resize(restored, writer_size, interpolation=cv2.INTER_LANCZOS4)
+                writer.write(restored)
+
+            latency = time.monotonic() - captured_at
+            metrics.record_output(mode, latency)
+            if on_frame:
+                on_frame(restored, {"frame_id": frame_id, "mode": mode, "latency": latency})
+    finally:
+        stop_event.set()
+        reader.join(timeout=2.0)
+        if writer is not None:
+            writer.release()
+
+    if reader.error:
+        print(f"[ERROR] {reader.error}")
+    summary = metrics.summary()
+    print(f"[OK] Live run: {summary['frames_out']}/{summary['frames_in']} frames out, "
+          f"dropped {summary['dropped_rate']:.1%}, latency p50={summary['latency_ms']['p50']}ms "
+          f"p95={summary['latency_ms']['p95']}ms")
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Live video restoration")
+    parser.add_argument("--source", "-i", required=True,
+                       help="Device index, stream URL, file or named pipe")
+    parser.add_argument("--output", "-o", default=None,
+                       help="Optional output video path")
+    parser.add_argument("--latency", type=float, default=0.5,
+                       help="End-to-end latency budget in seconds (default: 0.5)")
+    parser.add_argument("--scale", "-s", type=int, default=2,
+                       help="Enhancement upscale factor (default: 2)")
+    parser.add_argument("--deblur-model", "-d", default=None,
+                       help="Path to NAFNet weights")
+    parser.add_argument("--enhance-model", "-e", default=None,
+                       help="Path to Real-ESRGAN weights")
+    parser.add_argument("--realtime", action="store_true",
+                       help="Play a local file back at its native FPS")
+    parser.add_argument("--follow", action="store_true",
+                       help="Keep reading a growing file or pipe (streamable containers such as "
+                            ".ts or MJPEG .avi; a growing .mp4 cannot be read)")
+    parser.add_argument("--duration", type=float, default=None,
+                       help="Stop after N seconds")
+
+    args = parser.parse_args()
+
+    summary = run_live(
+        source=args.source,
+        output_path=args.output,
+        latency_budget=args.latency,
+        enhance_scale=args.scale,
+        deblur_model_path=args.deblur_model,
+        enhance_model_path=args.enhance_model,
+        realtime=args.realtime,
+        follow=args.follow,
+        duration=args.duration
+    )
+    print(json.dumps(summary, indent=2))
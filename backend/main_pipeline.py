@@ -1,24 +1,115 @@
 import cv2
 import os
 import sys
-import json
+import math
+import time
+from contextlib import ExitStack, closing, nullcontext
 from pathlib import Path
 from tqdm import tqdm
 
 # Add parent directory to path for imports
 sys.path.append(str(Path(__file__).parent))
 
-from blur_detection.blur_test import blur_level
-from deblur.nafnet_infer import deblur_image
-from enhancement.realesrgan_infer import enhance_image
+from blur_detection.blur_test import assess_blur, calibrate_video, fixed_normalized_level, DEBLUR_PASSES
+from frame_manifest import manifest_path_for, ocr_summary, write_manifest
+from frame_store import FrameStore, FrameStoreWriter, frame_store_path_for
+from checkpoint import (
+    CHECKPOINT_FRAMES, CHECKPOINT_SECONDS, append_journal, checkpoint_path_for, job_signature, journal_path_for,
+    load_checkpoint, load_journal, remove_checkpoint, save_checkpoint
+)
+from text_index import build_text_index, save_text_index, text_index_path_for
+from thread_governor import get_thread_governor
+from scene_detection.scene_index import (
+    build_scene_index, save_scene_index, load_scene_index, scene_index_matches, scene_index_path_for, ShotLookup
+)
 try:
-    from ocr.ocr_engine import get_ocr_engine
+    # Importing the ocr package loads EasyOCR, so this also checks that it is installed
+    from ocr.ocr_worker import OCRWorker, ocr_results_dir_for
     OCR_AVAILABLE = True
 except ImportError:
     OCR_AVAILABLE = False
     print("[WARNING] OCR module not available. Install easyocr: pip install easyocr")
 
 
+# OCR cadence (every Nth processed frame) when there is no scene index
+OCR_INTERVAL = 6
+
+
+def is_ocr_frame(frame_id, shot_lookup, counts, ocr_interval=OCR_INTERVAL):
+    """
+    Decide online whether a processed frame gets OCR.
+    
+    Per shot: the shot's first processed frame, then every ocr_interval-th;
+    without a scene index, every ``ocr_interval``-th processed frame.
+    
+    Args:
+        frame_id: Frame id of the processed frame
+        shot_lookup: ShotLookup or None
+        counts: Dict of processed-frame counts per shot, updated in place
+        ocr_interval: Cadence when there is no scene index (default: OCR_INTERVAL)
+    """
+    shot = shot_lookup.shot_for(frame_id) if shot_lookup else None
+    key = shot["shot_id"] if shot else None
+    interval = shot["ocr_interval"] if shot else ocr_interval
+    seen = counts.get(key, 0)
+    counts[key] = seen + 1
+    return seen % interval == 0
+
+
+# Strides at least this long seek instead of grabbing every frame in between.
+# Seeking decodes from the previous keyframe, so it only pays off past a typical GOP.
+SEEK_MIN_STRIDE = 60
+
+
+def sample_frame_id(k, skip_frames=1, sample_fps=None, fps=0.0):
+    """Frame id of the k-th sampled frame (every Nth frame, or N frames per second)."""
+    if sample_fps and fps > 0:
+        return int(math.ceil(k * fps / sample_fps - 1e-6))
+    return k * skip_frames
+
+
+def iter_sampled_frames(cap, skip_frames=1, sample_fps=None, seek_min_stride=SEEK_MIN_STRIDE, start_frame=0):
+    """
+    Yield (frame_id, frame) for sampled frames only.
+    
+    Frames in between are skipped with grab() (demux without decode/convert),
+    and strides of at least ``seek_min_stride`` frames seek directly.
+    
+    Args:
+        cap: Opened cv2.VideoCapture
+        skip_frames: Process every Nth frame (default: 1)
+        sample_fps: Process N frames per second of video instead (optional)
+        seek_min_stride: Minimum gap to seek instead of grabbing (default: SEEK_MIN_STRIDE)
+        start_frame: Skip sampled frames before this frame id, e.g. when resuming (default: 0)
+    """
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    position = 0  # Index of the frame the next read() returns
+    k = 0
+    while sample_frame_id(k, skip_frames, sample_fps, fps) < start_frame:
+        k += 1
+    while True:
+        target = sample_frame_id(k, skip_frames, sample_fps, fps)
+        k += 1
+        if target < position:
+            continue
+        
+        if target - position >= seek_min_stride:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            # Some backends land on a keyframe instead; grab forward from there
+            landed = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+            position = landed if 0 <= landed <= target else position
+        while position < target:
+            if not cap.grab():
+                return
+            position += 1
+        
+        ret, frame = cap.read()
+        if not ret:
+            return
+        position += 1
+        yield target, frame
+
+
 def process_video(
     input_path="input_video/input.mp4",
     output_path="output_video/final.mp4",
@@ -26,7 +117,19 @@ def process_video(
     enhance_model_path=None,
     enhance_scale=2,
     skip_frames=1,
-    process_blurred_only=True
+    process_blurred_only=True,
+    deblur_variant=None,
+    enhance_tier=None,
+    enhance_mode="full",
+    use_scene_index=True,
+    scene_index_path=None,
+    calibrate_blur=False,
+    spatial_deblur=False,
+    sample_fps=None,
+    inference_client=None,
+    resume=False,
+    checkpoint_frames=CHECKPOINT_FRAMES,
+    frame_slot=None
 ):
     """
     Main video restoration pipeline.
@@ -42,17 +145,39 @@ def process_video(
         enhance_model_path: Path to Real-ESRGAN weights (optional, auto-detects if None)
         enhance_scale: Upscaling factor for enhancement (default: 2)
         skip_frames: Process every Nth frame (default: 1 = all frames)
+        sample_fps: Process N frames per second of video instead of every Nth frame (optional)
         process_blurred_only: Only deblur frames with medium/high blur (default: True)
+        deblur_variant: NAFNet variant name, or "auto" to pick by resolution tier (optional)
+        enhance_tier: "quality" (RRDBNet) or "fast" (compact SRVGG) enhancement (optional)
+        enhance_mode: "full" frame or "text" regions only with Lanczos elsewhere (default: "full")
+        use_scene_index: Decide blur level and OCR cadence once per shot from a
+                         scene-cut pre-pass instead of per frame (default: True)
+        scene_index_path: Where to store/reuse the scene index (default: next to output_path)
+        calibrate_blur: Derive resolution/noise-normalized blur thresholds for this
+                        video from a sampled frame subset (default: False)
+        spatial_deblur: Deblur only the tiles of each frame whose local blur is above
+                        threshold instead of whole frames (default: False)
+        inference_client: Run deblur/enhance on a shared batching inference server
+                          (InferenceClient) instead of in-process models (optional)
+        resume: Continue after the last checkpoint of an interrupted run with the
+                same input and parameters instead of starting over (default: False)
+        checkpoint_frames: Checkpoint at least every N processed frames (default: CHECKPOINT_FRAMES)
+        frame_slot: Callable returning a context manager entered around each frame's
+                    model work, e.g. a JobScheduler slot (optional)
+    
+    Returns:
+        dict: Run statistics (frame counts, deblurred pixel fraction, output size),
+              or None if the video could not be processed
     """
     
     # Auto-detect weights if not provided
-    if deblur_model_path is None:
+    if deblur_model_path is None and deblur_variant is None:
         default_deblur = Path(__file__).parent / "deblur" / "nafnet.pth"
         if default_deblur.exists():
             deblur_model_path = str(default_deblur)
             print(f"[OK] Auto-detected NAFNet weights: {deblur_model_path}")
     
-    if enhance_model_path is None:
+    if enhance_model_path is None and enhance_tier is None:
         default_enhance = Path(__file__).parent / "enhancement" / "RealESRGAN_x2.pth"
         if default_enhance.exists():
             enhance_model_path = str(default_enhance)
@@ -63,163 +188,399 @@ def process_video(
         print(f"Error: Input video not found at {input_path}")
         return
     
-    # Create output directories
-    os.makedirs("frames/original", exist_ok=True)
-    os.makedirs("frames/blurred", exist_ok=True)
-    os.makedirs("frames/deblurred", exist_ok=True)
-    os.makedirs("frames/enhanced", exist_ok=True)
-    os.makedirs("frames/ocr_results", exist_ok=True)
-    os.makedirs(os.path.dirname(output_path) if os.path.dirname(output_path) else ".", exist_ok=True)
-    
-    # Open video
-    cap = cv2.VideoCapture(input_path)
-    if not cap.isOpened():
-        print(f"Error: Could not open video {input_path}")
-        return
-    
-    # Get video properties
-    fps = int(cap.get(cv2.CAP_PROP_FPS))
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    
-    print(f"Video info: {width}x{height} @ {fps} FPS, {total_frames} frames")
-    
-    # Calculate output dimensions (after enhancement upscaling)
-    out_width = width * enhance_scale
-    out_height = height * enhance_scale
-    
-    # Initialize video writer
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(output_path, fourcc, fps, (out_width, out_height))
-    
-    if not out.isOpened():
-        print(f"Error: Could not create output video {output_path}")
-        cap.release()
-        return
+    # Resume state from an interrupted run with the same input and parameters
+    checkpoint_path = checkpoint_path_for(output_path)
+    signature = job_signature(input_path, {
+        "deblur_model_path": deblur_model_path, "enhance_model_path": enhance_model_path,
+        "enhance_scale": enhance_scale, "skip_frames": skip_frames, "sample_fps": sample_fps,
+        "process_blurred_only": process_blurred_only, "deblur_variant": deblur_variant,
+        "enhance_tier": enhance_tier, "enhance_mode": enhance_mode, "use_scene_index": use_scene_index,
+        "calibrate_blur": calibrate_blur, "spatial_deblur": spatial_deblur,
+    })
+    checkpoint = load_checkpoint(checkpoint_path, signature) if resume else None
+    journal_path = journal_path_for(checkpoint_path)
+    if checkpoint:
+        print(f"[OK] Resuming after frame {checkpoint['last_frame_id']} "
+              f"({checkpoint['processed_count']} frames already processed)")
     
-    frame_id = 0
-    processed_count = 0
-    deblurred_count = 0
-    processed_frame_ids = []  # Track processed frame IDs for OCR
+    # Models load torch, so they are imported only when frames are processed in-process
+    if inference_client is None:
+        from deblur.nafnet_infer import deblur_image, deblur_regions
+        from enhancement.realesrgan_infer import enhance_image
     
-    print("\nProcessing video frames...")
+    # Create output directories (stage images go to the job's frame store, not per-frame PNGs)
+    os.makedirs(os.path.dirname(output_path) if os.path.dirname(output_path) else ".", exist_ok=True)
     
-    # Process frames
-    with tqdm(total=total_frames, desc="Processing") as pbar:
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # Skip frames if needed
-            if frame_id % skip_frames != 0:
-                frame_id += 1
-                pbar.update(1)
-                continue
-            
-            # Save original frame (PNG for lossless quality)
-            cv2.imwrite(f"frames/original/{frame_id:06d}.png", frame)
-            processed_frame_ids.append(frame_id)  # Track this processed frame
-            
-            # Detect blur level
-            level = blur_level(frame)
-            
-            # Deblur if needed (with double-pass for high blur)
-            if level in ["medium", "high"]:
-                if process_blurred_only or not process_blurred_only:
-                    cv2.imwrite(f"frames/blurred/{frame_id:06d}.png", frame)
-                    
-                    # Single pass for medium blur
-                    if level == "medium":
-                        frame = deblur_image(frame, model_path=deblur_model_path)
-                        print(f"Frame {frame_id}: blur={level} → deblur (1 pass) + enhance")
-                    # Double pass for high blur (stronger deblurring)
-                    elif level == "high":
-                        frame = deblur_image(frame, model_path=deblur_model_path)
-                        frame = deblur_image(frame, model_path=deblur_model_path)  # Second pass
-                        print(f"Frame {frame_id}: blur={level} → deblur (2 passes) + enhance")
-                    
-                    cv2.imwrite(f"frames/deblurred/{frame_id:06d}.png", frame)
-                    deblurred_count += 1
-            else:
-                print(f"Frame {frame_id}: blur={level} → enhance only (no deblur needed)")
-            
-            # Enhance frame (always happens after deblur if needed)
-            frame = enhance_image(frame, model_path=enhance_model_path, scale=enhance_scale)
-            cv2.imwrite(f"frames/enhanced/{frame_id:06d}.png", frame)
-            
-            # Write to output video
-            out.write(frame)
-            
-            processed_count += 1
-            frame_id += 1
-            pbar.update(1)
-    
-    # Release resources
-    cap.release()
-    out.release()
-    
-    print(f"\n[OK] Video processing complete!")
-    print(f"   Processed: {processed_count} frames")
-    print(f"   Deblurred: {deblurred_count} frames")
-    print(f"   Output: {output_path}")
-    print(f"   Output size: {out_width}x{out_height}")
-    
-    # Step 4: OCR Processing (every 6th frame after all frames are processed)
-    if OCR_AVAILABLE:
-        print(f"\n🔍 Step 4: OCR Processing (every 6th frame)...")
-        ocr_engine = get_ocr_engine(gpu=True)
-        ocr_processed = 0
-        ocr_interval = 6
+    with ExitStack() as resources:
+        # Open video
+        cap = cv2.VideoCapture(input_path)
+        resources.callback(cap.release)
+        if not cap.isOpened():
+            print(f"Error: Could not open video {input_path}")
+            return
         
-        # Process every 6th frame from processed frames
-        ocr_frame_ids = processed_frame_ids[::ocr_interval]
+        # Get video properties
+        fps = int(cap.get(cv2.CAP_PROP_FPS))
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         
-        print(f"   Processing {len(ocr_frame_ids)} frames for OCR...")
+        print(f"Video info: {width}x{height} @ {fps} FPS, {total_frames} frames")
         
-        for ocr_frame_id in tqdm(ocr_frame_ids, desc="OCR Processing"):
-            original_path = Path(f"frames/original/{ocr_frame_id:06d}.png")
-            enhanced_path = Path(f"frames/enhanced/{ocr_frame_id:06d}.png")
-            
-            if not original_path.exists() or not enhanced_path.exists():
-                continue
-            
-            try:
-                # Compare OCR between original blur and enhanced images
-                comparison = ocr_engine.compare_images(
-                    blur_img_path_or_array=str(original_path),
-                    enhanced_img_path_or_array=str(enhanced_path),
-                    min_conf=0.3,
-                    min_length=2
-                )
-                
-                # Add frame info
-                comparison["frame_id"] = ocr_frame_id
-                comparison["frame_name"] = f"{ocr_frame_id:06d}.png"
-                
-                # Save JSON result
-                json_path = Path(f"frames/ocr_results/{ocr_frame_id:06d}.json")
-                with open(json_path, "w", encoding="utf-8") as f:
-                    json.dump(comparison, f, indent=2, ensure_ascii=False)
-                
-                # Print summary
+        # Per-video blur threshold calibration
+        blur_thresholds = checkpoint["blur_thresholds"] if checkpoint else None
+        if calibrate_blur and not checkpoint:
+            calibration = calibrate_video(input_path)
+            blur_thresholds = calibration["thresholds"]
+            print(f"[OK] Blur thresholds calibrated on {calibration['sampled_frames']} frames: "
+                  f"low>{blur_thresholds['low']:.1f}, high<={blur_thresholds['high']:.1f} (normalized"
+                  f"{', clamped to the fixed range' if blur_thresholds['clamped'] else ''})")
+        
+        # Scene-cut pre-pass: per-shot plan (blur level, deblur passes, OCR cadence)
+        shot_lookup = None
+        if use_scene_index:
+            if scene_index_path is None:
+                scene_index_path = scene_index_path_for(output_path)
+            index_stride = max(1, int(round(fps / sample_fps))) if sample_fps and fps else skip_frames
+            scene_index = load_scene_index(scene_index_path)
+            if not scene_index_matches(scene_index, input_path, blur_thresholds, index_stride, sample_fps):
+                print("Building scene index...")
+                scene_index = build_scene_index(input_path, stride=index_stride, thresholds=blur_thresholds,
+                                                sample_fps=sample_fps)
+                save_scene_index(scene_index, scene_index_path)
+            shot_lookup = ShotLookup(scene_index)
+            print(f"[OK] Scene index: {len(scene_index['shots'])} shots, "
+                  f"{len(scene_index['shards'])} shards ({scene_index_path})")
+        
+        # Calculate output dimensions (after enhancement upscaling)
+        out_width = width * enhance_scale
+        out_height = height * enhance_scale
+        
+        # Initialize video writer (at the sampled rate, so sparse runs keep real-time pacing)
+        source_fps = cap.get(cv2.CAP_PROP_FPS) or fps
+        out_fps = sample_fps if sample_fps else source_fps / max(skip_frames, 1)
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        out = cv2.VideoWriter(output_path, fourcc, max(out_fps, 1.0), (out_width, out_height))
+        resources.callback(out.release)
+        
+        if not out.isOpened():
+            print(f"Error: Could not create output video {output_path}")
+            return
+        
+        size_mismatch_warned = False
+        processed_count = 0
+        deblurred_count = 0
+        deblurred_pixel_sum = 0.0  # Sum of per-frame deblurred pixel fractions
+        deblur_passes_run = 0
+        deblur_passes_fixed = 0  # Passes the fixed thresholds would have run (calibrated runs only)
+        manifest = {}  # frame_id -> per-frame record
+        journal = []  # Manifest records and OCR results since the last checkpoint
+        frame_store_path = frame_store_path_for(output_path)
+        if checkpoint:
+            # Drop whatever was stored after the checkpoint; those frames are processed again
+            frame_store = FrameStoreWriter(frame_store_path, truncate_to=checkpoint["frame_store_size"])
+        else:
+            if frame_store_path.exists():
+                frame_store_path.unlink()
+            journal_path.unlink(missing_ok=True)
+            frame_store = FrameStoreWriter(frame_store_path)
+        resources.callback(frame_store.close)
+        
+        # OCR runs concurrently in its own process, fed frames as soon as they are enhanced
+        ocr_worker = None
+        ocr_counts = {}
+        ocr_processed = 0
+        ocr_texts = {}  # frame_id -> enhanced OCR lines, for the text index
+        ocr_pending = set()  # Submitted frame ids without a result yet
+        # CPU shares for this job's restoration and its OCR process (background share)
+        governor = get_thread_governor()
+        restore_lease = resources.enter_context(governor.register(f"restore:{output_path}", priority="batch"))
+        if checkpoint:
+            processed_count = checkpoint["processed_count"]
+            deblurred_count = checkpoint["deblurred_count"]
+            deblurred_pixel_sum = checkpoint["deblurred_pixel_sum"]
+            deblur_passes_run = checkpoint.get("deblur_passes_run", 0)
+            deblur_passes_fixed = checkpoint.get("deblur_passes_fixed", 0)
+            ocr_counts = {key: count for key, count in checkpoint["ocr_counts"]}
+            ocr_processed = checkpoint["ocr_processed"]
+            # Replay the journal up to this checkpoint (later entries are for frames processed again)
+            for entry in load_journal(journal_path, checkpoint["journal_size"]):
+                if "frame" in entry:
+                    manifest[entry["frame"]["frame_id"]] = entry["frame"]
+                else:
+                    manifest[entry["ocr"]]["ocr"] = entry["summary"]
+                    ocr_texts[entry["ocr"]] = entry["texts"]
+        if OCR_AVAILABLE:
+            ocr_results_dir = ocr_results_dir_for(output_path)
+            os.makedirs(ocr_results_dir, exist_ok=True)
+            ocr_worker = OCRWorker(ocr_results_dir, gpu=True, frame_bytes=out_width * out_height * 3)
+            # Stops the process and frees its shared-memory ring if the job fails before the drain
+            resources.callback(ocr_worker.terminate)
+            resources.enter_context(
+                governor.register(f"ocr:{output_path}", priority="background", on_change=ocr_worker.set_threads))
+            ocr_worker.start()
+            print("[OK] OCR worker started (runs alongside restoration)")
+        else:
+            print("[SKIP] OCR processing skipped (module not available)")
+        
+        def collect_ocr(results):
+            nonlocal ocr_processed
+            for ocr_frame_id, comparison, json_path, error in results:
+                ocr_pending.discard(ocr_frame_id)
+                if error:
+                    where = f" for frame {ocr_frame_id:06d}" if ocr_frame_id is not None else ""
+                    print(f"   [ERROR] OCR failed{where}: {error}")
+                    continue
+                manifest[ocr_frame_id]["ocr"] = ocr_summary(comparison, json_path)
+                ocr_texts[ocr_frame_id] = comparison["enhanced"]["texts_filtered"]
+                journal.append({"ocr": ocr_frame_id, "summary": manifest[ocr_frame_id]["ocr"],
+                                "texts": ocr_texts[ocr_frame_id]})
                 blur_conf = comparison["blur"]["avg_confidence_raw"]
                 enh_conf = comparison["enhanced"]["avg_confidence_raw"]
                 delta = comparison["improvement"]["confidence_delta_raw"]
-                
                 print(f"   Frame {ocr_frame_id:06d}: Blur={blur_conf:.3f} → Enhanced={enh_conf:.3f} (Δ{delta:+.3f})")
                 ocr_processed += 1
+        
+        def save_progress(last_frame_id):
+            # Only the journal entries since the previous checkpoint are written
+            journal_size = append_journal(journal_path, journal)
+            journal.clear()
+            save_checkpoint({
+                "signature": signature,
+                "last_frame_id": last_frame_id,
+                "frame_store_size": frame_store.flush(),
+                "journal_size": journal_size,
+                "blur_thresholds": blur_thresholds,
+                "processed_count": processed_count,
+                "deblurred_count": deblurred_count,
+                "deblurred_pixel_sum": deblurred_pixel_sum,
+                "deblur_passes_run": deblur_passes_run,
+                "deblur_passes_fixed": deblur_passes_fixed,
+                "ocr_counts": [[key, count] for key, count in ocr_counts.items()],
+                "ocr_processed": ocr_processed,
+                "ocr_pending": sorted(ocr_pending),
+            }, checkpoint_path)
+        
+        start_frame = 0
+        if checkpoint:
+            # Re-encode the committed output prefix from the stored enhanced frames
+            # (no model passes) and re-queue OCR that was still in flight
+            start_frame = checkpoint["last_frame_id"] + 1
+            frame_store.flush()
+            with closing(FrameStore(frame_store_path)) as store:
+                for committed_id in sorted(manifest):
+                    out.write(store.get(committed_id, "enhanced"))
+                if ocr_worker:
+                    for pending_id in checkpoint["ocr_pending"]:
+                        ocr_worker.submit(pending_id, store.get(pending_id, "original"),
+                                          store.get(pending_id, "enhanced"))
+                        ocr_pending.add(pending_id)
+            print(f"[OK] Restored {len(manifest)} output frames from {frame_store_path}"
+                  f" ({len(ocr_pending)} OCR frames re-queued)")
+        last_checkpoint = (processed_count, time.perf_counter())
+        last_frame_id = start_frame - 1
+        
+        print("\nProcessing video frames...")
+        
+        # Process frames
+        # The CPU leases are released by the resource stack, on success or failure
+        with tqdm(total=total_frames, initial=start_frame, desc="Processing") as pbar:
+            for frame_id, frame in iter_sampled_frames(cap, skip_frames, sample_fps, start_frame=start_frame):
+                pbar.update(frame_id + 1 - pbar.n)
+                
+                # Checkpoint at every shard boundary, so a resumed job restarts on a whole shot
+                if (shot_lookup and last_frame_id >= start_frame
+                        and shot_lookup.shard_for(frame_id) != shot_lookup.shard_for(last_frame_id)):
+                    save_progress(last_frame_id)
+                    last_checkpoint = (processed_count, time.perf_counter())
+                
+                timings = {}
+                stages = ["original"]
                 
-            except Exception as e:
-                print(f"   [ERROR] OCR failed for frame {ocr_frame_id:06d}: {e}")
-                continue
+                # Save original frame (lossless, in the frame store)
+                frame_store.put(frame_id, "original", frame)
+                original = frame
+                
+                # Model work runs in a scheduler slot when given, so other jobs can preempt between frames
+                t0 = time.perf_counter()
+                with (frame_slot() if frame_slot else nullcontext()):
+                    timings["wait_ms"] = round((time.perf_counter() - t0) * 1000.0, 2)
+                    # Follow the current CPU share (it changes as other jobs start and finish)
+                    restore_lease.apply()
+                    
+                    # Detect blur level (once per shot when the scene index is available)
+                    t0 = time.perf_counter()
+                    shot = shot_lookup.shot_for(frame_id) if shot_lookup else None
+                    if shot:
+                        score, level = shot["blur"]["score_median"], shot["blur"]["level"]
+                    else:
+                        score, level = assess_blur(frame, blur_thresholds)
+                    timings["blur_ms"] = round((time.perf_counter() - t0) * 1000.0, 2)
+                    passes = 0
+                    fraction = 0.0
+                    
+                    # Deblur if needed (with double-pass for high blur)
+                    t0 = time.perf_counter()
+                    if spatial_deblur:
+                        # Tile levels use the same (calibrated or fixed) thresholds; each blurred
+                        # strip gets the passes of its blurriest tile
+                        if inference_client:
+                            deblurred, fraction, passes = inference_client.deblur_regions(
+                                frame, variant=deblur_variant, model_path=deblur_model_path, thresholds=blur_thresholds)
+                        else:
+                            deblurred, fraction, passes = deblur_regions(
+                                frame, model_path=deblur_model_path, variant=deblur_variant, thresholds=blur_thresholds)
+                        if fraction > 0:
+                            frame = deblurred
+                            frame_store.put(frame_id, "deblurred", frame)
+                            stages.append("deblurred")
+                            deblurred_count += 1
+                            deblurred_pixel_sum += fraction
+                            print(f"Frame {frame_id}: deblur {fraction:.1%} of pixels (blurred tiles, up to "
+                                  f"{passes} pass{'es' if passes > 1 else ''}) + enhance")
+                        else:
+                            print(f"Frame {frame_id}: no blurred tiles → enhance only")
+                    elif level in ["medium", "high"]:
+                        if process_blurred_only or not process_blurred_only:
+                            # Single pass for medium blur, double pass for high blur (stronger deblurring)
+                            passes = DEBLUR_PASSES[level]
+                            if inference_client:
+                                frame = inference_client.deblur(frame, passes=passes, variant=deblur_variant,
+                                                                model_path=deblur_model_path)
+                            else:
+                                for _ in range(passes):
+                                    frame = deblur_image(frame, model_path=deblur_model_path, variant=deblur_variant)
+                            print(f"Frame {frame_id}: blur={level} → deblur ({passes} pass{'es' if passes > 1 else ''}) + enhance")
+                    
+                            frame_store.put(frame_id, "deblurred", frame)
+                            stages.append("deblurred")
+                            deblurred_count += 1
+                            deblurred_pixel_sum += 1.0
+                            fraction = 1.0
+                    else:
+                        print(f"Frame {frame_id}: blur={level} → enhance only (no deblur needed)")
+                    timings["deblur_ms"] = round((time.perf_counter() - t0) * 1000.0, 2)
+                    # Count passes against the fixed-threshold baseline as they happen, from the
+                    # same (shot or frame) normalized score the calibrated level came from
+                    deblur_passes_run += passes
+                    if blur_thresholds and score is not None:
+                        deblur_passes_fixed += DEBLUR_PASSES[fixed_normalized_level(score)]
+                    
+                    # Enhance frame (always happens after deblur if needed)
+                    t0 = time.perf_counter()
+                    if inference_client:
+                        frame = inference_client.enhance(frame, scale=enhance_scale, tier=enhance_tier, mode=enhance_mode,
+                                                         model_path=enhance_model_path)
+                    else:
+                        frame = enhance_image(frame, model_path=enhance_model_path, scale=enhance_scale, tier=enhance_tier,
+                                              mode=enhance_mode)
+                    
+                    # VideoWriter silently drops frames whose size differs from the one it was opened with
+                    if (frame.shape[1], frame.shape[0]) != (out_width, out_height):
+                        if not size_mismatch_warned:
+                            print(f"[WARNING] Enhanced frame is {frame.shape[1]}x{frame.shape[0]}, "
+                                  f"writer expects {out_width}x{out_height}; resizing")
+                            size_mismatch_warned = True
+                        frame = cv2.resize(frame, (out_width, out_height), interpolation=cv2.INTER_LANCZOS4)
+                    timings["enhance_ms"] = round((time.perf_counter() - t0) * 1000.0, 2)
+                
+                t0 = time.perf_counter()
+                frame_store.put(frame_id, "enhanced", frame)
+                stages.append("enhanced")
+                
+                # Write to output video
+                out.write(frame)
+                timings["write_ms"] = round((time.perf_counter() - t0) * 1000.0, 2)
+                
+                record = manifest[frame_id] = {
+                    "frame_id": frame_id,
+                    "blur_score": round(float(score), 2) if score is not None else None,
+                    "blur_level": level,
+                    "blur_source": "shot" if shot else "frame",
+                    "deblur_passes": passes,
+                    "deblurred_fraction": round(fraction, 4),
+                    "timings": timings,
+                    "stages": stages,
+                    "ocr": None,
+                }
+                journal.append({"frame": record})
+                
+                # Hand sampled frames to the OCR worker (original vs enhanced, in memory)
+                if ocr_worker and is_ocr_frame(frame_id, shot_lookup, ocr_counts):
+                    ocr_worker.submit(frame_id, original, frame)
+                    ocr_pending.add(frame_id)
+                    collect_ocr(ocr_worker.poll())
+                
+                processed_count += 1
+                last_frame_id = frame_id
+                
+                # Periodic checkpoint: everything up to this frame survives a restart
+                if (processed_count - last_checkpoint[0] >= checkpoint_frames
+                        or time.perf_counter() - last_checkpoint[1] >= CHECKPOINT_SECONDS):
+                    save_progress(frame_id)
+                    last_checkpoint = (processed_count, time.perf_counter())
+        
+        # Release resources
+        cap.release()
+        out.release()
+        frame_store.close()
+        
+        print("\n[OK] Video processing complete!")
+        print(f"   Processed: {processed_count} frames")
+        print(f"   Deblurred: {deblurred_count} frames")
+        print(f"   Output: {output_path}")
+        print(f"   Output size: {out_width}x{out_height}")
+        store_stats = frame_store.stats()
+        print(f"   Frame store: {frame_store_path} ({store_stats['records']} images, "
+              f"{store_stats['codec']} x{store_stats['ratio']})")
+        
+        deblurred_pixel_fraction = round(deblurred_pixel_sum / processed_count, 4) if processed_count else 0.0
+        print(f"   Deblurred pixels: {deblurred_pixel_fraction:.1%}")
+        stats = {
+            "processed_frames": processed_count,
+            "deblurred_frames": deblurred_count,
+            "deblurred_pixel_fraction": deblurred_pixel_fraction,
+            "deblur_passes": deblur_passes_run,
+            "output_path": output_path,
+            "output_size": [out_width, out_height],
+            "frame_store_path": str(frame_store_path),
+            "frame_store": store_stats,
+        }
+        if blur_thresholds:
+            stats["deblur_passes_fixed"] = deblur_passes_fixed
+            stats["deblur_passes_avoided"] = deblur_passes_fixed - deblur_passes_run
+            print(f"   Deblur passes: {deblur_passes_run} with calibrated thresholds, "
+                  f"{deblur_passes_fixed} with fixed ones (avoided {deblur_passes_fixed - deblur_passes_run})")
         
-        print(f"\n[OK] OCR processing complete!")
-        print(f"   OCR processed: {ocr_processed} frames")
-        print(f"   Results saved in: frames/ocr_results/")
-    else:
-        print(f"\n[SKIP] OCR processing skipped (module not available)")
+        # Step 4: wait for the OCR worker to finish the frames still queued
+        if ocr_worker:
+            print(f"\n🔍 Step 4: Finishing OCR ({len(ocr_pending)} frames pending)...")
+            # The drain gets whatever cores restoration no longer uses
+            with governor.register(f"ocr:{output_path}", priority="background", on_change=ocr_worker.set_threads):
+                collect_ocr(ocr_worker.close())
+            print("\n[OK] OCR processing complete!")
+            print(f"   OCR processed: {ocr_processed} frames")
+            print(f"   Results saved in: {ocr_results_dir}/")
+            
+            # Searchable index: OCR lines merged into tracks, token -> tracks
+            text_index = build_text_index(ocr_texts, source_fps)
+            text_index_path = text_index_path_for(output_path)
+            save_text_index(text_index, text_index_path)
+            stats["text_index_path"] = str(text_index_path)
+            print(f"[OK] Text index: {len(text_index['tracks'])} tracks, "
+                  f"{len(text_index['tokens'])} tokens ({text_index_path})")
+        
+        # Persist the per-frame manifest next to the output video
+        manifest_path = manifest_path_for(output_path)
+        write_manifest(manifest.values(), manifest_path)
+        stats["manifest_path"] = str(manifest_path)
+        stats["frames"] = [manifest[i] for i in sorted(manifest)]
+        print(f"[OK] Frame manifest: {manifest_path}")
+        
+        # The job is complete; a later resume starts a fresh run
+        remove_checkpoint(checkpoint_path)
+        
+        return stats
 
 
 if __name__ == "__main__":
@@ -232,17 +593,40 @@ if __name__ == "__main__":
                        help="Output video path")
     parser.add_argument("--deblur-model", "-d", default=None,
                        help="Path to NAFNet weights")
+    parser.add_argument("--deblur-variant", default=None,
+                       help="NAFNet variant name, or 'auto' to pick by resolution")
     parser.add_argument("--enhance-model", "-e", default=None,
                        help="Path to Real-ESRGAN weights")
+    parser.add_argument("--enhance-tier", choices=["quality", "fast"], default=None,
+                       help="Enhancement tier: quality (RRDBNet) or fast (compact SRVGG)")
+    parser.add_argument("--enhance-mode", choices=["full", "text"], default="full",
+                       help="Run Real-ESRGAN on the full frame or only on detected text regions")
     parser.add_argument("--scale", "-s", type=int, default=2,
                        help="Enhancement upscale factor (default: 2)")
     parser.add_argument("--skip", type=int, default=1,
                        help="Process every Nth frame (default: 1)")
+    parser.add_argument("--no-scene-index", action="store_true",
+                       help="Decide blur level per frame instead of per shot")
+    parser.add_argument("--calibrate-blur", action="store_true",
+                       help="Calibrate blur thresholds per video instead of fixed ones")
+    parser.add_argument("--spatial-deblur", action="store_true",
+                       help="Deblur only blurred tiles of each frame")
+    parser.add_argument("--sample-fps", type=float, default=None,
+                       help="Process N frames per second of video instead of every Nth frame")
     parser.add_argument("--all-frames", action="store_true",
                        help="Deblur all frames, not just blurred ones")
+    parser.add_argument("--inference-server", default=None,
+                       help="host:port of a running inference_server.py to batch model calls through")
+    parser.add_argument("--resume", action="store_true",
+                       help="Continue an interrupted run from its last checkpoint")
     
     args = parser.parse_args()
     
+    inference_client = None
+    if args.inference_server:
+        from inference_server import InferenceClient, parse_address
+        inference_client = InferenceClient(parse_address(args.inference_server))
+    
     process_video(
         input_path=args.input,
         output_path=args.output,
@@ -250,5 +634,14 @@ if __name__ == "__main__":
         enhance_model_path=args.enhance_model,
         enhance_scale=args.scale,
         skip_frames=args.skip,
-        process_blurred_only=not args.all_frames
+        process_blurred_only=not args.all_frames,
+        deblur_variant=args.deblur_variant,
+        enhance_tier=args.enhance_tier,
+        enhance_mode=args.enhance_mode,
+        use_scene_index=not args.no_scene_index,
+        calibrate_blur=args.calibrate_blur,
+        spatial_deblur=args.spatial_deblur,
+        sample_fps=args.sample_fps,
+        inference_client=inference_client,
+        resume=args.resume
     )
@@ -0,0 +1,199 @@
+"""
+OCR worker process that runs concurrently with restoration.
+
+The pipeline hands each sampled frame (original + enhanced, in memory) to the
+worker as soon as it is enhanced. The worker owns its own OCREngine, writes
+the same per-frame JSON as the trailing OCR pass did, and reports a result
+back so the caller can update its manifest. When the caller gives a frame
+size, frames travel through a shared-memory FrameRing and only handles are
+queued.
+"""
+import json
+import multiprocessing as mp
+import os
+import queue
+from pathlib import Path
+
+from frame_ring import FrameRing, RingTimeout
+
+
+# Frames waiting for OCR; restoration blocks when the worker falls this far behind
+OCR_QUEUE_SIZE = 8
+# OS niceness of the worker: OCR is background work and yields CPU to restoration and interactive requests
+OCR_NICENESS = 10
+
+
+def ocr_results_dir_for(output_path):
+    """Per-frame OCR JSON location for a job, next to its output video."""
+    output_path = Path(output_path)
+    return output_path.with_name(output_path.stem + ".ocr")
+
+
+def _apply_threads(threads, applied):
+    """Follow the thread count the parent's governor assigned (0 = unmanaged); returns the applied count."""
+    count = threads.value if threads is not None else 0
+    if count and count != applied:
+        import cv2
+        from thread_governor import apply_thread_limit
+
+        apply_thread_limit(count)
+        cv2.setNumThreads(count)
+    return count or applied
+
+
+def _ocr_worker_main(tasks, results, results_dir, languages, gpu, min_conf, min_length, ring=None, threads=None):
+    """Worker loop: (frame_id, blur_img, enhanced_img) in, (frame_id, comparison, json_path, error) out."""
+    # OpenMP/MKL read these once, when torch is first imported
+    if threads is not None and threads.value:
+        for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+            os.environ[var] = str(threads.value)
+    from ocr.ocr_engine import OCREngine
+
+    if hasattr(os, "nice"):
+        try:
+            os.nice(OCR_NICENESS)
+        except OSError:
+            pass
+
+    try:
+        engine = OCREngine(languages=languages, gpu=gpu)
+    except Exception as e:
+        results.put((None, None, None, f"OCR engine failed to initialize: {e}"))
+        return
+
+    applied = 0
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        applied = _apply_threads(threads, applied)
+        frame_id, blur_img, enhanced_img = task
+        handles = (blur_img, enhanced_img) if ring is not None else ()
+        try:
+            if handles:
+                blur_img, enhanced_img = ring.view(blur_img), ring.view(enhanced_img)
+            comparison = engine.compare_images(
+                blur_img_path_or_array=blur_img,
+                enhanced_img_path_or_array=enhanced_img,
+                min_conf=min_conf,
+                min_length=min_length
+            )
+            del blur_img, enhanced_img
+            for handle in handles:
+                ring.release(handle)
+            handles = ()
+            comparison["frame_id"] = frame_id
+            comparison["frame_name"] = f"{frame_id:06d}.png"
+
+            json_path = Path(results_dir) / f"{frame_id:06d}.json"
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(comparison, f, indent=2, ensure_ascii=False)
+            results.put((frame_id, comparison, str(json_path), None))
+        except Exception as e:
+            results.put((frame_id, None, None, str(e)))
+        finally:
+            for handle in handles:
+                ring.release(handle)
+
+    if ring is not None:
+        ring.close()
+
+
+class OCRWorker:
+    """
+    Concurrent OCR consumer in a separate process.
+
+    Usage:
+        worker = OCRWorker(ocr_results_dir_for(output_path))
+        worker.start()
+        worker.submit(frame_id, original, enhanced)
+        for frame_id, comparison, json_path, error in worker.poll(): ...
+        for ... in worker.close(): ...   # drains the remaining results
+    """
+
+    def __init__(self, results_dir, languages=["en"], gpu=True, min_conf=0.3, min_length=2,
+                 queue_size=OCR_QUEUE_SIZE, frame_bytes=None):
+        # spawn: the child must not inherit the parent's CUDA / torch thread state
+        ctx = mp.get_context("spawn")
+        self.tasks = ctx.Queue(maxsize=queue_size)
+        self.results = ctx.Queue()
+        self.submitted = 0
+        self.received = 0
+        # Two slots (original + enhanced) per queued frame; a full ring back-pressures submit()
+        self.ring = FrameRing.create(slots=2 * queue_size, slot_bytes=frame_bytes, ctx=ctx) if frame_bytes else None
+        # CPU threads for the worker, set by the parent (see set_threads); 0 leaves the defaults
+        self.threads = ctx.Value("i", 0, lock=False)
+        self.process = ctx.Process(
+            target=_ocr_worker_main,
+            args=(self.tasks, self.results, str(results_dir), languages, gpu, min_conf, min_length, self.ring,
+                  self.threads),
+            daemon=True
+        )
+
+    def start(self):
+        self.process.start()
+        return self
+
+    def set_threads(self, count):
+        """Limit the worker's CPU threads; applied before its next frame."""
+        self.threads.value = count
+
+    def submit(self, frame_id, blur_img, enhanced_img):
+        """Queue a frame for OCR (blocks while the worker's queue is full)."""
+        handles = []
+        while self.process.is_alive():
+            try:
+                if self.ring is not None:
+                    # Copy into shared memory once; only handles are pickled
+                    while len(handles) < 2:
+                        handles.append(self.ring.put((blur_img, enhanced_img)[len(handles)], timeout=1.0))
+                    self.tasks.put((frame_id, handles[0], handles[1]), timeout=1.0)
+                else:
+                    self.tasks.put((frame_id, blur_img, enhanced_img), timeout=1.0)
+            except (queue.Full, RingTimeout):
+                continue
+            self.submitted += 1
+            return True
+        for handle in handles:
+            self.ring.release(handle)
+        return False
+
+    def poll(self):
+        """Yield results that are ready, without waiting."""
+        while True:
+            try:
+                result = self.results.get_nowait()
+            except queue.Empty:
+                return
+            if result[0] is not None:
+                self.received += 1
+            yield result
+
+    def close(self, timeout=None):
+        """Signal end of input and yield the remaining results as they arrive."""
+        if self.process.is_alive():
+            self.tasks.put(None)
+        while self.received < self.submitted:
+            try:
+                result = self.results.get(timeout=1.0)
+            except queue.Empty:
+                if not self.process.is_alive():
+                    break
+                continue
+            if result[0] is not None:
+                self.received += 1
+            yield result
+        self.process.join(timeout)
+        self._close_ring()
+
+    def terminate(self):
+        """Stop the worker without draining it (e.g. when the job fails) and free its frame ring."""
+        if self.process.pid is not None:
+            self.process.terminate()
+            self.process.join()
+        self._close_ring()
+
+    def _close_ring(self):
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
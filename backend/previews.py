@@ -0,0 +1,107 @@
+"""
+Preview pyramid for result images.
+
+Full-resolution PNGs (upscaled 2-4x) are megabytes each. Previews are
+downscaled copies in a fast lossy format (WebP when OpenCV can write it,
+JPEG otherwise), cached on disk next to the source image under previews/.
+The default size is generated when results are produced; other sizes are
+generated on first request.
+"""
+import os
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+# Named preview sizes: longest side in pixels
+PREVIEW_SIZES = {"thumb": 320, "medium": 960, "large": 1920}
+# Size generated eagerly and inlined in API responses
+DEFAULT_PREVIEW_SIZE = "medium"
+PREVIEW_QUALITY = 80
+
+_FORMATS = {
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY, "image/webp"),
+    "jpeg": (".jpg", cv2.IMWRITE_JPEG_QUALITY, "image/jpeg"),
+}
+_default_format = None
+
+
+def default_preview_format():
+    """WebP if this OpenCV build can encode it, else JPEG."""
+    global _default_format
+    if _default_format is None:
+        try:
+            ok = cv2.imencode(".webp", np.zeros((8, 8, 3), dtype=np.uint8))[0]
+        except cv2.error:
+            ok = False
+        _default_format = "webp" if ok else "jpeg"
+    return _default_format
+
+
+def preview_mimetype(fmt):
+    return _FORMATS[fmt][2]
+
+
+def preview_path_for(source_path, size, fmt):
+    """Cached preview location: <dir>/previews/<stem>.<size><ext>."""
+    source_path = Path(source_path)
+    return source_path.parent / "previews" / f"{source_path.stem}.{size}{_FORMATS[fmt][0]}"
+
+
+def encode_preview(img, size=DEFAULT_PREVIEW_SIZE, fmt=None, quality=PREVIEW_QUALITY):
+    """
+    Downscale an image to a named preview size and encode it.
+
+    Args:
+        img: Image (BGR format)
+        size: Key of PREVIEW_SIZES (default: DEFAULT_PREVIEW_SIZE)
+        fmt: "webp" or "jpeg" (default: best available)
+        quality: Encoder quality 0-100 (default: PREVIEW_QUALITY)
+
+    Returns:
+        bytes: Encoded preview
+    """
+    fmt = fmt or default_preview_format()
+    ext, quality_flag, _ = _FORMATS[fmt]
+    h, w = img.shape[:2]
+    ratio = PREVIEW_SIZES[size] / max(h, w)
+    if ratio < 1.0:
+        img = cv2.resize(img, (max(1, int(w * ratio)), max(1, int(h * ratio))), interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode(ext, img, [quality_flag, quality])
+    if not ok:
+        raise ValueError(f"Could not encode {fmt} preview")
+    return buf.tobytes()
+
+
+def get_preview(source_path, size=DEFAULT_PREVIEW_SIZE, fmt=None, img=None):
+    """
+    Path of a cached preview, generating it on first use.
+
+    Args:
+        source_path: Full-resolution image
+        size: Key of PREVIEW_SIZES (default: DEFAULT_PREVIEW_SIZE)
+        fmt: "webp" or "jpeg" (default: best available)
+        img: Already-decoded source image, to skip reading it (optional)
+
+    Returns:
+        Path to the preview, or None if the source is missing
+    """
+    if not Path(source_path).exists():
+        return None
+    fmt = fmt or default_preview_format()
+    path = preview_path_for(source_path, size, fmt)
+    if path.exists() and path.stat().st_mtime >= Path(source_path).stat().st_mtime:
+        return path
+
+    if img is None:
+        img = cv2.imread(str(source_path))
+        if img is None:
+            return None
+    data = encode_preview(img, size, fmt)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return path
@@ -0,0 +1,249 @@
+"""
+Scene-cut index and per-shot processing plan for videos.
+
+A cheap pre-pass over downsampled luma finds shot boundaries. Each shot then
+gets its blur statistics measured on a few representative frames, so deblur
+passes, OCR cadence and shard boundaries are decided once per shot instead of
+once per frame. Shards group whole shots into contiguous frame ranges;
+process_video checkpoints at every shard boundary, so a resumed job restarts
+on a shot boundary.
+"""
+import bisect
+import json
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from blur_detection.blur_test import assess_blur, DEBLUR_PASSES
+
+
+# Downsampled width used for cut detection
+INDEX_WIDTH = 64
+HIST_BINS = 32
+# Histogram total-variation distance above which two frames are in different shots
+CUT_THRESHOLD = 0.35
+# Shorter shots are merged into the previous one (flashes, fades)
+MIN_SHOT_FRAMES = 5
+# Frames per shot measured at full resolution for blur statistics
+BLUR_SAMPLES_PER_SHOT = 3
+# Blurry shots give less reliable OCR per frame, so they are sampled more often
+OCR_INTERVALS = {"low": 6, "medium": 3, "high": 3}
+# Target shard length in frames; shards always hold whole shots
+MAX_SHARD_FRAMES = 1500
+
+
+def _luma_signature(frame):
+    """Downsampled luma and its normalized histogram."""
+    h, w = frame.shape[:2]
+    small = cv2.resize(frame, (INDEX_WIDTH, max(1, int(h * INDEX_WIDTH / w))), interpolation=cv2.INTER_AREA)
+    luma = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    hist = cv2.calcHist([luma], [0], None, [HIST_BINS], [0, 256]).ravel()
+    return luma, hist / max(hist.sum(), 1.0)
+
+
+def _shot_blur_stats(cap, start, end, thresholds=None):
+    """Measure blur (normalized scores) on up to BLUR_SAMPLES_PER_SHOT evenly spaced frames of a shot."""
+    count = min(BLUR_SAMPLES_PER_SHOT, end - start + 1)
+    frame_ids = sorted({int(round(x)) for x in np.linspace(start, end, count)})
+    scores, levels = [], []
+    for frame_id in frame_ids:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_id)
+        ret, frame = cap.read()
+        if not ret:
+            continue
+        score, level = assess_blur(frame, thresholds)
+        scores.append(float(score))
+        levels.append(level)
+
+    if not levels:
+        return {"score_median": None, "level": "low", "sampled_frames": []}
+    # Majority vote, ties resolved toward the blurrier level
+    level = max(("high", "medium", "low"), key=lambda lv: levels.count(lv))
+    return {
+        "score_median": round(float(np.median(scores)), 2),
+        "level": level,
+        "sampled_frames": frame_ids,
+    }
+
+
+def plan_shards(shots, max_shard_frames=MAX_SHARD_FRAMES):
+    """
+    Group whole shots into contiguous shards of about ``max_shard_frames``.
+
+    A shot is never split; one longer than the target is a shard of its own.
+
+    Returns:
+        list of [start, end] frame ranges (inclusive), in order
+    """
+    shards = []
+    for shot in shots:
+        if shards and shot["end"] - shards[-1][0] < max_shard_frames:
+            shards[-1][1] = shot["end"]
+        else:
+            shards.append([shot["start"], shot["end"]])
+    return shards
+
+
+def build_scene_index(video_path, stride=1, cut_threshold=CUT_THRESHOLD, thresholds=None, sample_fps=None,
+                      max_shard_frames=MAX_SHARD_FRAMES):
+    """
+    Build the scene-cut index and per-shot plan for a video.
+
+    Args:
+        video_path: Path to input video
+        stride: Compare every Nth frame; skipped frames are grabbed, not decoded (default: 1)
+        cut_threshold: Histogram distance that marks a cut (default: CUT_THRESHOLD)
+        thresholds: Calibrated blur thresholds for shot levels (optional, fixed if None)
+        sample_fps: Sampling rate the stride was derived from, recorded for reuse checks (optional)
+        max_shard_frames: Target shard length (default: MAX_SHARD_FRAMES)
+
+    Returns:
+        dict with video metadata, the sampling it was built with, "shots" and "shards"
+    """
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video {video_path}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    cuts = [0]
+    prev_luma, prev_hist = None, None
+    frame_id = 0
+    while True:
+        if frame_id % stride != 0:
+            if not cap.grab():
+                break
+            frame_id += 1
+            continue
+        ret, frame = cap.read()
+        if not ret:
+            break
+        luma, hist = _luma_signature(frame)
+        if prev_hist is not None:
+            hist_dist = 0.5 * float(np.abs(hist - prev_hist).sum())
+            luma_dist = float(np.abs(luma.astype(np.int16) - prev_luma).mean()) / 255.0
+            if max(hist_dist, 2.0 * luma_dist) > cut_threshold and frame_id - cuts[-1] >= MIN_SHOT_FRAMES:
+                cuts.append(frame_id)
+        prev_luma, prev_hist = luma.astype(np.int16), hist
+        frame_id += 1
+    total_frames = frame_id
+
+    shots = []
+    bounds = cuts + [total_frames]
+    for shot_id, (start, next_start) in enumerate(zip(bounds[:-1], bounds[1:])):
+        end = next_start - 1
+        if end < start:
+            continue
+        blur = _shot_blur_stats(cap, start, end, thresholds)
+        shots.append({
+            "shot_id": shot_id,
+            "start": start,
+            "end": end,
+            "blur": blur,
+            "deblur_passes": DEBLUR_PASSES[blur["level"]],
+            "ocr_interval": OCR_INTERVALS[blur["level"]],
+        })
+    cap.release()
+
+    return {
+        "video": str(video_path),
+        "fps": fps,
+        "width": width,
+        "height": height,
+        "total_frames": total_frames,
+        "blur_thresholds": thresholds,
+        "stride": stride,
+        "sample_fps": sample_fps,
+        "shots": shots,
+        "shards": plan_shards(shots, max_shard_frames),
+    }
+
+
+def save_scene_index(index, path):
+    """Write a scene index as JSON."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+
+
+def load_scene_index(path):
+    """Load a scene index written by save_scene_index, or None if missing."""
+    if not path or not Path(path).exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def scene_index_matches(index, video_path, thresholds, stride, sample_fps):
+    """True if a cached index was built for this video with the same thresholds and sampling."""
+    return (
+        index is not None
+        and index.get("video") == str(video_path)
+        and index.get("blur_thresholds") == thresholds
+        and index.get("stride") == stride
+        and index.get("sample_fps") == sample_fps
+        and "shards" in index
+    )
+
+
+def scene_index_path_for(output_path):
+    """Scene index location for a job, next to its output video."""
+    output_path = Path(output_path)
+    return output_path.with_name(output_path.stem + ".scenes.json")
+
+
+class ShotLookup:
+    """O(log n) frame id -> shot lookup over an index's shots."""
+
+    def __init__(self, index):
+        self.shots = index["shots"]
+        self.starts = [shot["start"] for shot in self.shots]
+        self.shard_starts = [start for start, _ in index.get("shards", [])]
+
+    def shot_for(self, frame_id):
+        pos = bisect.bisect_right(self.starts, frame_id) - 1
+        return self.shots[max(pos, 0)] if self.shots else None
+
+    def shard_for(self, frame_id):
+        """Index of the shard holding ``frame_id`` (0 without shards)."""
+        return max(bisect.bisect_right(self.shard_starts, frame_id) - 1, 0)
+
+
+def select_sample_frames(index, frame_ids, count=10):
+    """
+    Pick representative frames: the middle available frame of each shot.
+
+    When there are more shots than ``count``, shots are chosen evenly; when
+    there are fewer, the remainder is filled with evenly spaced frames.
+
+    Args:
+        index: Scene index from build_scene_index
+        frame_ids: Frame ids that actually have artifacts
+        count: Number of samples (default: 10)
+
+    Returns:
+        Sorted list of frame ids
+    """
+    frame_ids = sorted(frame_ids)
+    if not frame_ids:
+        return []
+
+    picks = []
+    for shot in index["shots"]:
+        lo = bisect.bisect_left(frame_ids, shot["start"])
+        hi = bisect.bisect_right(frame_ids, shot["end"])
+        if hi > lo:
+            picks.append(frame_ids[(lo + hi - 1) // 2])
+
+    if len(picks) > count:
+        picks = [picks[int(i)] for i in np.linspace(0, len(picks) - 1, count)]
+    else:
+        step = max(1, len(frame_ids) // count)
+        for frame_id in frame_ids[::step]:
+            if len(picks) >= count:
+                break
+            if frame_id not in picks:
+                picks.append(frame_id)
+    return sorted(set(picks))
@@ -0,0 +1,177 @@
+"""
+Small dependency-graph executor for per-request processing stages.
+
+Stages are declared with the stages they depend on and run on a shared
+thread pool as soon as those have finished, so independent stages (e.g. OCR
+on the original frame vs deblur/enhance) overlap and latency becomes the
+critical path instead of the sum of all stages. Background stages keep
+running after run() returns, for work that must not block the response.
+
+    graph = StageGraph()
+    graph.add("load", lambda r: cv2.imread(path))
+    graph.add("blur", lambda r: blur_score(r["load"]), deps=["load"])
+    graph.add("ocr", lambda r: run_ocr(r["load"]), deps=["load"])
+    results, timings = graph.run()
+"""
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from thread_governor import apply_thread_limit
+
+
+# Threads shared by all graphs (stages of concurrent requests included)
+STAGE_WORKERS = int(os.environ.get("STAGE_WORKERS", "4"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=STAGE_WORKERS, thread_name_prefix="stage")
+        return _pool
+
+
+def _ms(seconds):
+    return round(seconds * 1000.0, 2)
+
+
+class StageGraph:
+    """A DAG of named stages; each stage receives the results of the stages before it."""
+
+    def __init__(self):
+        self.nodes = {}  # name -> (fn, deps, background)
+
+    def add(self, name, fn, deps=(), background=False):
+        """
+        Add a stage.
+
+        Args:
+            name: Stage name (key of its result)
+            fn: Callable taking the results dict; its dependencies' results are present
+            deps: Names of stages that must finish first (already added)
+            background: Do not wait for this stage in run() (default: False)
+        """
+        for dep in deps:
+            if dep not in self.nodes:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+            if self.nodes[dep][2] and not background:
+                raise ValueError(f"Stage '{name}' cannot wait for background stage '{dep}'")
+        self.nodes[name] = (fn, tuple(deps), background)
+        return self
+
+    def max_parallel(self):
+        """
+        Stages that can run at the same time, estimated as the widest dependency
+        level (stages with equally long dependency chains), capped by the pool size.
+        """
+        depth = {}
+        for name, (_, deps, _) in self.nodes.items():  # Dependencies are always added first
+            depth[name] = 1 + max((depth[dep] for dep in deps), default=-1)
+        return min(STAGE_WORKERS, max(Counter(depth.values()).values(), default=1))
+
+    def run(self, thread_limit=None):
+        """
+        Run every stage as soon as its dependencies are done.
+
+        Args:
+            thread_limit: torch/OpenMP intra-op threads for the whole graph (optional); split
+                between the stages that can run at the same time (see max_parallel) and
+                applied once here, since the setting is process-wide
+
+        Returns:
+            tuple: (results by stage, timings) once all foreground stages have finished
+
+        Raises:
+            The exception of the first failed foreground stage (its dependents are skipped)
+        """
+        lock = threading.Lock()
+        done = threading.Event()
+        results, spans, errors = {}, {}, {}
+        waiting = {name: len(deps) for name, (_, deps, _) in self.nodes.items()}
+        dependents = {name: [] for name in self.nodes}
+        for name, (_, deps, _) in self.nodes.items():
+            for dep in deps:
+                dependents[dep].append(name)
+        foreground = sum(1 for _, _, background in self.nodes.values() if not background)
+        state = {"foreground": foreground}
+        pool = _get_pool()
+        started = time.perf_counter()
+
+        def settle(name):
+            """Mark a stage finished or skipped (call with the lock held); returns stages now ready."""
+            if not self.nodes[name][2]:
+                state["foreground"] -= 1
+                if state["foreground"] == 0 or name in errors:
+                    done.set()
+            ready = []
+            for dependent in dependents[name]:
+                if name in errors or dependent in errors:
+                    if dependent not in errors:
+                        errors[dependent] = None  # Skipped
+                        ready += settle(dependent)
+                    continue
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    ready.append(dependent)
+            return ready
+
+        def execute(name):
+            t0 = time.perf_counter()
+            try:
+                value, error = self.nodes[name][0](results), None
+            except Exception as e:
+                value, error = None, e
+            t1 = time.perf_counter()
+            with lock:
+                spans[name] = (t0 - started, t1 - started)
+                if error is None:
+                    results[name] = value
+                else:
+                    errors[name] = error
+                    if self.nodes[name][2]:
+                        print(f"[WARNING] Background stage '{name}' failed: {error}")
+                ready = settle(name)
+            for dependent in ready:
+                pool.submit(execute, dependent)
+
+        if thread_limit:
+            apply_thread_limit(max(1, thread_limit // self.max_parallel()))
+        roots = [name for name, count in waiting.items() if count == 0]
+        if foreground == 0:
+            done.set()
+        for name in roots:
+            pool.submit(execute, name)
+        done.wait()
+
+        with lock:
+            for name, (_, _, background) in self.nodes.items():
+                if not background and errors.get(name) is not None:
+                    raise errors[name]
+            return dict(results), self._timings(spans, time.perf_counter() - started)
+
+    def _timings(self, spans, total):
+        """Per-stage spans plus the critical path (each stage's last-finishing dependency, walked back)."""
+        stages = {
+            name: {"start_ms": _ms(start), "end_ms": _ms(end), "duration_ms": _ms(end - start),
+                   "deps": list(self.nodes[name][1])}
+            for name, (start, end) in sorted(spans.items(), key=lambda item: item[1][0])
+        }
+        finished = [name for name in spans if not self.nodes[name][2]]
+        path = []
+        name = max(finished, key=lambda n: spans[n][1]) if finished else None
+        while name is not None:
+            path.append(name)
+            deps = [dep for dep in self.nodes[name][1] if dep in spans]
+            name = max(deps, key=lambda d: spans[d][1]) if deps else None
+        return {
+            "total_ms": _ms(total),
+            "sequential_ms": _ms(sum(end - start for start, end in spans.values())),
+            "critical_path": path[::-1],
+            "stages": stages,
+        }
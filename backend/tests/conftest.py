@@ -0,0 +1,5 @@
+"""Shared test setup: make the backend modules importable as in app.py."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,107 @@
+"""Memory-budget tiling of Real-ESRGAN enhancement on a 4K frame."""
+import json
+import subprocess
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from enhancement.realesrgan_infer import RealESRGANEnhancer
+
+
+BUDGET_MB = 512
+BACKEND = Path(__file__).resolve().parent.parent
+
+# Runs in a fresh process so ru_maxrss is the peak of this one enhancement call.
+# The network mirrors SRVGGNetCompact (realesr-general-x4v3's architecture) at x2,
+# with real convolutions, so the peak is whatever torch actually allocates.
+PEAK_RSS_SCRIPT = """
+import json, resource, sys
+import numpy as np
+import torch
+from torch import nn
+from types import SimpleNamespace
+sys.path.insert(0, sys.argv[1])
+from enhancement.realesrgan_infer import RealESRGANEnhancer
+
+class CompactNet(nn.Module):
+    def __init__(self, num_feat=64, num_conv=1, scale=2):
+        super().__init__()
+        layers = [nn.Conv2d(3, num_feat, 3, 1, 1), nn.PReLU(num_parameters=num_feat)]
+        for _ in range(num_conv):
+            layers += [nn.Conv2d(num_feat, num_feat, 3, 1, 1), nn.PReLU(num_parameters=num_feat)]
+        layers.append(nn.Conv2d(num_feat, 3 * scale * scale, 3, 1, 1))
+        self.body = nn.ModuleList(layers)
+        self.upsampler = nn.PixelShuffle(scale)
+        self.scale = scale
+
+    def forward(self, x):
+        out = x
+        for layer in self.body:
+            out = layer(out)
+        base = nn.functional.interpolate(x, scale_factor=self.scale, mode="nearest")
+        return self.upsampler(out) + base
+
+budget_mb = int(sys.argv[2])
+enhancer = RealESRGANEnhancer(model_path="missing.pth", scale=2, device=torch.device("cpu"),
+                              memory_budget_mb=budget_mb, tile_workers=4)
+enhancer.upsampler = SimpleNamespace(model=CompactNet().eval(), half=False)
+enhancer.arch = "SRVGGNetCompact"
+enhancer.net_scale = 2
+
+frame = np.random.default_rng(0).integers(0, 256, size=(2160, 3840, 3), dtype=np.uint8)
+enhancer._enhance_tiled(frame[:64, :64].copy(), 32)  # Warm up kernels and tile threads
+baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+enhanced = enhancer.enhance_image(frame)
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"tile": enhancer.choose_tile_size(2160, 3840), "shape": list(enhanced.shape),
+                  "frame_bytes": frame.nbytes, "peak_kb": peak - baseline}))
+"""
+
+
+class ShapeCheckedNet(torch.nn.Module):
+    """
+    Stand-in for x2 RRDBNet: pixel-unshuffles its input like the real network
+    (so odd sizes fail) and upscales x2 by nearest neighbour.
+    """
+
+    def forward(self, x):
+        x = torch.nn.functional.pixel_shuffle(torch.nn.functional.pixel_unshuffle(x, 2), 2)
+        return torch.nn.functional.interpolate(x, scale_factor=2, mode="nearest")
+
+
+def make_enhancer(budget_mb=BUDGET_MB, tile_workers=4):
+    enhancer = RealESRGANEnhancer(model_path="missing.pth", scale=2, device=torch.device("cpu"),
+                                  memory_budget_mb=budget_mb, tile_workers=tile_workers)
+    enhancer.upsampler = SimpleNamespace(model=ShapeCheckedNet(), half=False)
+    enhancer.arch = "RRDBNet"
+    enhancer.net_scale = 2
+    return enhancer
+
+
+def test_4k_frame_is_tiled_within_memory_budget():
+    result = subprocess.run([sys.executable, "-c", PEAK_RSS_SCRIPT, str(BACKEND), str(BUDGET_MB)],
+                            capture_output=True, text=True, timeout=600, check=True)
+    measured = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert measured["tile"] > 0
+    assert measured["shape"] == [4320, 7680, 3]
+    # Everything enhance_image holds besides network activations: BGR<->RGB copies
+    # of the input and output frames, plus the float input tensor
+    frames_bytes = 2 * measured["frame_bytes"] * (1 + 4) + 4 * measured["frame_bytes"]
+    assert measured["peak_kb"] * 1024 <= BUDGET_MB * 1024 * 1024 + frames_bytes
+
+
+def test_tiled_output_matches_untiled():
+    enhancer = make_enhancer()
+    # Odd width: the right-hand edge tiles need padding before the network's pixel-unshuffle
+    frame = np.random.default_rng(1).integers(0, 256, size=(300, 501, 3), dtype=np.uint8)
+    rgb = frame[:, :, ::-1].copy()
+
+    tiled = enhancer._enhance_tiled(rgb, 64)
+    expected = np.repeat(np.repeat(rgb, 2, axis=0), 2, axis=1)
+    assert np.array_equal(tiled, expected)
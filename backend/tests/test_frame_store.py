@@ -0,0 +1,72 @@
+"""Frame-store index deltas and shared readers."""
+import os
+
+import numpy as np
+
+from frame_store import FrameStore, FrameStoreWriter, _index_path, frame_store_reader
+
+
+def image(value):
+    return np.full((4, 6, 3), value, dtype=np.uint8)
+
+
+def test_flush_appends_only_new_entries(tmp_path):
+    path = tmp_path / "out.frames"
+    writer = FrameStoreWriter(path)
+    for frame_id in range(3):
+        writer.put(frame_id, "original", image(frame_id))
+        writer.flush()
+    lines = _index_path(path).read_text().splitlines()
+    # The initial (empty) index plus one delta per flush, each holding one entry
+    assert len(lines) == 4
+    assert all(line.count('"original"') == 1 for line in lines[1:])
+
+    writer.close()
+    assert len(_index_path(path).read_text().splitlines()) == 1
+    store = FrameStore(path)
+    assert store.frame_ids() == [0, 1, 2]
+    store.close()
+
+
+def test_crashed_writer_is_recovered_from_deltas_and_headers(tmp_path):
+    path = tmp_path / "out.frames"
+    writer = FrameStoreWriter(path)
+    writer.put(0, "original", image(10))
+    checkpoint = writer.flush()
+    writer.put(1, "original", image(11))
+    writer.put(1, "enhanced", image(12))
+    writer.file.flush()  # Data reached the file, the index delta did not
+    with open(_index_path(path), "a") as f:
+        f.write('{"data_size": ')  # Torn append
+
+    store = FrameStore(path)
+    assert sorted(store.index) == [(0, "original"), (1, "enhanced"), (1, "original")]
+    assert np.array_equal(store.get(1, "enhanced"), image(12))
+    store.close()
+
+    resumed = FrameStoreWriter(path, truncate_to=checkpoint)
+    assert list(resumed.index) == [(0, "original")]
+    resumed.close()
+    writer.file.close()
+
+
+def test_replaced_reader_stays_open_until_released(tmp_path):
+    path = tmp_path / "out.frames"
+    writer = FrameStoreWriter(path)
+    writer.put(0, "original", image(1))
+    writer.flush()
+
+    with frame_store_reader(path) as held:
+        writer.put(1, "original", image(2))
+        writer.flush()
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        with frame_store_reader(path) as fresh:
+            assert fresh is not held
+            assert fresh.has(1, "original")
+        # The reopen retired the held reader without closing it under us
+        assert not held.closed
+        assert np.array_equal(held.get(0, "original"), image(1))
+    assert held.closed
+    assert not fresh.closed
+    writer.close()
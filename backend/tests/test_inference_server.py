@@ -0,0 +1,61 @@
+"""Inference server connection security and protocol errors."""
+import secrets
+import threading
+import time
+
+import pytest
+
+import inference_server
+from inference_server import InferenceClient, InferenceServer
+
+
+@pytest.fixture
+def server():
+    """A server on a free loopback port, run in a thread."""
+    authkey = secrets.token_hex(16).encode()
+    srv = InferenceServer(("127.0.0.1", 0), authkey)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    deadline = time.monotonic() + 5.0
+    while srv.listener is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    yield srv, authkey
+    srv.close()
+
+
+def test_requires_authkey():
+    with pytest.raises(ValueError):
+        InferenceServer(("127.0.0.1", 0), None)
+
+
+def test_refuses_remote_bind_without_explicit_key():
+    with pytest.raises(ValueError):
+        InferenceServer(("0.0.0.0", 0), b"secret")
+    InferenceServer(("0.0.0.0", 0), b"secret", allow_remote=True)
+
+
+def test_generated_key_is_exported_but_not_explicit(monkeypatch):
+    monkeypatch.delenv(inference_server.AUTHKEY_ENV, raising=False)
+    monkeypatch.setattr(inference_server, "_generated_authkey", None)
+    key = inference_server.ensure_authkey()
+    assert len(key) == 64
+    assert inference_server.configured_authkey() == key
+    assert inference_server.explicit_authkey() is None
+
+
+def test_client_needs_a_key(monkeypatch):
+    monkeypatch.delenv(inference_server.AUTHKEY_ENV, raising=False)
+    with pytest.raises(RuntimeError):
+        InferenceClient(("127.0.0.1", 1))
+
+
+def test_unknown_message_kind_gets_an_error_reply(server):
+    srv, authkey = server
+    client = InferenceClient(srv.listener.address, authkey=authkey, timeout=5.0)
+    try:
+        started = time.monotonic()
+        with pytest.raises(RuntimeError, match="Unknown message kind"):
+            client._call(lambda req_id: ("bogus", req_id))
+        assert time.monotonic() - started < 5.0
+        assert client.metrics() is not None
+    finally:
+        client.close()
@@ -0,0 +1,66 @@
+"""Priority aging and early slot release in the JobScheduler."""
+import threading
+import time
+
+from job_scheduler import JobScheduler
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def queue_ticket(scheduler, priority, client_id, granted):
+    """Acquire in a thread; append client_id to ``granted`` when its slot is granted, then release it."""
+    def run():
+        with scheduler.slot(priority, client_id):
+            granted.append(client_id)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_background_work_ages_past_a_queue_of_batch_frames():
+    scheduler = JobScheduler(slots=1, aging_s=0.05)
+    granted = []
+    held = scheduler.hold("batch", "video")
+    threads = [queue_ticket(scheduler, "background", "warmup", granted)]
+    wait_until(lambda: len(scheduler.waiting) == 1)
+    time.sleep(0.06)  # The background ticket ages into the batch class
+    threads.append(queue_ticket(scheduler, "batch", "video2", granted))
+    wait_until(lambda: len(scheduler.waiting) == 2)
+    held.release()
+    for thread in threads:
+        thread.join(5.0)
+    assert granted == ["warmup", "video2"]
+
+
+def test_strict_priority_without_aging():
+    scheduler = JobScheduler(slots=1, aging_s=0)
+    granted = []
+    held = scheduler.hold("batch", "video")
+    threads = [queue_ticket(scheduler, "background", "warmup", granted)]
+    wait_until(lambda: len(scheduler.waiting) == 1)
+    time.sleep(0.06)
+    threads.append(queue_ticket(scheduler, "batch", "video2", granted))
+    wait_until(lambda: len(scheduler.waiting) == 2)
+    held.release()
+    for thread in threads:
+        thread.join(5.0)
+    assert granted == ["video2", "warmup"]
+
+
+def test_hold_released_early_frees_the_slot_once():
+    scheduler = JobScheduler(slots=1)
+    granted = []
+    with scheduler.hold("interactive", "frame") as model_slot:
+        thread = queue_ticket(scheduler, "batch", "video", granted)
+        wait_until(lambda: len(scheduler.waiting) == 1)
+        model_slot.release()  # Restoration done; OCR continues without the slot
+        thread.join(5.0)
+        assert granted == ["video"]
+        assert scheduler.running == 0
+    assert scheduler.running == 0  # Leaving the block does not release twice
+    assert scheduler.metrics()["classes"]["interactive"]["granted"] == 1
@@ -0,0 +1,77 @@
+"""Live restoration against a local file played back at real-time pace."""
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from live_pipeline import FrameReader, LiveMetrics, LiveRestorer, run_live
+
+
+FPS = 30.0
+FRAMES = 60
+
+
+@pytest.fixture
+def live_source(tmp_path):
+    """A 2 s MJPEG clip; each frame encodes its index so output order can be checked."""
+    path = tmp_path / "live.avi"
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), FPS, (64, 48))
+    assert writer.isOpened()
+    for i in range(FRAMES):
+        writer.write(np.full((48, 64, 3), i * 4, dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+
+def fixed_cost_restore(seconds):
+    """Stand-in for the restoration stages: a fixed cost per frame, output = input."""
+    def run_mode(self, frame, mode):
+        time.sleep(seconds)
+        return frame
+    return run_mode
+
+
+def test_slow_restoration_drops_frames_instead_of_lagging(live_source, monkeypatch):
+    # Restoration takes 3 frame intervals, so it cannot keep up with the feed
+    cost = 3.0 / FPS
+    monkeypatch.setattr(LiveRestorer, "_run_mode", fixed_cost_restore(cost))
+    latencies = []
+
+    summary = run_live(live_source, latency_budget=0.3, realtime=True,
+                       on_frame=lambda frame, info: latencies.append(info["latency"]))
+
+    assert summary["frames_in"] == FRAMES
+    assert summary["dropped_rate"] > 0.5
+    assert 0 < summary["frames_out"] < FRAMES
+    # Latency stays bounded by the queue depth plus one restoration, instead of
+    # growing with every frame the consumer falls behind
+    bound = 2.0 / FPS + cost + 0.1
+    assert max(latencies) < bound
+    tail = latencies[len(latencies) // 2:]
+    assert np.mean(tail) < bound
+
+
+def test_fast_restoration_keeps_every_frame(live_source, monkeypatch):
+    monkeypatch.setattr(LiveRestorer, "_run_mode", fixed_cost_restore(0.0))
+    frame_ids = []
+
+    summary = run_live(live_source, latency_budget=0.3, realtime=True,
+                       on_frame=lambda frame, info: frame_ids.append(info["frame_id"]))
+
+    assert summary["frames_out"] == FRAMES
+    assert summary["dropped_rate"] == 0.0
+    assert frame_ids == list(range(FRAMES))
+
+
+def test_reader_does_not_hang_when_consumer_stopped(live_source):
+    # Nobody consumes: the reader must still exit once the run is stopped
+    stop_event = threading.Event()
+    reader = FrameReader(live_source, queue.Queue(maxsize=1), LiveMetrics(), stop_event)
+    reader.start()
+    time.sleep(0.2)
+    stop_event.set()
+    reader.join(timeout=2.0)
+    assert not reader.is_alive()
@@ -0,0 +1,169 @@
+"""Killing a video job part-way and resuming it gives the same result as an uninterrupted run."""
+import json
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+pytest.importorskip("tqdm")
+
+import main_pipeline
+from checkpoint import checkpoint_path_for, journal_path_for
+from frame_manifest import manifest_path_for, read_manifest
+from text_index import text_index_path_for
+from thread_governor import get_thread_governor
+
+
+FRAMES = 24
+SIZE = (64, 48)
+
+
+class Killed(Exception):
+    """Stands in for the process dying mid-job."""
+
+
+class FakeModels:
+    """
+    Inference-client stand-in: deterministic deblur/enhance without torch.
+
+    Raises Killed once ``kill_after`` frames have been enhanced.
+    """
+
+    def __init__(self, kill_after=None):
+        self.kill_after = kill_after
+        self.enhanced = 0
+
+    def deblur(self, img, passes=1, variant=None, model_path=None):
+        return cv2.GaussianBlur(img, (3, 3), 0)
+
+    def deblur_regions(self, img, variant=None, model_path=None, thresholds=None):
+        return img, 0.0, 0
+
+    def enhance(self, img, scale=2, tier=None, mode="full", model_path=None):
+        self.enhanced += 1
+        if self.kill_after is not None and self.enhanced > self.kill_after:
+            raise Killed()
+        return cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_NEAREST)
+
+
+class FakeOCRWorker:
+    """
+    In-process OCRWorker stand-in without EasyOCR.
+
+    The latest submitted frame stays in flight until the next poll, so
+    checkpoints see OCR frames still pending.
+    """
+
+    def __init__(self, results_dir, gpu=True, frame_bytes=None):
+        assert Path(results_dir).is_dir()
+        self.queued = []
+
+    def start(self):
+        return self
+
+    def set_threads(self, count):
+        pass
+
+    def submit(self, frame_id, blur_img, enhanced_img):
+        self.queued.append(frame_id)
+        return True
+
+    @staticmethod
+    def _result(frame_id):
+        comparison = {
+            "blur": {"avg_confidence_raw": 0.5, "text_count_raw": 1},
+            "enhanced": {"avg_confidence_raw": 0.75, "text_count_raw": 1,
+                         "texts_filtered": [{"text": f"shot {frame_id // 12}", "confidence": 0.75}]},
+            "improvement": {"confidence_delta_raw": 0.25},
+        }
+        return frame_id, comparison, None, None
+
+    def poll(self):
+        ready, self.queued = self.queued[:-1], self.queued[-1:]
+        return [self._result(frame_id) for frame_id in ready]
+
+    def close(self, timeout=None):
+        ready, self.queued = self.queued, []
+        return [self._result(frame_id) for frame_id in ready]
+
+    def terminate(self):
+        self.queued = []
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    """Two shots: sharp noise, then heavily blurred noise."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main_pipeline, "OCR_AVAILABLE", True)
+    monkeypatch.setattr(main_pipeline, "OCRWorker", FakeOCRWorker, raising=False)
+    monkeypatch.setattr(main_pipeline, "ocr_results_dir_for",
+                        lambda output_path: Path(output_path).with_suffix(".ocr"), raising=False)
+    path = tmp_path / "input.avi"
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 24.0, SIZE)
+    assert writer.isOpened()
+    rng = np.random.default_rng(0)
+    for i in range(FRAMES):
+        noise = rng.integers(0, 256, (SIZE[1], SIZE[0], 3), dtype=np.uint8)
+        writer.write(noise if i < FRAMES // 2 else cv2.GaussianBlur(noise, (0, 0), 4) // 2)
+    writer.release()
+    return str(path)
+
+
+def run(source, output, models, resume=False):
+    return main_pipeline.process_video(source, str(output), inference_client=models, resume=resume,
+                                       checkpoint_frames=5)
+
+
+def read_frames(path):
+    cap = cv2.VideoCapture(str(path))
+    frames = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def without_timings(records):
+    return [{k: v for k, v in record.items() if k != "timings"} for record in records]
+
+
+def test_kill_and_resume_matches_uninterrupted_run(source, tmp_path):
+    reference = run(source, tmp_path / "reference.mp4", FakeModels())
+    assert reference["processed_frames"] == FRAMES
+    assert 0 < reference["deblurred_frames"] < FRAMES
+    assert sum(1 for record in reference["frames"] if record["ocr"]) > 2
+
+    output = tmp_path / "resumed.mp4"
+    with pytest.raises(Killed):
+        run(source, output, FakeModels(kill_after=13))
+    checkpoint = json.loads(checkpoint_path_for(output).read_text())
+    assert checkpoint["last_frame_id"] == 9
+    assert "frames" not in checkpoint  # Manifest records go to the journal
+    assert checkpoint["ocr_pending"]
+    assert journal_path_for(checkpoint_path_for(output)).exists()
+    # The failed run released its CPU shares
+    assert not [lease for lease in get_thread_governor().allocation()["leases"] if str(output) in lease["name"]]
+
+    models = FakeModels()
+    resumed = run(source, output, models, resume=True)
+    assert models.enhanced == FRAMES - 10  # Committed frames are not restored again
+    assert resumed["processed_frames"] == FRAMES
+    assert resumed["deblurred_frames"] == reference["deblurred_frames"]
+    assert resumed["deblur_passes"] == reference["deblur_passes"]
+    assert without_timings(resumed["frames"]) == without_timings(reference["frames"])
+    assert without_timings(read_manifest(manifest_path_for(output))) == without_timings(
+        read_manifest(manifest_path_for(tmp_path / "reference.mp4")))
+
+    assert (json.loads(text_index_path_for(output).read_text())
+            == json.loads(text_index_path_for(tmp_path / "reference.mp4").read_text()))
+
+    expected, actual = read_frames(tmp_path / "reference.mp4"), read_frames(output)
+    assert len(actual) == len(expected) == FRAMES
+    assert all(np.array_equal(a, b) for a, b in zip(actual, expected))
+    assert (tmp_path / "resumed.ocr").is_dir() and not (tmp_path / "frames").exists()
+    assert not checkpoint_path_for(output).exists()
+    assert not journal_path_for(checkpoint_path_for(output)).exists()
@@ -0,0 +1,22 @@
+"""Shard planning over scene-index shots."""
+from scene_detection.scene_index import ShotLookup, plan_shards
+
+
+def shots(*bounds):
+    return [{"shot_id": i, "start": start, "end": end} for i, (start, end) in enumerate(bounds)]
+
+
+def test_shards_hold_whole_contiguous_shots():
+    index_shots = shots((0, 399), (400, 899), (900, 2999), (3000, 3099), (3100, 3499))
+    shards = plan_shards(index_shots, max_shard_frames=1000)
+    # The long shot is a shard of its own; shorter ones are grouped up to the target
+    assert shards == [[0, 899], [900, 2999], [3000, 3499]]
+    assert all(any(start == shot["start"] for shot in index_shots) for start, _ in shards)
+    assert all(b[0] == a[1] + 1 for a, b in zip(shards, shards[1:]))
+
+
+def test_shard_lookup():
+    index_shots = shots((0, 399), (400, 899), (900, 2999))
+    lookup = ShotLookup({"shots": index_shots, "shards": plan_shards(index_shots, max_shard_frames=1000)})
+    assert [lookup.shard_for(frame_id) for frame_id in (0, 899, 900, 2999)] == [0, 0, 1, 1]
+    assert ShotLookup({"shots": index_shots}).shard_for(2000) == 0
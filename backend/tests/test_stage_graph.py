@@ -0,0 +1,30 @@
+"""Thread budget of concurrent stage-graph stages."""
+import stage_graph
+from stage_graph import StageGraph
+
+
+def request_graph():
+    """The shape of app.py's single-frame graph."""
+    graph = StageGraph()
+    graph.add("load", lambda r: 1)
+    graph.add("blur", lambda r: 2, deps=["load"])
+    graph.add("ocr_original", lambda r: 3, deps=["load"])
+    graph.add("save_original", lambda r: 4, deps=["load"])
+    graph.add("deblur", lambda r: 5, deps=["load", "blur"])
+    graph.add("enhance", lambda r: 6, deps=["load", "deblur"])
+    graph.add("ocr_enhanced", lambda r: 7, deps=["enhance"])
+    return graph
+
+
+def test_max_parallel_is_the_widest_dependency_level(monkeypatch):
+    assert request_graph().max_parallel() == 3
+    monkeypatch.setattr(stage_graph, "STAGE_WORKERS", 2)
+    assert request_graph().max_parallel() == 2
+
+
+def test_thread_limit_is_split_between_concurrent_stages(monkeypatch):
+    applied = []
+    monkeypatch.setattr(stage_graph, "apply_thread_limit", applied.append)
+    results, _ = request_graph().run(thread_limit=7)
+    assert results["ocr_enhanced"] == 7
+    assert applied == [2]
@@ -0,0 +1,28 @@
+"""CPU thread shares applied through the process-wide torch setting."""
+import threading
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from thread_governor import ThreadGovernor, apply_thread_limit, current_thread_limit
+
+
+def test_lease_reapplies_after_another_thread_changed_the_setting():
+    previous = torch.get_num_threads()
+    governor = ThreadGovernor(total=2)
+    try:
+        with governor.register("job") as lease:
+            lease.apply()
+            assert torch.get_num_threads() == 2
+
+            other = threading.Thread(target=apply_thread_limit, args=(1,))
+            other.start()
+            other.join()
+            assert current_thread_limit() == 1
+
+            lease.apply()
+            assert torch.get_num_threads() == 2
+            assert current_thread_limit() == 2
+    finally:
+        apply_thread_limit(previous)
@@ -0,0 +1,154 @@
+"""
+Searchable text index for a processed video.
+
+OCR lines from the sampled frames are merged into tracks (the same text seen
+on consecutive OCR samples), and an inverted index maps normalized tokens to
+tracks. The index is written next to the job's output video and loaded once
+per job by the API, so searches never rescan the per-frame OCR JSON.
+"""
+import bisect
+import json
+import re
+import unicodedata
+from pathlib import Path
+
+
+# Text must appear on consecutive OCR samples no further apart than this to stay one track
+TRACK_MAX_GAP_SAMPLES = 1
+# Tokens shorter than this are not indexed (OCR noise like stray punctuation)
+MIN_TOKEN_LENGTH = 2
+
+_TOKEN_RE = re.compile(r"[0-9a-z]+")
+
+
+def normalize_tokens(text):
+    """Lowercase, strip accents/punctuation and split into tokens."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return [token for token in _TOKEN_RE.findall(text) if len(token) >= MIN_TOKEN_LENGTH]
+
+
+def text_index_path_for(output_path):
+    """Text index location for a job, next to its output video."""
+    output_path = Path(output_path)
+    return output_path.with_name(output_path.stem + ".text_index.json")
+
+
+def build_text_index(observations, fps, max_gap_samples=TRACK_MAX_GAP_SAMPLES):
+    """
+    Merge OCR observations into tracks and build the inverted index.
+
+    Args:
+        observations: Dict of frame_id -> list of {"text", "confidence"} (OCR'd frames only)
+        fps: Source frame rate, for timestamps
+        max_gap_samples: Missing OCR samples tolerated inside one track (default: 1 = none)
+
+    Returns:
+        dict with "fps", "tracks" and "tokens" (token -> sorted track ids)
+    """
+    sample_ids = sorted(observations)
+    sample_pos = {frame_id: pos for pos, frame_id in enumerate(sample_ids)}
+    seconds = (lambda frame_id: round(frame_id / fps, 3)) if fps else (lambda frame_id: None)
+
+    tracks = []
+    open_tracks = {}  # normalized text -> index into tracks
+    for frame_id in sample_ids:
+        pos = sample_pos[frame_id]
+        for item in observations[frame_id]:
+            tokens = normalize_tokens(item["text"])
+            if not tokens:
+                continue
+            key = " ".join(tokens)
+            confidence = float(item["confidence"])
+            track_idx = open_tracks.get(key)
+            if track_idx is not None:
+                track = tracks[track_idx]
+                last_pos = sample_pos[track["frames"][-1]]
+                if last_pos == pos:
+                    track["confidences"][-1] = max(track["confidences"][-1], confidence)
+                    continue
+                if pos - last_pos <= max_gap_samples:
+                    track["frames"].append(frame_id)
+                    track["confidences"].append(confidence)
+                    continue
+            open_tracks[key] = len(tracks)
+            tracks.append({
+                "text": item["text"],
+                "normalized": key,
+                "frames": [frame_id],
+                "confidences": [confidence],
+            })
+
+    postings = {}
+    for track_id, track in enumerate(tracks):
+        confidences = track.pop("confidences")
+        track.update({
+            "track_id": track_id,
+            "start_frame": track["frames"][0],
+            "end_frame": track["frames"][-1],
+            "start_time": seconds(track["frames"][0]),
+            "end_time": seconds(track["frames"][-1]),
+            "max_confidence": round(max(confidences), 3),
+            "avg_confidence": round(sum(confidences) / len(confidences), 3),
+        })
+        for token in set(track["normalized"].split()):
+            postings.setdefault(token, []).append(track_id)
+
+    return {"fps": fps, "tracks": tracks, "tokens": postings}
+
+
+def save_text_index(index, path):
+    """Write a text index as JSON."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+
+
+def load_text_index(path):
+    """Load a text index as a TextIndex, or None if missing."""
+    if not path or not Path(path).exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return TextIndex(json.load(f))
+
+
+class TextIndex:
+    """In-memory query side of a text index."""
+
+    def __init__(self, index):
+        self.fps = index.get("fps")
+        self.tracks = index["tracks"]
+        self.postings = {token: set(ids) for token, ids in index["tokens"].items()}
+        self.vocabulary = sorted(self.postings)
+
+    def _tracks_for(self, token, prefix=False):
+        if not prefix:
+            return self.postings.get(token, set())
+        matched = set()
+        pos = bisect.bisect_left(self.vocabulary, token)
+        while pos < len(self.vocabulary) and self.vocabulary[pos].startswith(token):
+            matched |= self.postings[self.vocabulary[pos]]
+            pos += 1
+        return matched
+
+    def search(self, query, limit=50):
+        """
+        Tracks containing every query token (the last one may be a prefix).
+
+        Args:
+            query: Free-text query
+            limit: Maximum tracks returned (default: 50)
+
+        Returns:
+            List of track dicts, best confidence first
+        """
+        tokens = normalize_tokens(query)
+        if not tokens:
+            return []
+        matched = None
+        for i, token in enumerate(tokens):
+            ids = self._tracks_for(token, prefix=(i == len(tokens) - 1))
+            matched = ids if matched is None else matched & ids
+            if not matched:
+                return []
+        ranked = sorted(matched, key=lambda t: (-self.tracks[t]["max_confidence"], self.tracks[t]["start_frame"]))
+        return [self.tracks[t] for t in ranked[:limit]]
@@ -0,0 +1,176 @@
+"""
+Process-wide CPU thread governor.
+
+torch (OpenMP/MKL), OpenCV and EasyOCR each default to one intra-op thread
+per core. Concurrent jobs and stages then run cores x jobs threads and the
+machine thrashes. The governor divides the available cores between the
+registered consumers ("leases") by priority weight and each lease applies
+its share:
+
+- in-process work (a video job's restoration, an interactive frame) calls
+  ``lease.apply()`` before its model work. torch's intra-op thread count is
+  process-wide, so every call re-applies the share (another job may have
+  changed it meanwhile); video jobs re-apply at every frame, so shares adapt
+  as jobs start and finish. Thread pools inside one consumer (stages, tiles)
+  budget their concurrency against that share instead of setting their own;
+- worker processes (OCR) receive their share through a callback and apply
+  it themselves before the next task.
+
+    with get_thread_governor().register("video:<job_id>", priority="batch") as lease:
+        for frame in frames:
+            lease.apply()
+            ... model work ...
+"""
+import os
+import threading
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+
+# Relative share of cores per priority class (see job_scheduler.PRIORITY_CLASSES)
+THREAD_WEIGHTS = {"interactive": 2.0, "batch": 1.0, "background": 0.5}
+
+_applied_lock = threading.Lock()
+_applied_threads = None
+
+
+def available_cores():
+    """Cores this process may use: CPU_THREADS if set, else the CPU affinity mask."""
+    if os.environ.get("CPU_THREADS"):
+        return max(1, int(os.environ["CPU_THREADS"]))
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return os.cpu_count() or 1
+
+
+def apply_thread_limit(threads):
+    """
+    Set torch's (OpenMP/MKL) intra-op thread count.
+
+    The setting is process-wide, so it is applied on every call rather than
+    skipped when this thread set the same value before.
+    """
+    global _applied_threads
+    # Imported here: the API process uses the governor without loading torch
+    try:
+        import torch
+    except ImportError:
+        torch = None
+    with _applied_lock:
+        if torch is not None:
+            torch.set_num_threads(threads)
+        _applied_threads = threads
+
+
+def current_thread_limit():
+    """Thread count last applied in this process (None if never limited)."""
+    return _applied_threads
+
+
+class ThreadLease:
+    """One consumer's share of the cores."""
+
+    def __init__(self, governor, name, priority, on_change):
+        self.governor = governor
+        self.name = name
+        self.priority = priority
+        self.weight = THREAD_WEIGHTS[priority]
+        self.on_change = on_change
+        self.threads = 0  # Set on registration; 0 makes the first share always reach on_change
+
+    def apply(self):
+        """Apply this lease's current share (process-wide, see apply_thread_limit)."""
+        apply_thread_limit(self.threads)
+
+    def release(self):
+        self.governor._remove(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class ThreadGovernor:
+    """Divides cores between leases in proportion to their priority weights."""
+
+    def __init__(self, total=None):
+        self.total = total or available_cores()
+        self.lock = threading.Lock()
+        self.leases = []
+        self.reallocations = 0
+
+    def register(self, name, priority="batch", on_change=None):
+        """
+        Add a consumer and rebalance.
+
+        Args:
+            name: Label shown in the allocation (e.g. "video:<job_id>")
+            priority: Key of THREAD_WEIGHTS (default: "batch")
+            on_change: Called with the new thread count, for consumers in other processes (optional)
+
+        Returns:
+            ThreadLease (also a context manager that releases it)
+        """
+        lease = ThreadLease(self, name, priority, on_change)
+        with self.lock:
+            self.leases.append(lease)
+            self._rebalance()
+        return lease
+
+    def _remove(self, lease):
+        with self.lock:
+            if lease in self.leases:
+                self.leases.remove(lease)
+                self._rebalance()
+
+    def _rebalance(self):
+        """Largest-remainder split of the cores over the leases (call with the lock held)."""
+        leases = self.leases
+        if not leases:
+            return
+        total_weight = sum(lease.weight for lease in leases)
+        shares = [self.total * lease.weight / total_weight for lease in leases]
+        threads = [max(1, int(share)) for share in shares]
+        by_remainder = sorted(range(len(leases)), key=lambda i: shares[i] - int(shares[i]), reverse=True)
+        for i in by_remainder[:max(0, self.total - sum(threads))]:
+            threads[i] += 1
+
+        self.reallocations += 1
+        for lease, count in zip(leases, threads):
+            if lease.threads != count:
+                lease.threads = count
+                if lease.on_change:
+                    lease.on_change(count)
+        # OpenCV's pool is process-wide: size it for the smallest in-process share
+        in_process = [lease.threads for lease in leases if lease.on_change is None]
+        if cv2 is not None and in_process:
+            cv2.setNumThreads(min(in_process))
+
+    def allocation(self):
+        with self.lock:
+            return {
+                "total_cores": self.total,
+                "reallocations": self.reallocations,
+                "leases": [
+                    {"name": lease.name, "priority": lease.priority, "threads": lease.threads}
+                    for lease in self.leases
+                ],
+            }
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_thread_governor():
+    """Process-wide governor shared by all jobs."""
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = ThreadGovernor()
+        return _governor
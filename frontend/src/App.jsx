@@ -6,7 +6,7 @@ import {
   faImage, faFileVideo, faEye, faArrowLeft,
   faTachometerAlt, faChartLine, faTimes
 } from '@fortawesome/free-solid-svg-icons';
-import { processFrame, processVideo, getProcessingStatus, getResult } from './services/api';
+import { processFrame, processVideo, getProcessingStatus, getResult, apiUrl } from './services/api';
 import './App.css';
 
 function App() {
@@ -385,7 +385,7 @@ function App() {
                       <div className="comparison-item">
                         <h4>Original (Blur)</h4>
                         <img 
-                          src={`data:image/png;base64,${results.images.original}`} 
+                          src={`data:image/${results.image_format || 'png'};base64,${results.images.original}`} 
                           alt="Original"
                           className="comparison-image"
                         />
@@ -400,7 +400,7 @@ function App() {
                       <div className="comparison-item">
                         <h4>Enhanced</h4>
                         <img 
-                          src={`data:image/png;base64,${results.images.enhanced}`} 
+                          src={`data:image/${results.image_format || 'png'};base64,${results.images.enhanced}`} 
                           alt="Enhanced"
                           className="comparison-image"
                         />
@@ -419,11 +419,12 @@ function App() {
                     </div>
 
                     {/* Full Comparison */}
-                    {results.images.comparison && (
+                    {results.image_paths && results.image_paths.comparison && (
                       <div className="full-comparison">
                         <h4>Side-by-Side Comparison</h4>
                         <img 
-                          src={`data:image/png;base64,${results.images.comparison}`} 
+                          src={apiUrl(results.image_paths.comparison)} 
+                          loading="lazy"
                           alt="Comparison"
                           className="comparison-full"
                         />
@@ -485,7 +486,7 @@ function App() {
                             <div className="frame-side">
                               <p className="frame-label">Before</p>
                               <img 
-                                src={`data:image/png;base64,${frame.images.before}`} 
+                                src={`data:image/${results.image_format || 'png'};base64,${frame.images.before}`} 
                                 alt={`Frame ${frame.frame_number} before`}
                                 className="frame-image"
                               />
@@ -502,7 +503,7 @@ function App() {
                             <div className="frame-side">
                               <p className="frame-label">Enhanced</p>
                               <img 
-                                src={`data:image/png;base64,${frame.images.enhanced}`} 
+                                src={`data:image/${results.image_format || 'png'};base64,${frame.images.enhanced}`} 
                                 alt={`Frame ${frame.frame_number} enhanced`}
                                 className="frame-image"
                               />
@@ -525,10 +526,11 @@ function App() {
                           </div>
 
                           {/* Full Comparison for this frame */}
-                          {frame.images.comparison && (
+                          {frame.image_paths && frame.image_paths.comparison && (
                             <div className="frame-full-comparison">
                               <img 
-                                src={`data:image/png;base64,${frame.images.comparison}`} 
+                                src={apiUrl(frame.image_paths.comparison)}
+                                loading="lazy" 
                                 alt={`Frame ${frame.frame_number} comparison`}
                                 className="frame-comparison-full"
                               />
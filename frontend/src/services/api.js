@@ -35,6 +35,9 @@ export const getResult = async (jobId) => {
   return apiClient.get(`/result/${jobId}`);
 };
 
+// Absolute URL for a backend path such as an on-demand comparison
+export const apiUrl = (path) => `${API_BASE_URL.replace(/\/api$/, '')}${path}`;
+
 // Health check
 export const healthCheck = async () => {
   return apiClient.get('/health');
@@ -45,5 +48,6 @@ export default {
   processVideo,
   getProcessingStatus,
   getResult,
+  apiUrl,
   healthCheck
 };